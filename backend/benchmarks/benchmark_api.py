@@ -0,0 +1,387 @@
+"""
+Benchmark da API do backend (rotas de backend/trip/routes.py).
+
+Roda as rotas pelo test client do Flask contra o armazenamento em memória
+(ARMAZENAMENTO=memoria), com massas de dados de tamanhos diferentes, e mede
+por endpoint:
+  - latência p50/p95/p99 (ms)
+  - RPCs, leituras e escritas de documentos por requisição
+  - pico de memória alocada durante a requisição (tracemalloc)
+
+Uso (a partir da pasta backend/):
+    python benchmarks/benchmark_api.py
+    python benchmarks/benchmark_api.py --viagens 1 100 1000 --atividades 1 1000 5000
+    python benchmarks/benchmark_api.py --latencia-rpc-ms 5 --saida resultado.json
+    python benchmarks/benchmark_api.py --comparar base.json --saida atual.json
+
+A saída JSON traz o commit atual, os parâmetros e os números de cada
+endpoint em cada cenário, para comparar regressões entre commits.
+"""
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+import comum  # antes do trip: liga o armazenamento em memória
+
+from trip import app, bcrypt  # noqa: E402
+from trip import firestore_service  # noqa: E402
+
+app.config.update(MAIL_SUPPRESS_SEND=True)
+db = firestore_service.db
+
+DONO = 'dono@benchmark.dev'
+CONVIDADO = 'convidado@benchmark.dev'
+SENHA = 'senha-benchmark'
+SENHA_HASH = bcrypt.generate_password_hash(SENHA).decode('utf-8')
+
+
+# -------------------------------------------------------------
+# Massa de dados
+# -------------------------------------------------------------
+
+def _popular(qtd_viagens, qtd_atividades):
+    """
+    Cria o dono com 'qtd_viagens' viagens (todas compartilhadas com o convidado)
+    e 'qtd_atividades' atividades na viagem alvo. Escreve direto no cliente em
+    memória, sem latência simulada.
+    """
+    latencia = db.latencia_rpc
+    db.latencia_rpc = 0
+    db._colecoes.clear()
+
+    lote = db.batch()
+    for email in (DONO, CONVIDADO):
+        lote.set(db.collection('viajantes').document(email), {
+            'nome': email.split('@')[0],
+            'email': email,
+            'senha': SENHA_HASH,
+            'is_verified': True,
+        })
+
+    viagens = []
+    for i in range(qtd_viagens):
+        viagem_ref = db.collection('viajantes').document(DONO).collection('viagens').document()
+        qtd = qtd_atividades if i == 0 else 0
+        lote.set(viagem_ref, {
+            'destino': f'Destino {i}',
+            'valor_total': 10000.0,
+            'valor_restante': 10000.0 - qtd * 10.0,
+            'total_gasto': qtd * 10.0,
+            'id_viajante': DONO,
+            'convidados_aceitos': [CONVIDADO],
+        })
+        lote.set(viagem_ref.collection('convites').document(CONVIDADO), {
+            'guest_id': CONVIDADO, 'status': 'aceito',
+        })
+        lote.set(db.collection('viajantes').document(CONVIDADO).collection('convites_viagem').document(), {
+            'owner_id': DONO, 'viagem_id': viagem_ref.id, 'status': 'aceito',
+        })
+        viagens.append(viagem_ref.id)
+
+    for i in range(qtd_atividades):
+        ref = db.collection('viajantes').document(DONO).collection('viagens') \
+            .document(viagens[0]).collection('atividades').document()
+        lote.set(ref, {'nome_atividade': f'Atividade {i}', 'valor_atividade': 10.0})
+
+    lote.commit()
+    db.latencia_rpc = latencia
+    return viagens[0]
+
+
+def _nova_atividade(viagem_id):
+    """Cria uma atividade fora da medição (para os endpoints que apagam/editam)."""
+    latencia = db.latencia_rpc
+    db.latencia_rpc = 0
+    ref = db.collection('viajantes').document(DONO).collection('viagens') \
+        .document(viagem_id).collection('atividades').document()
+    ref.set({'nome_atividade': 'Temporária', 'valor_atividade': 5.0})
+    db.latencia_rpc = latencia
+    return ref.id
+
+
+def _novo_convite_pendente(viagem_id):
+    latencia = db.latencia_rpc
+    db.latencia_rpc = 0
+    ref = db.collection('viajantes').document(CONVIDADO).collection('convites_viagem').document()
+    ref.set({'owner_id': DONO, 'viagem_id': viagem_id, 'status': 'pendente'})
+    db.latencia_rpc = latencia
+    return ref.id
+
+
+def _nova_viagem():
+    latencia = db.latencia_rpc
+    db.latencia_rpc = 0
+    ref = db.collection('viajantes').document(DONO).collection('viagens').document()
+    ref.set({'destino': 'Temporária', 'valor_total': 10.0, 'valor_restante': 10.0,
+             'total_gasto': 0.0, 'id_viajante': DONO, 'convidados_aceitos': []})
+    db.latencia_rpc = latencia
+    return ref.id
+
+
+# -------------------------------------------------------------
+# Endpoints
+# -------------------------------------------------------------
+# Cada endpoint é (nome, preparar), onde preparar(viagem_id) roda fora da
+# medição e devolve (método, url, headers, corpo). O corpo vai como JSON, ou
+# como está se for bytes (ex.: CSV).
+
+QTD_LINHAS_IMPORTACAO = 100
+
+
+def _h(viajante=DONO, **extras):
+    return {'X-Viajante-ID': viajante, **extras}
+
+
+def _importacao_json():
+    return [{'nome_atividade': f'Importada {i}', 'valor_atividade': 1.5} for i in range(QTD_LINHAS_IMPORTACAO)]
+
+
+def _importacao_csv():
+    linhas = [f'Importada {i};1,50' for i in range(QTD_LINHAS_IMPORTACAO)]
+    return '\n'.join(['nome_atividade;valor_atividade', *linhas]).encode('utf-8')
+
+
+ENDPOINTS = [
+    ('GET /api/perfil (dono)',
+     lambda v: ('GET', '/api/perfil', _h(), None)),
+    ('GET /api/perfil (convidado)',
+     lambda v: ('GET', '/api/perfil', _h(CONVIDADO), None)),
+    ('GET /api/viagem/<id>',
+     lambda v: ('GET', f'/api/viagem/{v}', _h(), None)),
+    ('GET /api/viagem/<owner>/<id>',
+     lambda v: ('GET', f'/api/viagem/{DONO}/{v}', _h(CONVIDADO), None)),
+    ('GET /api/viagem/<id>/editar',
+     lambda v: ('GET', f'/api/viagem/{v}/editar', _h(), None)),
+    ('PUT /api/viagem/<id>/editar',
+     lambda v: ('PUT', f'/api/viagem/{v}/editar', _h(), {'destino': 'Novo', 'valor_total': 20000.0})),
+    ('POST /api/viagem/<id>/recalcular',
+     lambda v: ('POST', f'/api/viagem/{v}/recalcular', _h(), None)),
+    ('POST /api/viagem/criar',
+     lambda v: ('POST', '/api/viagem/criar', _h(), {'destino': 'Nova', 'valor_total': 100.0})),
+    ('DELETE /api/viagem/<id>',
+     lambda v: ('DELETE', f'/api/viagem/{_nova_viagem()}', _h(), None)),
+    ('POST /api/viagem/<id>/atividade',
+     lambda v: ('POST', f'/api/viagem/{v}/atividade', _h(), {'nome_atividade': 'X', 'valor_atividade': 1.0})),
+    ('GET /api/viagem/<id>/atividade/<aid>',
+     lambda v: ('GET', f'/api/viagem/{v}/atividade/{_nova_atividade(v)}', _h(), None)),
+    ('PUT /api/viagem/<id>/atividade/<aid>',
+     lambda v: ('PUT', f'/api/viagem/{v}/atividade/{_nova_atividade(v)}', _h(),
+                {'nome_atividade': 'Y', 'valor_atividade': 7.0})),
+    ('DELETE /api/viagem/<id>/atividade/<aid>',
+     lambda v: ('DELETE', f'/api/viagem/{v}/atividade/{_nova_atividade(v)}', _h(), None)),
+    ('POST /api/viagem/<owner>/<id>/atividade',
+     lambda v: ('POST', f'/api/viagem/{DONO}/{v}/atividade', _h(CONVIDADO),
+                {'nome_atividade': 'X', 'valor_atividade': 1.0})),
+    ('GET /api/viagem/<owner>/<id>/atividade/<aid>',
+     lambda v: ('GET', f'/api/viagem/{DONO}/{v}/atividade/{_nova_atividade(v)}', _h(CONVIDADO), None)),
+    ('PUT /api/viagem/<owner>/<id>/atividade/<aid>',
+     lambda v: ('PUT', f'/api/viagem/{DONO}/{v}/atividade/{_nova_atividade(v)}', _h(CONVIDADO),
+                {'valor_atividade': 3.0})),
+    ('DELETE /api/viagem/<owner>/<id>/atividade/<aid>',
+     lambda v: ('DELETE', f'/api/viagem/{DONO}/{v}/atividade/{_nova_atividade(v)}', _h(CONVIDADO), None)),
+    ('POST /api/viagem/<id>/convites',
+     lambda v: ('POST', f'/api/viagem/{v}/convites', _h(), {'email_convidado': CONVIDADO})),
+    ('GET /api/viagem/<id>/convites',
+     lambda v: ('GET', f'/api/viagem/{v}/convites', _h(), None)),
+    ('GET /api/convites',
+     lambda v: ('GET', '/api/convites?status=pendente', _h(CONVIDADO), None)),
+    ('PUT /api/convites/<id>',
+     lambda v: ('PUT', f'/api/convites/{_novo_convite_pendente(v)}', _h(CONVIDADO), {'acao': 'aceitar'})),
+    ('DELETE /api/viagem/<id>/convites/<guest>',
+     lambda v: ('DELETE', f'/api/viagem/{v}/convites/{CONVIDADO}', _h(), None)),
+    ('GET /api/usuario/<email>',
+     lambda v: ('GET', f'/api/usuario/{DONO}', {}, None)),
+    ('GET /api/cache/acesso',
+     lambda v: ('GET', '/api/cache/acesso', _h(), None)),
+    ('POST /api/login',
+     lambda v: ('POST', '/api/login', {}, {'email': DONO, 'senha': SENHA})),
+    ('POST /api/viagem/<id>/atividades:bulk (JSON)',
+     lambda v: ('POST', f'/api/viagem/{v}/atividades:bulk', _h(), _importacao_json())),
+    ('POST /api/viagem/<id>/atividades:bulk (CSV)',
+     lambda v: ('POST', f'/api/viagem/{v}/atividades:bulk', _h(**{'Content-Type': 'text/csv'}), _importacao_csv())),
+    ('GET /api/exportar (ndjson)',
+     lambda v: ('GET', '/api/exportar?formato=ndjson', _h(), None)),
+    ('GET /api/exportar (csv)',
+     lambda v: ('GET', '/api/exportar?formato=csv', _h(), None)),
+]
+
+# Fora do benchmark: /api/cadastro e /api/confirmar (dependem de SMTP/rota do
+# frontend), /login/google e /api/auth/google (OAuth externo), /api/sair
+# (sessão Flask-Login) e /test_delete (rota de teste).
+
+
+def _requisitar(client, metodo, url, headers, corpo):
+    """Faz a requisição e lê o corpo inteiro (as respostas em streaming só leem os dados aí)."""
+    envio = {'data': corpo} if isinstance(corpo, bytes) else {'json': corpo}
+    resposta = client.open(url, method=metodo, headers=headers, **envio)
+    resposta.get_data()
+    resposta.close()
+    return resposta
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+# Purgas agendadas pelas requisições (DELETE de viagem). Durante o benchmark
+# elas não vão para a thread do purgador: ficam aqui e são executadas depois
+# de ler os contadores da requisição, para que o custo da purga não entre na
+# linha do endpoint (aparece numa linha própria, ver _medir_purgas).
+_purgas_adiadas = []
+
+
+def _adiar_purga(owner_id, viagem_id):
+    _purgas_adiadas.append((owner_id, viagem_id))
+
+
+firestore_service.agendar_purga_viagem = _adiar_purga
+
+
+def _medir_purgas():
+    """Executa as purgas adiadas; devolve (ms, rpcs, leituras, escritas) ou None se não havia nenhuma."""
+    if not _purgas_adiadas:
+        return None
+    db.zerar_contadores()
+    inicio = time.perf_counter()
+    while _purgas_adiadas:
+        firestore_service.purgar_viagem(*_purgas_adiadas.pop(0))
+    ms = (time.perf_counter() - inicio) * 1000
+    return ms, db.contadores['rpcs'], db.contadores['leituras'], db.contadores['escritas']
+
+
+def _resumo(latencias, rpcs, leituras, escritas):
+    return {
+        'p50_ms': round(_percentil(latencias, 50), 3),
+        'p95_ms': round(_percentil(latencias, 95), 3),
+        'p99_ms': round(_percentil(latencias, 99), 3),
+        'media_ms': round(statistics.fmean(latencias), 3),
+        'rpcs_por_req': round(statistics.fmean(rpcs), 2),
+        'leituras_por_req': round(statistics.fmean(leituras), 2),
+        'escritas_por_req': round(statistics.fmean(escritas), 2),
+    }
+
+
+def _medir_endpoint(client, preparar, viagem_id, repeticoes):
+    """
+    Devolve (números do endpoint, números da purga em segundo plano ou None).
+    Os contadores da requisição são lidos antes de a purga rodar.
+    """
+    latencias, rpcs, leituras, escritas, status = [], [], [], [], {}
+    purgas = []
+
+    for _ in range(repeticoes):
+        metodo, url, headers, corpo = preparar(viagem_id)
+        db.zerar_contadores()
+
+        inicio = time.perf_counter()
+        resposta = _requisitar(client, metodo, url, headers, corpo)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+        rpcs.append(db.contadores['rpcs'])
+        leituras.append(db.contadores['leituras'])
+        escritas.append(db.contadores['escritas'])
+        status[resposta.status_code] = status.get(resposta.status_code, 0) + 1
+
+        purga = _medir_purgas()
+        if purga:
+            purgas.append(purga)
+
+    # Pico de memória numa execução separada (tracemalloc distorce a latência)
+    metodo, url, headers, corpo = preparar(viagem_id)
+    tracemalloc.start()
+    _requisitar(client, metodo, url, headers, corpo)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    _medir_purgas()
+
+    resultado = {
+        **_resumo(latencias, rpcs, leituras, escritas),
+        'pico_memoria_kb': round(pico / 1024, 1),
+        'status': {str(k): v for k, v in sorted(status.items())},
+    }
+    return resultado, (_resumo(*zip(*purgas)) if purgas else None)
+
+
+def executar(qtds_viagens, qtds_atividades, repeticoes, latencia_rpc_ms, filtro=None):
+    db.latencia_rpc = latencia_rpc_ms / 1000
+    client = app.test_client()
+    cenarios = []
+
+    for qtd_viagens in qtds_viagens:
+        for qtd_atividades in qtds_atividades:
+            viagem_id = _popular(qtd_viagens, qtd_atividades)
+            resultados = {}
+            for nome, preparar in ENDPOINTS:
+                if filtro and filtro not in nome:
+                    continue
+                # Cada endpoint começa da mesma massa (os de escrita alteram os dados)
+                viagem_id = _popular(qtd_viagens, qtd_atividades)
+                firestore_service._cache_acesso._itens.clear()
+                resultados[nome], purga = _medir_endpoint(client, preparar, viagem_id, repeticoes)
+                if purga:
+                    resultados[f'{nome} (purga em segundo plano)'] = purga
+                print(f"[{qtd_viagens} viagens / {qtd_atividades} atividades] {nome}: "
+                      f"p50={resultados[nome]['p50_ms']}ms leituras={resultados[nome]['leituras_por_req']}",
+                      file=sys.stderr)
+
+            cenarios.append({
+                'viagens': qtd_viagens,
+                'atividades': qtd_atividades,
+                'endpoints': resultados,
+            })
+
+    return cenarios
+
+
+def comparar(base, atual):
+    """Imprime a variação de p50 e leituras por endpoint entre duas execuções."""
+    indice_base = {
+        (c['viagens'], c['atividades'], nome): dados
+        for c in base['cenarios'] for nome, dados in c['endpoints'].items()
+    }
+    for cenario in atual['cenarios']:
+        for nome, dados in cenario['endpoints'].items():
+            anterior = indice_base.get((cenario['viagens'], cenario['atividades'], nome))
+            if not anterior:
+                continue
+            razao = dados['p50_ms'] / anterior['p50_ms'] if anterior['p50_ms'] else float('inf')
+            print(f"[{cenario['viagens']}/{cenario['atividades']}] {nome}: "
+                  f"p50 {anterior['p50_ms']} -> {dados['p50_ms']} ms (x{razao:.2f}), "
+                  f"leituras {anterior['leituras_por_req']} -> {dados['leituras_por_req']}")
+
+
+def main():
+    parser = comum.novo_parser(__doc__)
+    parser.add_argument('--viagens', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--atividades', type=int, nargs='+', default=[1, 1000, 5000])
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--latencia-rpc-ms', type=float, default=0.0,
+                        help='latência simulada por RPC no armazenamento em memória')
+    parser.add_argument('--filtro', help='mede só os endpoints cujo nome contém este texto')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para comparar')
+    args = parser.parse_args()
+
+    resultado = {
+        'commit': comum.commit_atual(),
+        'parametros': {
+            'viagens': args.viagens,
+            'atividades': args.atividades,
+            'repeticoes': args.repeticoes,
+            'latencia_rpc_ms': args.latencia_rpc_ms,
+        },
+        'cenarios': executar(args.viagens, args.atividades, args.repeticoes, args.latencia_rpc_ms, args.filtro),
+    }
+
+    comum.gravar_resultado(resultado, args.saida)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            comparar(json.load(arquivo), resultado)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark da serialização JSON: provedor padrão do Flask (json da biblioteca
+padrão) x ProvedorJSON (orjson, trip/serializacao.py).
+
+Mede, para payloads no formato das respostas reais e de tamanhos diferentes:
+  - codificação: provider.response(payload) (o que o jsonify faz);
+  - decodificação: json.loads do texto (o que o response.json() do requests
+    faz no frontend) x orjson.loads direto dos bytes (_json() do frontend).
+
+Payloads:
+  - detalhe: /api/viagem/<id> com N atividades;
+  - perfil: /api/perfil com N viagens;
+  - convites: lista de N convites com created_at/updated_at (timestamps do
+    Firestore, DatetimeWithNanoseconds).
+
+Uso (a partir da pasta backend/):
+    python benchmarks/benchmark_json.py
+    python benchmarks/benchmark_json.py --tamanhos 100 1000 10000 --repeticoes 50 --saida json.json
+"""
+import json
+import statistics
+import sys
+import time
+from datetime import timezone
+
+import comum  # antes do trip: liga o armazenamento em memória
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds  # noqa: E402
+
+from trip import app  # noqa: E402
+from trip.serializacao import ProvedorJSON, orjson  # noqa: E402
+
+
+# -------------------------------------------------------------
+# Payloads
+# -------------------------------------------------------------
+
+def _detalhe(qtd):
+    return {
+        'destino': 'Lisboa',
+        'valor_total': 25000.0,
+        'valor_restante': 25000.0 - qtd * 12.5,
+        'percentual_gasto': 42.0,
+        'cor': 'bg-warning',
+        'qtd_atividades': qtd,
+        'media_gasto': 12.5,
+        'atividades': [
+            {'doc_id': f'atv{i:08d}', 'nome_atividade': f'Atividade número {i}', 'valor_atividade': 12.5}
+            for i in range(qtd)
+        ],
+        'proximo_cursor': None,
+    }
+
+
+def _perfil(qtd):
+    viagens = [
+        {
+            'doc_id': f'vgm{i:08d}', 'destino': f'Destino {i}', 'valor_total': 10000.0,
+            'valor_restante': 7500.0, 'total_gasto': 2500.0, 'percentual_gasto': 25.0,
+            'cor': 'bg-success', 'papel': 'dono', 'owner_id': 'dono@exemplo.com',
+        }
+        for i in range(qtd)
+    ]
+    return {'nome': 'Dono', 'email': 'dono@exemplo.com', 'viagens': viagens}
+
+
+def _convites(qtd):
+    agora = DatetimeWithNanoseconds(2025, 3, 14, 15, 9, 26, 535897, tzinfo=timezone.utc)
+    return {'convites': [
+        {
+            'doc_id': f'cnv{i:08d}', 'guest_id': f'convidado{i}@exemplo.com', 'status': 'pendente',
+            'owner_id': 'dono@exemplo.com', 'viagem_id': 'vgm00000001',
+            'created_at': agora, 'updated_at': agora,
+        }
+        for i in range(qtd)
+    ]}
+
+
+PAYLOADS = [('detalhe', _detalhe), ('perfil', _perfil), ('convites', _convites)]
+
+
+# -------------------------------------------------------------
+# Medição
+# -------------------------------------------------------------
+
+def _mediana_ms(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return round(statistics.median(tempos), 4)
+
+
+def _medir(payload, repeticoes):
+    padrao = DefaultJSONProvider(app)
+    rapido = ProvedorJSON(app)
+
+    with app.test_request_context():
+        corpo = padrao.response(payload).get_data()
+        resultado = {
+            'bytes': len(corpo),
+            'codificar_padrao_ms': _mediana_ms(lambda: padrao.response(payload).get_data(), repeticoes),
+            'codificar_orjson_ms': _mediana_ms(lambda: rapido.response(payload).get_data(), repeticoes),
+            'decodificar_padrao_ms': _mediana_ms(lambda: json.loads(corpo.decode('utf-8')), repeticoes),
+            'decodificar_orjson_ms': _mediana_ms(lambda: orjson.loads(corpo), repeticoes),
+        }
+
+    for etapa in ('codificar', 'decodificar'):
+        rapido_ms = resultado[f'{etapa}_orjson_ms']
+        resultado[f'{etapa}_aceleracao'] = round(resultado[f'{etapa}_padrao_ms'] / rapido_ms, 2) if rapido_ms else None
+    return resultado
+
+
+def executar(tamanhos, repeticoes):
+    cenarios = []
+    for nome, gerar in PAYLOADS:
+        for tamanho in tamanhos:
+            resultado = _medir(gerar(tamanho), repeticoes)
+            print(f"[{nome} {tamanho}] {resultado['bytes']} bytes: "
+                  f"codificar x{resultado['codificar_aceleracao']}, "
+                  f"decodificar x{resultado['decodificar_aceleracao']}", file=sys.stderr)
+            cenarios.append({'payload': nome, 'tamanho': tamanho, **resultado})
+    return cenarios
+
+
+def main():
+    parser = comum.novo_parser(__doc__)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    parser.add_argument('--repeticoes', type=int, default=30)
+    args = parser.parse_args()
+
+    if orjson is None:
+        parser.error('orjson não está instalado (pip install orjson)')
+
+    resultado = {
+        'commit': comum.commit_atual(),
+        'parametros': {'tamanhos': args.tamanhos, 'repeticoes': args.repeticoes},
+        'cenarios': executar(args.tamanhos, args.repeticoes),
+    }
+
+    comum.gravar_resultado(resultado, args.saida)
+
+
+if __name__ == '__main__':
+    main()
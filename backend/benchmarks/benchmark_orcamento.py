@@ -0,0 +1,99 @@
+"""
+Microbenchmark do cálculo de percentual/cor em lote (trip/utility.py):
+laço em Python x NumPy vetorizado, para listas de tamanhos diferentes.
+
+Mede a função inteira (listas de floats na entrada, listas na saída), que é o
+custo que calcular_percentual_e_cor paga, e aponta o ponto de cruzamento: o
+menor tamanho a partir do qual o NumPy é mais rápido em todos os tamanhos
+medidos. É esse número que deve ir em ORCAMENTO_LIMIAR_VETORIZADO.
+
+Uso (a partir da pasta backend/):
+    python benchmarks/benchmark_orcamento.py
+    python benchmarks/benchmark_orcamento.py --tamanhos 10 100 1000 --repeticoes 200 --saida orcamento.json
+"""
+import random
+import statistics
+import sys
+import time
+
+import comum  # antes do trip: liga o armazenamento em memória
+
+from trip import utility  # noqa: E402
+
+
+def _colunas(tamanho):
+    """valor_total/valor_restante com gastos de 0% a 120% (as três cores e o teto de 100%)."""
+    aleatorio = random.Random(tamanho)
+    totais = [aleatorio.choice([0.0, 500.0, 2000.0, 10000.0]) for _ in range(tamanho)]
+    restantes = [total * (1 - aleatorio.uniform(0, 1.2)) for total in totais]
+    return totais, restantes
+
+
+def _mediana_us(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1_000_000)
+    return round(statistics.median(tempos), 2)
+
+
+def executar(tamanhos, repeticoes):
+    cenarios = []
+    for tamanho in tamanhos:
+        totais, restantes = _colunas(tamanho)
+
+        # Os dois caminhos têm que dar o mesmo resultado
+        python = utility._percentuais_e_cores_python(totais, restantes)
+        numpy = utility._percentuais_e_cores_numpy(totais, restantes)
+        assert python[1] == numpy[1]
+        assert all(abs(a - b) < 1e-9 for a, b in zip(python[0], numpy[0]))
+
+        resultado = {
+            'tamanho': tamanho,
+            'python_us': _mediana_us(lambda: utility._percentuais_e_cores_python(totais, restantes), repeticoes),
+            'numpy_us': _mediana_us(lambda: utility._percentuais_e_cores_numpy(totais, restantes), repeticoes),
+        }
+        resultado['aceleracao'] = round(resultado['python_us'] / resultado['numpy_us'], 2)
+        print(f"[{tamanho}] python={resultado['python_us']}us numpy={resultado['numpy_us']}us "
+              f"x{resultado['aceleracao']}", file=sys.stderr)
+        cenarios.append(resultado)
+    return cenarios
+
+
+def ponto_de_cruzamento(cenarios):
+    """Menor tamanho a partir do qual o NumPy ganha em todos os tamanhos maiores (None se nunca)."""
+    cruzamento = None
+    for cenario in sorted(cenarios, key=lambda c: c['tamanho'], reverse=True):
+        if cenario['numpy_us'] >= cenario['python_us']:
+            break
+        cruzamento = cenario['tamanho']
+    return cruzamento
+
+
+def main():
+    parser = comum.novo_parser(__doc__)
+    parser.add_argument('--tamanhos', type=int, nargs='+',
+                        default=[1, 10, 25, 50, 100, 200, 500, 1000, 5000, 20000, 100000])
+    parser.add_argument('--repeticoes', type=int, default=100)
+    args = parser.parse_args()
+
+    if utility.np is None:
+        parser.error('NumPy não está instalado (pip install numpy)')
+
+    cenarios = executar(args.tamanhos, args.repeticoes)
+    resultado = {
+        'commit': comum.commit_atual(),
+        'parametros': {'tamanhos': args.tamanhos, 'repeticoes': args.repeticoes},
+        'limiar_configurado': utility.LIMIAR_VETORIZADO,
+        'ponto_de_cruzamento': ponto_de_cruzamento(cenarios),
+        'cenarios': cenarios,
+    }
+    print(f"ponto de cruzamento: {resultado['ponto_de_cruzamento']} viagens "
+          f"(limiar configurado: {utility.LIMIAR_VETORIZADO})", file=sys.stderr)
+
+    comum.gravar_resultado(resultado, args.saida)
+
+
+if __name__ == '__main__':
+    main()
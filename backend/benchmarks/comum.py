@@ -0,0 +1,44 @@
+"""
+Partes comuns dos scripts de benchmark desta pasta.
+
+Importar este módulo antes de qualquer coisa de trip.* liga o armazenamento
+em memória (ARMAZENAMENTO=memoria) e coloca a pasta backend/ no sys.path.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PASTA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ['ARMAZENAMENTO'] = 'memoria'
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+sys.path.insert(0, PASTA_BACKEND)
+
+
+def novo_parser(descricao):
+    """ArgumentParser com a docstring do script como ajuda e a opção --saida."""
+    parser = argparse.ArgumentParser(description=descricao, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--saida', help='arquivo JSON de saída (padrão: stdout)')
+    return parser
+
+
+def commit_atual():
+    """Hash curto do HEAD (None fora de um repositório git)."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PASTA_BACKEND, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def gravar_resultado(resultado, saida=None):
+    """Escreve o resultado em JSON no arquivo 'saida' ou, sem ele, no stdout."""
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if saida:
+        with open(saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
@@ -0,0 +1,30 @@
+"""
+Funções que rodam nos processos do pool de senhas (ver trip/senhas.py).
+
+Fica fora do pacote trip de propósito: os processos do pool importam só este
+módulo e o bcrypt, e nunca o app (importar qualquer coisa de trip.* roda o
+trip/__init__.py inteiro: Firebase, logs, rotas...).
+"""
+import bcrypt
+
+
+def custo_do_hash(senha_hash):
+    """'$2b$12$...' -> 12 (None se não for um hash bcrypt)."""
+    try:
+        return int(senha_hash.split(b'$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def gerar(senha, custo):
+    return bcrypt.hashpw(senha, bcrypt.gensalt(custo))
+
+
+def verificar(senha, senha_hash, custo):
+    if not bcrypt.checkpw(senha, senha_hash):
+        return False, None
+    custo_atual = custo_do_hash(senha_hash)
+    if custo_atual is not None and custo_atual < custo:
+        # Senha certa e hash antigo: aproveita para gerar o novo no mesmo processo
+        return True, bcrypt.hashpw(senha, bcrypt.gensalt(custo))
+    return True, None
@@ -0,0 +1,78 @@
+"""
+Fixtures dos testes da API: o app roda com o armazenamento em memória
+(ARMAZENAMENTO=memoria), sem Firebase nem credenciais.
+
+Uso (a partir da pasta backend/):
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+PASTA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ['ARMAZENAMENTO'] = 'memoria'
+os.environ['LATENCIA_RPC_MS'] = '0'
+os.environ.setdefault('SECRET_KEY', 'testes')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+sys.path.insert(0, PASTA_BACKEND)
+
+from trip import app  # noqa: E402
+from trip import firestore_service  # noqa: E402
+
+DONO = 'dono@teste.dev'
+CONVIDADO = 'convidado@teste.dev'
+OUTRO_CONVIDADO = 'outro@teste.dev'
+ESTRANHO = 'estranho@teste.dev'
+
+
+def h(viajante):
+    return {'X-Viajante-ID': viajante}
+
+
+@pytest.fixture
+def db():
+    """Cliente em memória zerado a cada teste (e o cache de acesso junto)."""
+    cliente = firestore_service.db
+    cliente._colecoes.clear()
+    cliente._versoes.clear()
+    firestore_service._cache_acesso._itens.clear()
+    return cliente
+
+
+@pytest.fixture
+def cliente(db):
+    app.config.update(TESTING=True, MAIL_SUPPRESS_SEND=True)
+    return app.test_client()
+
+
+@pytest.fixture
+def viagem(db):
+    """
+    Viagem do DONO com uma atividade, compartilhada (convite aceito) com
+    CONVIDADO e OUTRO_CONVIDADO. Devolve (viagem_id, atividade_id).
+    """
+    viajantes = db.collection('viajantes')
+    for email in (DONO, CONVIDADO, OUTRO_CONVIDADO, ESTRANHO):
+        viajantes.document(email).set({'nome': email.split('@')[0], 'email': email, 'is_verified': True})
+
+    viagem_ref = viajantes.document(DONO).collection('viagens').document()
+    viagem_ref.set({
+        'destino': 'Lisboa',
+        'valor_total': 1000.0,
+        'valor_restante': 900.0,
+        'total_gasto': 100.0,
+        'id_viajante': DONO,
+        'convidados_aceitos': [CONVIDADO, OUTRO_CONVIDADO],
+    })
+    atividade_ref = viagem_ref.collection('atividades').document()
+    atividade_ref.set({'nome_atividade': 'Museu', 'valor_atividade': 100.0})
+
+    for convidado in (CONVIDADO, OUTRO_CONVIDADO):
+        viajantes.document(convidado).collection('convites_viagem').document().set({
+            'owner_id': DONO, 'viagem_id': viagem_ref.id, 'status': 'aceito',
+        })
+        viagem_ref.collection('convites').document(convidado).set({'guest_id': convidado, 'status': 'aceito'})
+
+    return viagem_ref.id, atividade_ref.id
@@ -0,0 +1,45 @@
+"""Convidados de uma viagem: o que eles podem ver."""
+from conftest import CONVIDADO, DONO, ESTRANHO, h
+
+
+def test_atividade_compartilhada_nao_expoe_convidados_aceitos(cliente, viagem):
+    viagem_id, atividade_id = viagem
+
+    resposta = cliente.get(f'/api/viagem/{DONO}/{viagem_id}/atividade/{atividade_id}', headers=h(CONVIDADO))
+
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert dados['viagem']['destino'] == 'Lisboa'
+    assert 'convidados_aceitos' not in dados['viagem']
+
+
+def test_atividade_do_dono_nao_expoe_convidados_aceitos(cliente, viagem):
+    viagem_id, atividade_id = viagem
+
+    resposta = cliente.get(f'/api/viagem/{viagem_id}/atividade/{atividade_id}', headers=h(DONO))
+
+    assert resposta.status_code == 200
+    assert 'convidados_aceitos' not in resposta.get_json()['viagem']
+
+
+def test_detalhe_compartilhado_sem_convite_nao_le_atividades(cliente, viagem, db):
+    viagem_id, _ = viagem
+    db.zerar_contadores()
+
+    resposta = cliente.get(f'/api/viagem/{DONO}/{viagem_id}', headers=h(ESTRANHO))
+
+    assert resposta.status_code == 403
+    # Só o documento da viagem (a autorização vem dele)
+    assert db.contadores['leituras'] == 1
+
+
+def test_detalhe_compartilhado_para_convidado(cliente, viagem):
+    viagem_id, _ = viagem
+
+    resposta = cliente.get(f'/api/viagem/{DONO}/{viagem_id}', headers=h(CONVIDADO))
+
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert dados['papel'] == 'convidado'
+    assert dados['qtd_atividades'] == 1
+    assert len(dados['atividades']) == 1
@@ -0,0 +1,45 @@
+"""PUT /api/viagem/<id>/editar: só destino e valor_total."""
+import pytest
+
+from conftest import DONO, h
+
+from trip import firestore_service
+
+
+def test_editar_destino_e_valor_total(cliente, viagem):
+    viagem_id, _ = viagem
+
+    resposta = cliente.put(f'/api/viagem/{viagem_id}/editar', json={'destino': 'Porto', 'valor_total': 2000.0},
+                           headers=h(DONO))
+
+    assert resposta.status_code == 200
+    dados = firestore_service.get_viagem_ref(DONO, viagem_id).get().to_dict()
+    assert dados['destino'] == 'Porto'
+    assert dados['valor_restante'] == 1900.0
+
+
+@pytest.mark.parametrize('campos', [
+    {'total_gasto': 0.0},
+    {'valor_restante': 1000000.0},
+    {'excluida': False},
+    {'versao': 0},
+    {'convidados_aceitos': ['intruso@teste.dev']},
+    {'destino': 'Porto', 'id_viajante': 'intruso@teste.dev'},
+])
+def test_editar_recusa_campos_do_backend(cliente, viagem, campos):
+    viagem_id, _ = viagem
+    viagem_ref = firestore_service.get_viagem_ref(DONO, viagem_id)
+    antes = viagem_ref.get().to_dict()
+
+    resposta = cliente.put(f'/api/viagem/{viagem_id}/editar', json=campos, headers=h(DONO))
+
+    assert resposta.status_code == 400
+    assert viagem_ref.get().to_dict() == antes
+
+
+def test_editar_sem_corpo(cliente, viagem):
+    viagem_id, _ = viagem
+
+    resposta = cliente.put(f'/api/viagem/{viagem_id}/editar', json={}, headers=h(DONO))
+
+    assert resposta.status_code == 400
@@ -0,0 +1,73 @@
+"""POST /api/viagem/<id>/atividades:bulk: NDJSON/CSV em streaming, JSON limitado."""
+import io
+
+from conftest import DONO, h
+
+from trip import importacao
+
+
+def _importar(cliente, viagem_id, corpo, mimetype):
+    return cliente.post(f'/api/viagem/{viagem_id}/atividades:bulk', data=corpo, content_type=mimetype,
+                        headers=h(DONO))
+
+
+def test_csv_malformado_vira_erro_da_linha(cliente, viagem):
+    viagem_id, _ = viagem
+    campo_enorme = 'x' * 200_000  # passa do field_size_limit do módulo csv
+    corpo = f'nome_atividade,valor_atividade\nTrem,10\n"{campo_enorme}",20\nBarco,30\n'.encode()
+
+    resposta = _importar(cliente, viagem_id, corpo, 'text/csv')
+
+    assert resposta.status_code == 201
+    dados = resposta.get_json()
+    assert dados['importadas'] == 2
+    assert dados['recusadas'] == 1
+    assert dados['erros'][0]['linha'] == 3
+    assert dados['erros'][0]['erro'].startswith('CSV malformado')
+
+
+def test_ndjson_no_corpo(cliente, viagem):
+    viagem_id, _ = viagem
+    corpo = (
+        b'{"nome_atividade": "Trem", "valor_atividade": 10}\n'
+        b'\n'
+        b'{"nome_atividade": "Barco", \n'
+        b'{"nome_atividade": "Museu 2", "valor_atividade": "12,50"}\n'
+    )
+
+    resposta = _importar(cliente, viagem_id, corpo, 'application/x-ndjson')
+
+    assert resposta.status_code == 201
+    dados = resposta.get_json()
+    assert dados['importadas'] == 2
+    assert dados['erros'] == [{'linha': 3, 'erro': 'JSON inválido'}]
+    assert dados['novo_restante'] == 1000.0 - 100.0 - 10.0 - 12.5
+
+
+def test_ndjson_como_upload(cliente, viagem):
+    viagem_id, _ = viagem
+    arquivo = (io.BytesIO(b'{"nome_atividade": "Trem", "valor_atividade": 10}\n'), 'atividades.ndjson')
+
+    resposta = cliente.post(f'/api/viagem/{viagem_id}/atividades:bulk', data={'arquivo': arquivo},
+                            content_type='multipart/form-data', headers=h(DONO))
+
+    assert resposta.status_code == 201
+    assert resposta.get_json()['importadas'] == 1
+
+
+def test_lista_json_acima_do_limite(cliente, viagem, monkeypatch):
+    viagem_id, _ = viagem
+    monkeypatch.setattr(importacao, 'MAX_BYTES_JSON', 64)
+    corpo = b'[' + b','.join([b'{"nome_atividade": "Trem", "valor_atividade": 10}'] * 5) + b']'
+
+    resposta = _importar(cliente, viagem_id, corpo, 'application/json')
+
+    assert resposta.status_code == 413
+
+
+def test_lista_json_invalida(cliente, viagem):
+    viagem_id, _ = viagem
+
+    resposta = _importar(cliente, viagem_id, b'[{"nome_atividade": ', 'application/json')
+
+    assert resposta.status_code == 400
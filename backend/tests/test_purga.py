@@ -0,0 +1,36 @@
+"""Purga das viagens excluídas."""
+from conftest import CONVIDADO, DONO, OUTRO_CONVIDADO
+
+from trip import firestore_service
+
+
+def _convites(db, convidado):
+    return list(db.collection('viajantes').document(convidado).collection('convites_viagem').stream())
+
+
+def test_purga_apaga_convites_sem_espelho(db, viagem):
+    viagem_id, _ = viagem
+    viagem_ref = firestore_service.get_viagem_ref(DONO, viagem_id)
+    # Convite pendente sem espelho (o espelho é gravado em separado e pode faltar)
+    db.collection('viajantes').document(OUTRO_CONVIDADO).collection('convites_viagem').document().set({
+        'owner_id': DONO, 'viagem_id': viagem_id, 'status': 'pendente',
+    })
+    viagem_ref.collection('convites').document(OUTRO_CONVIDADO).delete()
+
+    firestore_service.purgar_viagem(DONO, viagem_id)
+
+    assert not viagem_ref.get().exists
+    assert _convites(db, CONVIDADO) == []
+    assert _convites(db, OUTRO_CONVIDADO) == []
+    assert list(viagem_ref.collection('convites').stream()) == []
+    assert list(viagem_ref.collection('atividades').stream()) == []
+
+
+def test_purga_mantem_convites_de_outras_viagens(db, viagem):
+    viagem_id, _ = viagem
+    outro = db.collection('viajantes').document(CONVIDADO).collection('convites_viagem').document()
+    outro.set({'owner_id': DONO, 'viagem_id': 'outra-viagem', 'status': 'aceito'})
+
+    firestore_service.purgar_viagem(DONO, viagem_id)
+
+    assert [doc.id for doc in _convites(db, CONVIDADO)] == [outro.id]
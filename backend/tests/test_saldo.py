@@ -0,0 +1,28 @@
+"""Saldo da viagem (total_gasto/valor_restante)."""
+from conftest import DONO, h
+
+from trip import firestore_service
+
+
+def test_recalcular_soma_as_atividades(cliente, viagem, db):
+    viagem_id, _ = viagem
+    atividades = firestore_service.get_atividades_ref(DONO, viagem_id)
+    atividades.document().set({'nome_atividade': 'Trem', 'valor_atividade': 50.0})
+
+    resposta = cliente.post(f'/api/viagem/{viagem_id}/recalcular', headers=h(DONO))
+
+    assert resposta.status_code == 200
+    assert resposta.get_json()['novo_restante'] == 850.0
+    dados = firestore_service.get_viagem_ref(DONO, viagem_id).get().to_dict()
+    assert dados['total_gasto'] == 150.0
+
+
+def test_recalcular_viagem_excluida(cliente, viagem):
+    viagem_id, _ = viagem
+    viagem_ref = firestore_service.get_viagem_ref(DONO, viagem_id)
+    viagem_ref.update({'excluida': True})
+
+    resposta = cliente.post(f'/api/viagem/{viagem_id}/recalcular', headers=h(DONO))
+
+    assert resposta.status_code == 404
+    assert viagem_ref.get().to_dict()['total_gasto'] == 100.0
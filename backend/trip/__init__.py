@@ -17,8 +17,16 @@ raiz_projeto = os.path.dirname(pasta_backend)
 
 # Carrega o .env da raiz do projeto
 load_dotenv(os.path.join(raiz_projeto, '.env'))
+
+# Logs estruturados, com amostragem e escrita fora da requisição (ver trip/registro.py)
+from trip.registro import configurar_logs
+configurar_logs()
 app = Flask(__name__,)
 
+# jsonify/get_json com orjson (datetime do Firestore e Decimal incluídos). Ver trip/serializacao.py
+from trip.serializacao import ProvedorJSON
+app.json = ProvedorJSON(app)
+
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
@@ -36,35 +44,54 @@ os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 
 # --- INICIALIZAÇÃO DO FIREBASE FIREBASE ---
 
+# ARMAZENAMENTO=firestore (padrão) usa o Firestore de verdade;
+# ARMAZENAMENTO=memoria usa o ClienteMemoria (testes de carga/benchmarks sem credenciais).
+# LATENCIA_RPC_MS simula a latência de cada RPC no backend em memória.
+app.config['ARMAZENAMENTO'] = os.getenv('ARMAZENAMENTO', 'firestore').lower()
+
 FIREBASE_KEY_PATH = os.path.join(raiz_projeto, 'firebase-key.json')
 
-# NOVO: Verifica se o aplicativo Firebase padrão já foi inicializado
-# Se a lista de aplicativos inicializados estiver vazia, inicializamos.
-if not _apps:
-    
-    if os.path.exists(FIREBASE_KEY_PATH):
-        # Modo de Desenvolvimento Local
-        try:
-            cred = credentials.Certificate(FIREBASE_KEY_PATH)
-            initialize_app(cred)
-            print("Firebase inicializado com chave de serviço local.")
-        except Exception as e:
-            print(f"Erro ao inicializar Firebase (Local): {e}")
-    else:
-        # Modo de Produção (Cloud Run)
-        try:
-            initialize_app() 
-            print("Firebase inicializado com Credenciais Padrão (ADC).")
-        except Exception as e:
-            print(f"Aviso: Falha ao inicializar o Firebase com ADC: {e}")
-
-
-# Cria o cliente do Firestore, que será usado para todas as operações de banco de dados
-db = firestore.client()
+if app.config['ARMAZENAMENTO'] == 'memoria':
+    from trip.armazenamento import ClienteMemoria
+
+    db = ClienteMemoria(latencia_rpc=float(os.getenv('LATENCIA_RPC_MS', '0')) / 1000)
+    print("Armazenamento em memória ativado (sem Firebase).")
+
+else:
+    # NOVO: Verifica se o aplicativo Firebase padrão já foi inicializado
+    # Se a lista de aplicativos inicializados estiver vazia, inicializamos.
+    if not _apps:
+        
+        if os.path.exists(FIREBASE_KEY_PATH):
+            # Modo de Desenvolvimento Local
+            try:
+                cred = credentials.Certificate(FIREBASE_KEY_PATH)
+                initialize_app(cred)
+                print("Firebase inicializado com chave de serviço local.")
+            except Exception as e:
+                print(f"Erro ao inicializar Firebase (Local): {e}")
+        else:
+            # Modo de Produção (Cloud Run)
+            try:
+                initialize_app() 
+                print("Firebase inicializado com Credenciais Padrão (ADC).")
+            except Exception as e:
+                print(f"Aviso: Falha ao inicializar o Firebase com ADC: {e}")
+
+    # Cria o cliente do Firestore, que será usado para todas as operações de banco de dados
+    db = firestore.client()
 
 # Armazena o cliente do DB no objeto 'app' para ser acessado nas rotas
 app.config['FIREBASE_DB'] = db
 
+# Leituras/escritas no Firestore por requisição (headers + log). METRICAS_STORE=0 desliga.
+from trip.metricas import iniciar_metricas
+iniciar_metricas(app)
+
+# gzip/brotli nas respostas de texto acima de COMPRESSAO_MINIMO bytes. COMPRESSAO=0 desliga.
+from trip.compressao import iniciar_compressao
+iniciar_compressao(app)
+
 oauth = OAuth(app)
 
 client_id = os.getenv('GOOGLE_CLIENT_ID')
@@ -96,6 +123,10 @@ google = oauth.register(
 )
 
 mail = Mail(app)
+# As rotas fazem hash/verificação pelo pool de trip/senhas.py; o Flask-Bcrypt
+# fica com o mesmo custo (BCRYPT_CUSTO) para quem ainda o usa (ex.: benchmarks)
+from trip.senhas import CUSTO as CUSTO_BCRYPT
+app.config['BCRYPT_LOG_ROUNDS'] = CUSTO_BCRYPT
 bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 # login_manager.login_view = 'acesso'
@@ -121,4 +152,8 @@ def load_viajante(doc_id):
     return None
 
 # essa importação tem que vir aqui embaixo, pq primeiro eu preciso criar o app para depois importar os routes
-from trip import routes
\ No newline at end of file
+from trip import routes
+
+# Retoma exclusões de viagem que não terminaram (purga em segundo plano)
+from trip.firestore_service import retomar_purgas_pendentes
+retomar_purgas_pendentes()
\ No newline at end of file
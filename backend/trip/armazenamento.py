@@ -0,0 +1,697 @@
+"""
+Backends de armazenamento do firestore_service.
+
+O firestore_service conversa com um "cliente" no formato do cliente do Firestore
+(collection/collection_group/document/get/set/update/delete/stream/batch/
+transaction/get_all).
+Em produção esse cliente é o firestore.client(); com ARMAZENAMENTO=memoria ele é
+o ClienteMemoria abaixo, que guarda tudo num dicionário do processo.
+
+O ClienteMemoriaAsync é a versão no formato do AsyncClient (get/stream com
+await), usada pelo firestore_service_async sobre os mesmos dados.
+
+O ClienteMemoria serve para testes de carga e benchmarks sem credenciais:
+  - é thread-safe (um RLock protege os dados); transações são otimistas como
+    no Firestore: rodam sem o lock e repetem se algo lido mudou até o commit;
+  - pode simular a latência de rede de cada RPC (latencia_rpc, em segundos),
+    para que os números reflitam o custo dos round trips;
+  - conta RPCs, leituras e escritas de documentos como o Firestore cobra
+    (ver ClienteMemoria.contadores).
+"""
+import asyncio
+import copy
+import math
+import random
+import string
+import threading
+import time
+from datetime import datetime, timezone
+
+from firebase_admin import firestore
+from google.api_core.exceptions import Aborted, NotFound
+from google.cloud.firestore_v1 import transforms
+
+from trip import metricas
+
+
+def transactional(funcao):
+    """
+    Equivalente ao @firestore.transactional que também aceita a transação do
+    ClienteMemoria. Use no lugar do decorator do Firestore no firestore_service.
+    Também contabiliza as escritas e o tempo da transação (trip/metricas.py).
+    """
+    escritas = [0]
+
+    def funcao_contabilizada(transaction, *args, **kwargs):
+        resultado = funcao(transaction, *args, **kwargs)
+        # Escritas enfileiradas na transação (entram no commit logo em seguida)
+        escritas[0] = len(transaction)
+        return resultado
+
+    funcao_firestore = firestore.transactional(funcao_contabilizada)
+
+    def executar(transaction, *args, **kwargs):
+        inicio = time.perf_counter()
+        store_ms_antes = metricas.store_ms_atual()
+        if isinstance(transaction, TransacaoMemoria):
+            resultado = transaction.executar(funcao_contabilizada, *args, **kwargs)
+        else:
+            resultado = funcao_firestore(transaction, *args, **kwargs)
+        metricas.registrar_transacao(inicio, store_ms_antes, escritas[0])
+        return resultado
+
+    return executar
+
+
+# -------------------------------------------------------------
+# Cliente em memória
+# -------------------------------------------------------------
+
+_CARACTERES_ID = string.ascii_letters + string.digits
+
+
+def _agora_utc():
+    return datetime.now(timezone.utc)
+
+
+def _novo_id():
+    # Mesmo formato dos Auto-IDs do Firestore (20 caracteres alfanuméricos)
+    return ''.join(random.choice(_CARACTERES_ID) for _ in range(20))
+
+
+class _Registro:
+    __slots__ = ('dados', 'create_time', 'update_time')
+
+    def __init__(self, dados, agora):
+        self.dados = dados
+        self.create_time = agora
+        self.update_time = agora
+
+
+class ClienteMemoria:
+    """Cliente em memória com a parte da API do Firestore usada pelo projeto."""
+
+    def __init__(self, latencia_rpc=0.0):
+        self.latencia_rpc = latencia_rpc
+        self._lock = threading.RLock()
+        # {caminho_da_colecao: {doc_id: _Registro}}
+        self._colecoes = {}
+        # Contador de escritas por documento, coleção e grupo de coleções
+        # (validação das transações: ver TransacaoMemoria)
+        self._versoes = {}
+        self.contadores = {'rpcs': 0, 'leituras': 0, 'escritas': 0}
+
+    # --- API pública (mesmos nomes do cliente do Firestore) ---
+
+    def collection(self, nome):
+        return RefColecaoMemoria(self, nome)
+
+    def collection_group(self, nome):
+        """Query sobre todas as coleções chamadas 'nome', em qualquer nível."""
+        return QueryMemoria(self, nome, grupo=True)
+
+    def batch(self):
+        return LoteMemoria(self)
+
+    def transaction(self):
+        return TransacaoMemoria(self)
+
+    def zerar_contadores(self):
+        with self._lock:
+            self.contadores = {'rpcs': 0, 'leituras': 0, 'escritas': 0}
+
+    def get_all(self, refs, field_paths=None, transaction=None):
+        refs = list(refs)
+        self._rpc()
+        with self._lock:
+            snapshots = [self._ler(ref, field_paths, transaction) for ref in refs]
+        for snap in snapshots:
+            yield snap
+
+    # --- internos ---
+
+    def _rpc(self):
+        """Simula o round trip de uma chamada ao servidor."""
+        with self._lock:
+            self.contadores['rpcs'] += 1
+        if self.latencia_rpc:
+            time.sleep(self.latencia_rpc)
+
+    async def _rpc_assincrono(self):
+        """Como _rpc, mas a espera não bloqueia o event loop."""
+        with self._lock:
+            self.contadores['rpcs'] += 1
+        if self.latencia_rpc:
+            await asyncio.sleep(self.latencia_rpc)
+
+    def _contar_leituras(self, quantidade):
+        # Como no Firestore, uma query sem resultados ainda cobra 1 leitura
+        with self._lock:
+            self.contadores['leituras'] += max(1, quantidade)
+
+    def _observar(self, transaction, chave):
+        """Guarda na transação a versão do que foi lido (a primeira vista vale)."""
+        if isinstance(transaction, TransacaoMemoria):
+            transaction._lidas.setdefault(chave, self._versoes.get(chave, 0))
+
+    def _ler(self, ref, field_paths=None, transaction=None):
+        self._observar(transaction, ref.path)
+        self._contar_leituras(1)
+        registro = self._colecoes.get(ref._caminho_colecao, {}).get(ref.id)
+        if registro is None:
+            return SnapshotMemoria(ref, None, None, None)
+
+        dados = registro.dados
+        if field_paths is not None:
+            dados = {k: v for k, v in dados.items() if k in field_paths}
+        return SnapshotMemoria(ref, copy.deepcopy(dados), registro.create_time, registro.update_time)
+
+    def _aplicar(self, escritas, lidas=None):
+        """
+        Aplica uma lista de escritas (op, ref, dados, merge) de forma atômica.
+        lidas ({chave: versão}, de uma transação): se algo mudou desde a
+        leitura, nada é gravado e retorna False.
+        """
+        with self._lock:
+            if lidas and any(self._versoes.get(chave, 0) != versao for chave, versao in lidas.items()):
+                return False
+
+            for op, ref, _, _ in escritas:
+                if op == 'update' and ref.id not in self._colecoes.get(ref._caminho_colecao, {}):
+                    raise NotFound(f"No document to update: {ref.path}")
+
+            self.contadores['escritas'] += len(escritas)
+            agora = _agora_utc()
+            for op, ref, dados, merge in escritas:
+                for chave in (ref.path, ref._caminho_colecao, ('grupo', ref.parent.id)):
+                    self._versoes[chave] = self._versoes.get(chave, 0) + 1
+
+                colecao = self._colecoes.setdefault(ref._caminho_colecao, {})
+                registro = colecao.get(ref.id)
+
+                if op == 'delete':
+                    colecao.pop(ref.id, None)
+                    continue
+
+                if registro is None:
+                    registro = _Registro({}, agora)
+                    colecao[ref.id] = registro
+                elif op == 'set' and not merge:
+                    registro.dados = {}
+
+                _aplicar_campos(registro.dados, dados, agora, caminhos_com_ponto=(op == 'update'))
+                registro.update_time = agora
+            return True
+
+    def _documentos(self, caminho_colecao, grupo=False):
+        """
+        [(caminho_da_colecao, doc_id, _Registro)] da coleção; com grupo=True,
+        de todas as coleções cujo nome (último trecho do caminho) é caminho_colecao.
+        """
+        with self._lock:
+            if grupo:
+                caminhos = [c for c in self._colecoes if c.rsplit('/', 1)[-1] == caminho_colecao]
+            else:
+                caminhos = [caminho_colecao]
+            return [
+                (caminho, doc_id, registro)
+                for caminho in caminhos
+                for doc_id, registro in self._colecoes.get(caminho, {}).items()
+            ]
+
+
+def _aplicar_campos(destino, campos, agora, caminhos_com_ponto=False):
+    """Grava 'campos' em 'destino' tratando as transformações do Firestore."""
+    for chave, valor in campos.items():
+        partes = chave.split('.') if caminhos_com_ponto else [chave]
+        alvo = destino
+        for parte in partes[:-1]:
+            alvo = alvo.setdefault(parte, {})
+        campo = partes[-1]
+
+        if valor is transforms.DELETE_FIELD:
+            alvo.pop(campo, None)
+        elif valor is transforms.SERVER_TIMESTAMP:
+            alvo[campo] = agora
+        elif isinstance(valor, transforms.Increment):
+            alvo[campo] = (alvo.get(campo) or 0) + valor.value
+        elif isinstance(valor, transforms.ArrayUnion):
+            atual = list(alvo.get(campo) or [])
+            atual.extend(v for v in valor.values if v not in atual)
+            alvo[campo] = atual
+        elif isinstance(valor, transforms.ArrayRemove):
+            alvo[campo] = [v for v in (alvo.get(campo) or []) if v not in valor.values]
+        else:
+            alvo[campo] = copy.deepcopy(valor)
+
+
+class SnapshotMemoria:
+    def __init__(self, reference, dados, create_time, update_time):
+        self.reference = reference
+        self._dados = dados
+        self.create_time = create_time
+        self.update_time = update_time
+        self.read_time = _agora_utc()
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._dados is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._dados) if self._dados is not None else None
+
+    def get(self, campo):
+        return (self._dados or {}).get(campo)
+
+
+class RefDocumentoMemoria:
+    def __init__(self, cliente, caminho_colecao, doc_id):
+        self._cliente = cliente
+        self._caminho_colecao = caminho_colecao
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._caminho_colecao}/{self.id}"
+
+    @property
+    def parent(self):
+        return RefColecaoMemoria(self._cliente, self._caminho_colecao)
+
+    def collection(self, nome):
+        return RefColecaoMemoria(self._cliente, f"{self.path}/{nome}")
+
+    def get(self, field_paths=None, transaction=None):
+        self._cliente._rpc()
+        with self._cliente._lock:
+            return self._cliente._ler(self, field_paths, transaction)
+
+    def set(self, dados, merge=False):
+        self._cliente._rpc()
+        self._cliente._aplicar([('set', self, dados, merge)])
+
+    def update(self, dados):
+        self._cliente._rpc()
+        self._cliente._aplicar([('update', self, dados, False)])
+
+    def delete(self):
+        self._cliente._rpc()
+        self._cliente._aplicar([('delete', self, None, False)])
+
+    def __eq__(self, outro):
+        return isinstance(outro, RefDocumentoMemoria) and outro.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+
+_OPERADORES = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    'in': lambda a, b: a in b,
+    'not-in': lambda a, b: a not in b,
+    'array_contains': lambda a, b: isinstance(a, list) and b in a,
+    'array_contains_any': lambda a, b: isinstance(a, list) and any(v in a for v in b),
+}
+
+_AUSENTE = object()
+
+
+def _valor_campo(doc_id, dados, campo):
+    if campo == '__name__':
+        return doc_id
+    alvo = dados
+    for parte in campo.split('.'):
+        if not isinstance(alvo, dict) or parte not in alvo:
+            return _AUSENTE
+        alvo = alvo[parte]
+    return alvo
+
+
+class QueryMemoria:
+    ASCENDING = 'ASCENDING'
+    DESCENDING = 'DESCENDING'
+
+    def __init__(self, cliente, caminho_colecao, filtros=(), ordens=(), limite=None, cursor=None, grupo=False):
+        self._cliente = cliente
+        self._caminho_colecao = caminho_colecao
+        self._grupo = grupo  # collection_group: caminho_colecao é só o nome da coleção
+        self._filtros = tuple(filtros)
+        self._ordens = tuple(ordens)
+        self._limite = limite
+        self._cursor = cursor
+
+    def _copiar(self, **mudancas):
+        atributos = dict(
+            filtros=self._filtros, ordens=self._ordens, limite=self._limite, cursor=self._cursor,
+            grupo=self._grupo,
+        )
+        atributos.update(mudancas)
+        return QueryMemoria(self._cliente, self._caminho_colecao, **atributos)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copiar(filtros=self._filtros + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copiar(ordens=self._ordens + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copiar(limite=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        cursor = document_fields_or_snapshot
+        if isinstance(cursor, SnapshotMemoria):
+            cursor = {'__name__': cursor.id, **(cursor.to_dict() or {})}
+        return self._copiar(cursor=dict(cursor))
+
+    def _selecionar(self):
+        """[(caminho_da_colecao, doc_id, _Registro)] que a query devolve, sem cobrar leituras."""
+        ordens = list(self._ordens)
+        if '__name__' not in [campo for campo, _ in ordens]:
+            ordens.append(('__name__', self.ASCENDING))
+
+        selecionados = []
+        for caminho, doc_id, registro in self._cliente._documentos(self._caminho_colecao, self._grupo):
+            dados = registro.dados
+            ok = True
+            for campo, op, valor in self._filtros:
+                atual = _valor_campo(doc_id, dados, campo)
+                if atual is _AUSENTE or not _OPERADORES[op](atual, valor):
+                    ok = False
+                    break
+            # Como no Firestore, documentos sem o campo ordenado ficam de fora
+            if ok and all(_valor_campo(doc_id, dados, campo) is not _AUSENTE for campo, _ in ordens):
+                selecionados.append((caminho, doc_id, registro))
+
+        for campo, direcao in reversed(ordens):
+            selecionados.sort(
+                key=lambda item: _valor_campo(item[1], item[2].dados, campo),
+                reverse=(direcao == self.DESCENDING),
+            )
+
+        if self._cursor is not None:
+            chave_cursor = [self._cursor.get(campo) for campo, _ in ordens]
+            descendente = [direcao == self.DESCENDING for _, direcao in ordens]
+
+            def depois_do_cursor(item):
+                for valor_cursor, desc, (campo, _) in zip(chave_cursor, descendente, ordens):
+                    atual = _valor_campo(item[1], item[2].dados, campo)
+                    if valor_cursor is None or atual == valor_cursor:
+                        continue
+                    return (atual < valor_cursor) if desc else (atual > valor_cursor)
+                return False
+
+            selecionados = [item for item in selecionados if depois_do_cursor(item)]
+
+        if self._limite is not None:
+            selecionados = selecionados[:self._limite]
+        return selecionados
+
+    def _resultados(self):
+        selecionados = self._selecionar()
+        self._cliente._contar_leituras(len(selecionados))
+
+        return [
+            SnapshotMemoria(
+                RefDocumentoMemoria(self._cliente, caminho, doc_id),
+                copy.deepcopy(registro.dados),
+                registro.create_time,
+                registro.update_time,
+            )
+            for caminho, doc_id, registro in selecionados
+        ]
+
+    def _chave_versao(self):
+        return ('grupo', self._caminho_colecao) if self._grupo else self._caminho_colecao
+
+    def stream(self, transaction=None):
+        self._cliente._rpc()
+        with self._cliente._lock:
+            self._cliente._observar(transaction, self._chave_versao())
+            snapshots = self._resultados()
+        for snap in snapshots:
+            yield snap
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction=transaction))
+
+    # Agregações (query.count()/sum()/avg() do Firestore)
+    def count(self, alias=None):
+        return AgregacaoMemoria(self).count(alias)
+
+    def sum(self, field_ref, alias=None):
+        return AgregacaoMemoria(self).sum(field_ref, alias)
+
+    def avg(self, field_ref, alias=None):
+        return AgregacaoMemoria(self).avg(field_ref, alias)
+
+
+class ResultadoAgregacaoMemoria:
+    def __init__(self, alias, value):
+        self.alias = alias
+        self.value = value
+
+
+class AgregacaoMemoria:
+    """
+    AggregationQuery em memória. Como no Firestore, sum/avg só consideram
+    valores numéricos, e a consulta cobra 1 leitura a cada 1000 documentos
+    (mínimo 1). get() devolve [[ResultadoAgregacaoMemoria, ...]].
+    """
+
+    def __init__(self, query):
+        self._query = query
+        self._agregacoes = []
+
+    def _adicionar(self, tipo, campo, alias):
+        alias = alias or f"field_{len(self._agregacoes) + 1}"
+        self._agregacoes.append((tipo, campo, alias))
+        return self
+
+    def count(self, alias=None):
+        return self._adicionar('count', None, alias)
+
+    def sum(self, field_ref, alias=None):
+        return self._adicionar('sum', field_ref, alias)
+
+    def avg(self, field_ref, alias=None):
+        return self._adicionar('avg', field_ref, alias)
+
+    def _calcular(self, transaction=None):
+        cliente = self._query._cliente
+        with cliente._lock:
+            cliente._observar(transaction, self._query._chave_versao())
+            docs = [registro.dados for _, _, registro in self._query._selecionar()]
+            cliente._contar_leituras(math.ceil(len(docs) / 1000))
+
+            resultados = []
+            for tipo, campo, alias in self._agregacoes:
+                if tipo == 'count':
+                    resultados.append(ResultadoAgregacaoMemoria(alias, len(docs)))
+                    continue
+                numeros = [
+                    d[campo] for d in docs
+                    if isinstance(d.get(campo), (int, float)) and not isinstance(d.get(campo), bool)
+                ]
+                if tipo == 'sum':
+                    valor = sum(numeros)
+                else:
+                    valor = sum(numeros) / len(numeros) if numeros else None
+                resultados.append(ResultadoAgregacaoMemoria(alias, valor))
+        return [resultados]
+
+    def get(self, transaction=None):
+        self._query._cliente._rpc()
+        return self._calcular(transaction)
+
+
+class RefColecaoMemoria(QueryMemoria):
+    def __init__(self, cliente, caminho):
+        super().__init__(cliente, caminho)
+
+    @property
+    def id(self):
+        return self._caminho_colecao.rsplit('/', 1)[-1]
+
+    @property
+    def path(self):
+        return self._caminho_colecao
+
+    @property
+    def parent(self):
+        """Documento que contém a subcoleção (None numa coleção da raiz)."""
+        if '/' not in self._caminho_colecao:
+            return None
+        caminho_documento = self._caminho_colecao.rsplit('/', 1)[0]
+        caminho_pai, doc_id = caminho_documento.rsplit('/', 1)
+        return RefDocumentoMemoria(self._cliente, caminho_pai, doc_id)
+
+    def document(self, document_id=None):
+        return RefDocumentoMemoria(self._cliente, self._caminho_colecao, document_id or _novo_id())
+
+
+class LoteMemoria:
+    """WriteBatch em memória: as escritas só valem no commit, todas de uma vez."""
+
+    def __init__(self, cliente):
+        self._cliente = cliente
+        self._escritas = []
+
+    def set(self, ref, dados, merge=False):
+        self._escritas.append(('set', ref, dados, merge))
+
+    def update(self, ref, dados):
+        self._escritas.append(('update', ref, dados, False))
+
+    def delete(self, ref):
+        self._escritas.append(('delete', ref, None, False))
+
+    def commit(self):
+        self._cliente._rpc()
+        escritas, self._escritas = self._escritas, []
+        self._cliente._aplicar(escritas)
+        return escritas
+
+    def __len__(self):
+        return len(self._escritas)
+
+
+class TransacaoMemoria(LoteMemoria):
+    """
+    Transação em memória, otimista como a do Firestore. A função transacional
+    roda sem o lock do cliente (a latência simulada das leituras não trava as
+    outras requisições); cada leitura com transaction=... guarda a versão do
+    documento (ou da coleção, nas queries) que viu. No commit, com o lock, se
+    algo lido mudou, nada é gravado e a função roda de novo, até
+    MAX_TENTATIVAS vezes (depois, Aborted, como no Firestore).
+    """
+
+    MAX_TENTATIVAS = 5
+
+    def __init__(self, cliente):
+        super().__init__(cliente)
+        self._lidas = {}
+
+    def executar(self, funcao, *args, **kwargs):
+        for tentativa in range(self.MAX_TENTATIVAS):
+            self._escritas = []
+            self._lidas = {}
+            resultado = funcao(self, *args, **kwargs)
+
+            self._cliente._rpc()
+            escritas, self._escritas = self._escritas, []
+            if self._cliente._aplicar(escritas, self._lidas):
+                return resultado
+
+            # Espera aleatória crescente, para as transações em conflito não colidirem de novo
+            time.sleep(random.uniform(0, max(self._cliente.latencia_rpc, 0.001)) * 2 ** tentativa)
+
+        raise Aborted(f"Transação abortada após {self.MAX_TENTATIVAS} tentativas (contenção)")
+
+
+# --- VERSÃO ASSÍNCRONA (formato do firestore.AsyncClient) ---
+
+class ClienteMemoriaAsync:
+    """Visão assíncrona de um ClienteMemoria: mesmos dados, contadores e latência."""
+
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def collection(self, nome):
+        return RefColecaoMemoriaAsync(self._cliente.collection(nome))
+
+    async def get_all(self, refs, field_paths=None, transaction=None):
+        refs = [ref._ref for ref in refs]
+        await self._cliente._rpc_assincrono()
+        with self._cliente._lock:
+            snapshots = [self._cliente._ler(ref, field_paths) for ref in refs]
+        for snap in snapshots:
+            yield snap
+
+
+class RefDocumentoMemoriaAsync:
+    def __init__(self, ref):
+        self._ref = ref
+
+    @property
+    def id(self):
+        return self._ref.id
+
+    @property
+    def path(self):
+        return self._ref.path
+
+    def collection(self, nome):
+        return RefColecaoMemoriaAsync(self._ref.collection(nome))
+
+    async def get(self, field_paths=None, transaction=None):
+        cliente = self._ref._cliente
+        await cliente._rpc_assincrono()
+        with cliente._lock:
+            return cliente._ler(self._ref, field_paths)
+
+
+class QueryMemoriaAsync:
+    def __init__(self, query):
+        self._query = query
+
+    def where(self, *args, **kwargs):
+        return QueryMemoriaAsync(self._query.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs):
+        return QueryMemoriaAsync(self._query.order_by(*args, **kwargs))
+
+    def limit(self, count):
+        return QueryMemoriaAsync(self._query.limit(count))
+
+    def start_after(self, document_fields_or_snapshot):
+        return QueryMemoriaAsync(self._query.start_after(document_fields_or_snapshot))
+
+    async def stream(self, transaction=None):
+        cliente = self._query._cliente
+        await cliente._rpc_assincrono()
+        with cliente._lock:
+            snapshots = self._query._resultados()
+        for snap in snapshots:
+            yield snap
+
+    async def get(self, transaction=None):
+        return [snap async for snap in self.stream(transaction=transaction)]
+
+    def count(self, alias=None):
+        return AgregacaoMemoriaAsync(self._query).count(alias)
+
+    def sum(self, field_ref, alias=None):
+        return AgregacaoMemoriaAsync(self._query).sum(field_ref, alias)
+
+    def avg(self, field_ref, alias=None):
+        return AgregacaoMemoriaAsync(self._query).avg(field_ref, alias)
+
+
+class AgregacaoMemoriaAsync(AgregacaoMemoria):
+    async def get(self, transaction=None):
+        await self._query._cliente._rpc_assincrono()
+        return self._calcular()
+
+
+class RefColecaoMemoriaAsync(QueryMemoriaAsync):
+    @property
+    def id(self):
+        return self._query.id
+
+    @property
+    def path(self):
+        return self._query.path
+
+    def document(self, document_id=None):
+        return RefDocumentoMemoriaAsync(self._query.document(document_id))
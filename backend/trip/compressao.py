@@ -0,0 +1,107 @@
+"""
+Compressão das respostas (gzip ou brotli, negociada pelo Accept-Encoding).
+
+Um hook after_request comprime o corpo das respostas de texto (JSON, HTML,
+CSS, JS...) que passam de COMPRESSAO_MINIMO bytes (padrão 1024); abaixo
+disso o cabeçalho do gzip e o custo de CPU não compensam.
+
+- brotli só é usado se o pacote Brotli estiver instalado e o cliente pedir;
+  senão, gzip.
+- Respostas em streaming (/api/exportar), 204/304 e as que já têm
+  Content-Encoding passam sem mudança.
+- Um ETag forte vira fraco (W/"..."): o corpo comprimido não é byte a byte
+  igual ao original. Por isso os 304 comparam com contains_weak.
+
+COMPRESSAO=0 desliga (o hook nem é registrado).
+"""
+import gzip
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Brotli é opcional; sem ele fica só o gzip
+    brotli = None
+
+ATIVO = os.getenv('COMPRESSAO', '1') != '0'
+MINIMO_BYTES = int(os.getenv('COMPRESSAO_MINIMO', '1024'))
+
+# Níveis para compressão por requisição (rápidos, com boa taxa em JSON/HTML)
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 5
+
+TIPOS_COMPRIMIVEIS = {
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'image/svg+xml',
+    'text/csv',
+    'text/css',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+}
+
+
+def codificacoes_aceitas():
+    """Codificações que podemos usar, na ordem de preferência do servidor."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def escolher_codificacao():
+    """'br', 'gzip' ou None, conforme o Accept-Encoding da requisição."""
+    aceitas = request.accept_encodings
+    for codificacao in codificacoes_aceitas():
+        if aceitas[codificacao] > 0:
+            return codificacao
+    return None
+
+
+def comprimir(dados, codificacao):
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=QUALIDADE_BROTLI)
+    return gzip.compress(dados, compresslevel=NIVEL_GZIP, mtime=0)
+
+
+def _comprimivel(response):
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    return response.mimetype in TIPOS_COMPRIMIVEIS
+
+
+def _comprimir_resposta(response):
+    if request.method == 'HEAD' or not _comprimivel(response):
+        return response
+
+    # Mesmo quando não comprime (corpo pequeno, cliente sem gzip), a resposta
+    # depende do Accept-Encoding para os caches intermediários
+    response.vary.add('Accept-Encoding')
+
+    dados = response.get_data()
+    if len(dados) < MINIMO_BYTES:
+        return response
+
+    codificacao = escolher_codificacao()
+    if codificacao is None:
+        return response
+
+    response.set_data(comprimir(dados, codificacao))
+    response.headers['Content-Encoding'] = codificacao
+
+    etag, fraco = response.get_etag()
+    if etag and not fraco:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def iniciar_compressao(app):
+    """Registra o hook de compressão (só se COMPRESSAO estiver ligado)."""
+    if not ATIVO:
+        return
+
+    app.after_request(_comprimir_resposta)
@@ -0,0 +1,86 @@
+"""
+Formatação da exportação das viagens e atividades de um viajante.
+
+Recebe os registros de firestore_service.iterar_exportacao (um gerador) e
+gera o arquivo aos pedaços (blocos de ~TAMANHO_BLOCO caracteres) para a rota
+/api/exportar devolver como resposta em streaming.
+"""
+import csv
+import io
+import json
+
+TAMANHO_BLOCO = 32 * 1024
+
+COLUNAS_CSV = [
+    'tipo', 'viagem_id', 'destino', 'valor_total', 'total_gasto', 'valor_restante',
+    'atividade_id', 'nome_atividade', 'valor_atividade',
+]
+
+
+def _linha_viagem(dados):
+    return {
+        'tipo': 'viagem',
+        'viagem_id': dados.get('doc_id'),
+        'destino': dados.get('destino'),
+        'valor_total': dados.get('valor_total'),
+        'total_gasto': dados.get('total_gasto'),
+        'valor_restante': dados.get('valor_restante'),
+    }
+
+
+def _linha_atividade(dados):
+    return {
+        'tipo': 'atividade',
+        'viagem_id': dados.get('viagem_id'),
+        'atividade_id': dados.get('doc_id'),
+        'nome_atividade': dados.get('nome_atividade'),
+        'valor_atividade': dados.get('valor_atividade'),
+    }
+
+
+def _linhas(registros):
+    for tipo, dados in registros:
+        yield _linha_viagem(dados) if tipo == 'viagem' else _linha_atividade(dados)
+
+
+def _em_blocos(pedacos):
+    """Junta pedaços pequenos em blocos, para não fazer uma escrita por linha."""
+    bloco, tamanho = [], 0
+    for pedaco in pedacos:
+        bloco.append(pedaco)
+        tamanho += len(pedaco)
+        if tamanho >= TAMANHO_BLOCO:
+            yield ''.join(bloco)
+            bloco, tamanho = [], 0
+    if bloco:
+        yield ''.join(bloco)
+
+
+def gerar_ndjson(registros):
+    """Um objeto JSON por linha."""
+    return _em_blocos(
+        json.dumps(linha, ensure_ascii=False, default=str) + '\n' for linha in _linhas(registros)
+    )
+
+
+def gerar_csv(registros):
+    """CSV com cabeçalho; viagens e atividades na mesma tabela (coluna 'tipo')."""
+    return _em_blocos(_linhas_csv(registros))
+
+
+def _linhas_csv(registros):
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=COLUNAS_CSV)
+
+    def _esvaziar():
+        # Entrega o que foi escrito e reaproveita o mesmo buffer
+        texto = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return texto
+
+    escritor.writeheader()
+    yield _esvaziar()
+    for linha in _linhas(registros):
+        escritor.writerow(linha)
+        yield _esvaziar()
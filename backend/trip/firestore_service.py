@@ -1,16 +1,194 @@
-from trip import app
+from trip import app, metricas
+from trip.armazenamento import transactional
+from trip.utility import percentual_e_cor
+from firebase_admin import firestore
+from flask import g, has_request_context
+from collections import OrderedDict
 from datetime import datetime, timezone
+import logging
+import math
+import os
+import queue
+import threading
+import time
 
 
 # -------------------------------------------------------------
 # 1. CONFIGURAÇÃO BASE
 # -------------------------------------------------------------
 # Obtém o cliente do Firestore que foi inicializado em __init__.py
+# (ou o ClienteMemoria, se ARMAZENAMENTO=memoria)
 db = app.config['FIREBASE_DB']
 
 # Referência à Coleção Principal
 VIAJANTES_REF = db.collection('viajantes') 
 
+logger = logging.getLogger('trip.firestore')
+
+
+# --- OPERAÇÕES CONTABILIZADAS (ver trip/metricas.py) ---
+# Toda leitura/escrita deste módulo passa por estes wrappers, que somam
+# documentos e tempo na requisição atual. Com METRICAS_STORE=0 eles só
+# repassam a chamada ao cliente.
+
+def _obter(doc_ref, campos=None, transaction=None):
+    """doc_ref.get() contabilizado (1 leitura)."""
+    if not metricas.ATIVO:
+        return doc_ref.get(field_paths=campos, transaction=transaction)
+    inicio = time.perf_counter()
+    snap = doc_ref.get(field_paths=campos, transaction=transaction)
+    metricas.registrar('gets', inicio, leituras=1)
+    return snap
+
+
+def _iterar(query, transaction=None):
+    """query.stream() contabilizado (1 leitura por documento, mínimo 1)."""
+    if not metricas.ATIVO:
+        yield from query.stream(transaction=transaction)
+        return
+
+    quantidade = 0
+    tempo = 0.0
+    stream = query.stream(transaction=transaction)
+    try:
+        while True:
+            inicio = time.perf_counter()
+            try:
+                doc = next(stream)
+            except StopIteration:
+                break
+            finally:
+                tempo += time.perf_counter() - inicio
+            quantidade += 1
+            yield doc
+    finally:
+        # Também quando quem consome para no meio (any(), break) ou a query falha.
+        # Soma o tempo gasto dentro do stream (sem contar o processamento de quem consome)
+        metricas.registrar('queries', time.perf_counter() - tempo, leituras=max(1, quantidade))
+
+
+def _obter_varios(refs, transaction=None):
+    """db.get_all() contabilizado (1 leitura por documento, um só round trip)."""
+    if not metricas.ATIVO:
+        return list(db.get_all(refs, transaction=transaction))
+    inicio = time.perf_counter()
+    snapshots = list(db.get_all(refs, transaction=transaction))
+    metricas.registrar('gets', inicio, leituras=len(snapshots))
+    return snapshots
+
+
+def _agregar(agregacao, transaction=None):
+    """
+    Executa uma AggregationQuery (count/sum/avg) e devolve {alias: valor}.
+    A consulta precisa ter um count(alias='qtd'): o Firestore cobra 1 leitura
+    a cada 1000 documentos agregados (mínimo 1).
+    """
+    if not metricas.ATIVO:
+        return {item.alias: item.value for item in agregacao.get(transaction=transaction)[0]}
+    inicio = time.perf_counter()
+    resultado = agregacao.get(transaction=transaction)
+    valores = {item.alias: item.value for item in resultado[0]}
+    metricas.registrar('queries', inicio, leituras=max(1, math.ceil((valores.get('qtd') or 0) / 1000)))
+    return valores
+
+
+def _gravar(doc_ref, operacao, dados=None):
+    """doc_ref.set/update/delete contabilizado (1 escrita)."""
+    chamada = doc_ref.delete if operacao == 'delete' else lambda: getattr(doc_ref, operacao)(dados)
+    if not metricas.ATIVO:
+        chamada()
+        return
+    inicio = time.perf_counter()
+    chamada()
+    metricas.registrar('commits', inicio, escritas=1)
+
+
+def _commit(batch):
+    """batch.commit() contabilizado (1 escrita por operação do lote)."""
+    if not metricas.ATIVO:
+        batch.commit()
+        return
+    escritas = len(batch)
+    inicio = time.perf_counter()
+    batch.commit()
+    metricas.registrar('commits', inicio, escritas=escritas)
+
+
+class _LoteEscritas:
+    """
+    Acumula escritas num WriteBatch e faz commit a cada 'tamanho' operações
+    (o Firestore aceita no máximo 500 por commit).
+    """
+
+    def __init__(self, tamanho=500):
+        self.tamanho = tamanho
+        self.batch = db.batch()
+        self.operacoes = 0
+        self.gravadas = 0  # operações já confirmadas em commits anteriores
+
+    def set(self, ref, dados):
+        self.batch.set(ref, dados)
+        self._contar()
+
+    def delete(self, ref):
+        self.batch.delete(ref)
+        self._contar()
+
+    def _contar(self):
+        self.operacoes += 1
+        if self.operacoes >= self.tamanho:
+            self.commit()
+
+    def commit(self):
+        if self.operacoes:
+            _commit(self.batch)
+            self.gravadas += self.operacoes
+        self.batch = db.batch()
+        self.operacoes = 0
+
+
+# --- CACHE DE DOCUMENTOS POR REQUISIÇÃO (IDENTITY MAP EM flask.g) ---
+# Dentro de uma mesma requisição, o mesmo documento lido várias vezes
+# (checagem de acesso + rota, por exemplo) vem do Firestore uma vez só.
+# Escritas feitas por este módulo removem as entradas afetadas.
+
+def _cache_requisicao():
+    """Dicionário {(caminho, campos): snapshot} da requisição atual (None fora de requisição)."""
+    if not has_request_context():
+        return None
+    if not hasattr(g, '_firestore_docs'):
+        g._firestore_docs = {}
+    return g._firestore_docs
+
+
+def _ler_documento(doc_ref, campos=None):
+    """
+    Lê um documento passando pelo cache da requisição.
+    Um snapshot completo já carregado também atende leituras com projeção.
+    """
+    cache = _cache_requisicao()
+    chave_campos = tuple(campos) if campos is not None else None
+
+    if cache is not None:
+        snap = cache.get((doc_ref.path, None)) or cache.get((doc_ref.path, chave_campos))
+        if snap is not None:
+            return snap
+
+    snap = _obter(doc_ref, campos)
+    if cache is not None:
+        cache[(doc_ref.path, chave_campos)] = snap
+    return snap
+
+
+def _invalidar_documentos(*doc_refs):
+    """Remove do cache da requisição as entradas dos documentos escritos."""
+    cache = _cache_requisicao()
+    if not cache:
+        return
+    caminhos = {ref.path for ref in doc_refs}
+    for chave in [c for c in cache if c[0] in caminhos]:
+        del cache[chave]
+
 # -------------------------------------------------------------
 # 2. FUNÇÕES DE VIAJANTE (Usuário)
 # -------------------------------------------------------------
@@ -22,7 +200,9 @@ def criar_viajante(dados_viajante):
     doc_id = dados_viajante['email']
     
     # .set() cria ou sobrescreve o documento
-    VIAJANTES_REF.document(doc_id).set(dados_viajante)
+    doc_ref = VIAJANTES_REF.document(doc_id)
+    _gravar(doc_ref, 'set', dados_viajante)
+    _invalidar_documentos(doc_ref)
     return doc_id
 
 
@@ -31,7 +211,7 @@ def buscar_viajante_por_doc_id(doc_id):
     Busca um viajante diretamente pelo ID do Documento (Doc ID).
     Usado pelo user_loader e quando o Doc ID é conhecido.
     """
-    doc = VIAJANTES_REF.document(doc_id).get()
+    doc = _ler_documento(VIAJANTES_REF.document(doc_id))
     
     if doc.exists:
         viajante_data = doc.to_dict()
@@ -55,7 +235,16 @@ def atualizar_status_verificacao(email, status):
     """Atualiza o campo is_verified de um viajante."""
     
     # Supondo que o ID do documento seja o e-mail
-    VIAJANTES_REF.document(email).update({'is_verified': status})
+    doc_ref = VIAJANTES_REF.document(email)
+    _gravar(doc_ref, 'update', {'is_verified': status})
+    _invalidar_documentos(doc_ref)
+
+
+def atualizar_senha_viajante(email, senha_hash):
+    """Grava um novo hash de senha (ex.: refeito com um custo bcrypt maior)."""
+    doc_ref = VIAJANTES_REF.document(email)
+    _gravar(doc_ref, 'update', {'senha': senha_hash})
+    _invalidar_documentos(doc_ref)
 
 # -------------------------------------------------------------
 # 3. FUNÇÕES DE VIAGEM E ATIVIDADE (Lógica de Subcoleção)
@@ -70,6 +259,11 @@ def get_atividades_ref(viajante_id, viagem_id):
     return get_viagem_ref(viajante_id, viagem_id).collection('atividades')
 
 
+def _viagem_excluida(dados_viagem):
+    """True se a viagem tem a marca de exclusão (tombstone) e aguarda a purga."""
+    return bool((dados_viagem or {}).get('excluida'))
+
+
 # --- NOVO: BUSCAR VIAGEM ---
 def buscar_viagem_por_id(viajante_id, viagem_id):
     # .strip() remove espaços em branco ou quebras de linha invisíveis
@@ -78,16 +272,16 @@ def buscar_viagem_por_id(viajante_id, viagem_id):
     # Busca direta na coleção raiz 'viagens'
     viagem_ref = VIAJANTES_REF.document(viajante_id).collection('viagens').document(id_limpo)
 
-    print(f"--- DEBUG: Buscando no caminho CORRETO: viajantes/{viajante_id}/viagens/{id_limpo} ---")
+    logger.debug("Buscando viagem em viajantes/%s/viagens/%s", viajante_id, id_limpo)
 
-    viagem_doc = viagem_ref.get()
+    viagem_doc = _ler_documento(viagem_ref)
     
-    if viagem_doc.exists:
+    if viagem_doc.exists and not _viagem_excluida(viagem_doc.to_dict()):
         viagem_data = viagem_doc.to_dict()
         viagem_data['doc_id'] = viagem_doc.id 
         
         # Busca a subcoleção
-        atividades_snapshot = viagem_ref.collection('atividades').stream()
+        atividades_snapshot = _iterar(viagem_ref.collection('atividades'))
         
         lista_atividades = []
         for doc in atividades_snapshot:
@@ -96,118 +290,321 @@ def buscar_viagem_por_id(viajante_id, viagem_id):
             lista_atividades.append(ativid_data)
         
         viagem_data['atividades'] = lista_atividades
-        print(f"--- SUCESSO: Encontrada viagem com {len(lista_atividades)} atividades ---")
+        logger.debug("Viagem %s encontrada com %d atividades", id_limpo, len(lista_atividades))
         return viagem_data
     
-    print(f"--- ERRO: Viagem {id_limpo} não encontrada dentro do viajante {viajante_id} ---")
+    logger.debug("Viagem %s não encontrada dentro do viajante %s", id_limpo, viajante_id)
     return None
 
 
+# --- BUSCAR SÓ O DOCUMENTO DA VIAGEM (SEM ATIVIDADES) ---
+def buscar_cabecalho_viagem(viajante_id, viagem_id, campos=None):
+    """
+    Busca apenas o documento da viagem, sem ler a subcoleção 'atividades'.
+    Usado por rotas que só precisam checar existência/posse ou ler poucos campos.
+
+    campos (opcional): lista de campos a projetar (ex.: ['id_viajante']);
+    o Firestore devolve só esses campos do documento.
+    """
+    id_limpo = viagem_id.strip()
+    if campos is not None:
+        # A marca de exclusão precisa vir junto para filtrarmos viagens em purga
+        campos = list(campos) + ['excluida']
+    viagem_doc = _ler_documento(get_viagem_ref(viajante_id, id_limpo), campos)
+
+    if viagem_doc.exists and not _viagem_excluida(viagem_doc.to_dict()):
+        viagem_data = viagem_doc.to_dict() or {}
+        if campos is not None:
+            # Snapshot completo vindo do cache: devolve só os campos pedidos
+            viagem_data = {k: v for k, v in viagem_data.items() if k in campos}
+        viagem_data['doc_id'] = viagem_doc.id
+        return viagem_data
+
+    return None
+
+
+# --- LISTAR ATIVIDADES PAGINADAS (CURSOR) ---
+def listar_atividades_paginadas(viajante_id, viagem_id, limite, start_after=None):
+    """
+    Lista uma página de atividades da viagem, ordenada pelo ID do documento
+    (ordem estável, a mesma do .stream() sem ordenação).
+
+    start_after: doc_id da última atividade da página anterior (cursor).
+    Retorna (lista_atividades, proximo_cursor); proximo_cursor é None na última página.
+    """
+    # '__name__' é o caminho especial do ID do documento (FieldPath.document_id())
+    query = get_atividades_ref(viajante_id, viagem_id).order_by('__name__')
+    if start_after:
+        query = query.start_after({'__name__': start_after})
+
+    # Pedimos um item a mais só para saber se existe próxima página
+    docs = list(_iterar(query.limit(limite + 1)))
+
+    atividades = []
+    for doc in docs[:limite]:
+        ativid_data = doc.to_dict() or {}
+        ativid_data['doc_id'] = doc.id
+        atividades.append(ativid_data)
+
+    proximo_cursor = atividades[-1]['doc_id'] if len(docs) > limite else None
+    return atividades, proximo_cursor
+
+
+# --- SALDO DA VIAGEM (DELTA TRANSACIONAL) ---
+# SALDO_AGREGACAO=1 (padrão): somas completas das atividades usam a agregação
+# sum() do Firestore, e só o número volta do servidor. O sum() ignora valores
+# que não são números, por isso 'valor_atividade' é sempre gravado como float
+# (_com_valor_float). Com 0, as atividades são baixadas e somadas aqui
+# (necessário se ainda houver valores antigos gravados como texto).
+SALDO_AGREGACAO = os.getenv('SALDO_AGREGACAO', '1') != '0'
+
+
+def _valor_float(valor):
+    """Converte o valor de uma atividade/viagem em float (None/'' viram 0.0)."""
+    try:
+        return float(valor or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _com_valor_float(dados_atividade):
+    """Cópia dos dados com 'valor_atividade' (se presente) convertido em float."""
+    if 'valor_atividade' not in dados_atividade:
+        return dados_atividade
+    return {**dados_atividade, 'valor_atividade': _valor_float(dados_atividade['valor_atividade'])}
+
+
+def _somar_atividades(atividades_ref, transaction=None):
+    """Soma 'valor_atividade' de todas as atividades da viagem."""
+    if SALDO_AGREGACAO:
+        agregacao = atividades_ref.count(alias='qtd').sum('valor_atividade', alias='total')
+        return _valor_float(_agregar(agregacao, transaction=transaction).get('total'))
+
+    total = 0.0
+    for doc in _iterar(atividades_ref, transaction=transaction):
+        total += _valor_float((doc.to_dict() or {}).get('valor_atividade'))
+    return total
+
+
+def _campos_de_saldo(valor_total, total_gasto):
+    """
+    Monta os campos de saldo que ficam gravados no documento da viagem.
+    'percentual_gasto' e 'cor' vão junto, para as leituras (perfil, detalhe)
+    usarem direto em vez de calcular a cada requisição.
+    """
+    valor_restante = round(valor_total - total_gasto, 2)
+    percentual, cor = percentual_e_cor(valor_total, valor_restante)
+    return {
+        'total_gasto': round(total_gasto, 2),
+        'valor_restante': valor_restante,
+        'percentual_gasto': percentual,
+        'cor': cor,
+    }
+
+
+def _total_gasto_na_transacao(transaction, viagem_ref, dados_viagem):
+    """
+    Retorna o 'total_gasto' armazenado na viagem.
+    Viagens antigas (sem o campo) são somadas uma única vez dentro da própria
+    transação; a partir daí o saldo passa a ser mantido só por deltas.
+    """
+    if 'total_gasto' in dados_viagem:
+        return _valor_float(dados_viagem.get('total_gasto'))
+
+    return _somar_atividades(viagem_ref.collection('atividades'), transaction=transaction)
+
+
+def _obter_atividade_e_viagem(transaction, atividade_ref, viagem_ref):
+    """Lê atividade e viagem num único get_all dentro da transação."""
+    snapshots = {
+        snap.reference.path: snap
+        for snap in _obter_varios([atividade_ref, viagem_ref], transaction=transaction)
+    }
+    return snapshots[atividade_ref.path], snapshots[viagem_ref.path]
+
+
+# 'versao' conta as mudanças na viagem e nas atividades dela. Como toda mutação
+# de atividade regrava o documento da viagem, o update_time dele (usado no ETag
+# das rotas de detalhe e do perfil) muda junto, mesmo quando o saldo não muda.
+def _nova_versao():
+    return {'versao': firestore.Increment(1)}
+
+
+def _aplicar_delta_saldo(transaction, viagem_ref, viagem_snap, delta):
+    """
+    Soma 'delta' ao total gasto da viagem e grava o novo saldo na transação.
+    Retorna o novo valor restante.
+    """
+    dados_viagem = viagem_snap.to_dict() or {}
+    valor_total = _valor_float(dados_viagem.get('valor_total'))
+    total_gasto = _total_gasto_na_transacao(transaction, viagem_ref, dados_viagem) + delta
+
+    campos = _campos_de_saldo(valor_total, total_gasto)
+    transaction.update(viagem_ref, {**campos, **_nova_versao()})
+    return campos['valor_restante']
+
+
 # --- NOVO: CRIAR ATIVIDADE ---
 def criar_atividade(viajante_id, viagem_id, dados_atividade):
     """
-    Adiciona um novo documento à subcoleção 'atividades' da viagem especificada.
-    Retorna o ID do documento da atividade criada.
+    Adiciona um novo documento à subcoleção 'atividades' da viagem especificada
+    e ajusta o saldo da viagem na mesma transação.
+    Retorna (id da atividade criada, novo valor restante) ou (None, None)
+    se a viagem não existir.
     """
+    viagem_ref = get_viagem_ref(viajante_id, viagem_id)
+    dados_atividade = _com_valor_float(dados_atividade)
+
     # 1. Cria a referência do documento primeiro (isso gera o ID automaticamente)
     doc_ref = get_atividades_ref(viajante_id, viagem_id).document()
-    
-    # 2. Salva os dados usando a referência criada
-    doc_ref.set(dados_atividade)
-    
-    # 3. Agora o doc_ref existe e possui o atributo .id
-    return doc_ref.id
+
+    @transactional
+    def _criar(transaction):
+        # Leituras precisam vir antes de qualquer escrita na transação
+        viagem_snap = _obter(viagem_ref, transaction=transaction)
+        if not viagem_snap.exists or _viagem_excluida(viagem_snap.to_dict()):
+            return None
+
+        delta = dados_atividade.get('valor_atividade', 0.0)
+        novo_restante = _aplicar_delta_saldo(transaction, viagem_ref, viagem_snap, delta)
+        transaction.set(doc_ref, dados_atividade)
+        return novo_restante
+
+    novo_restante = _criar(db.transaction())
+    _invalidar_documentos(viagem_ref, doc_ref)
+    if novo_restante is None:
+        return None, None
+
+    return doc_ref.id, novo_restante
 
 
 # --- NOVO: DELETAR ATIVIDADE ---
 def deletar_atividade(viajante_id, viagem_id, atividade_id):
     """
-    Deleta um documento de Atividade específico na subcoleção.
+    Deleta um documento de Atividade específico na subcoleção e desconta
+    o valor dela do saldo da viagem na mesma transação (uma leitura com
+    get_all e um commit; nunca fica atividade apagada com saldo antigo).
     """
-    
+    viagem_ref = get_viagem_ref(viajante_id, viagem_id)
     atividade_doc_ref = get_atividades_ref(viajante_id, viagem_id).document(atividade_id)
-    
-    # Opcional: verifica se existe antes, mas o delete() é seguro mesmo que não exista.
-    if not atividade_doc_ref.get().exists:
-        return False
-        
-    atividade_doc_ref.delete()
-    
-    return True
 
+    @transactional
+    def _deletar(transaction):
+        atividade_snap, viagem_snap = _obter_atividade_e_viagem(transaction, atividade_doc_ref, viagem_ref)
+        if not atividade_snap.exists:
+            return False
 
-# --- ATUALIZAR VALOR RESTANTE (EXISTENTE) ---
+        if viagem_snap.exists:
+            valor = _valor_float((atividade_snap.to_dict() or {}).get('valor_atividade'))
+            _aplicar_delta_saldo(transaction, viagem_ref, viagem_snap, -valor)
+
+        transaction.delete(atividade_doc_ref)
+        return True
+
+    deletou = _deletar(db.transaction())
+    _invalidar_documentos(viagem_ref, atividade_doc_ref)
+    return deletou
+
+
+# --- RECALCULAR VALOR RESTANTE (SOMA COMPLETA) ---
 def atualizar_valor_restante(viajante_id, viagem_id):
     """
-    Calcula o total gasto nas atividades e atualiza o campo 'valor_restante' 
-    no Documento Viagem pai dentro da subcoleção do viajante.
+    Recalcula do zero o total gasto nas atividades e atualiza 'total_gasto' e
+    'valor_restante' no Documento Viagem pai.
+    As mutações de atividade já mantêm o saldo por delta; esta função fica
+    como operação explícita de "recompute" (ex.: correção de dados antigos).
+    A soma e a gravação ficam na mesma transação, para um delta concorrente
+    (criar/editar/apagar atividade) não ser sobrescrito por uma soma velha.
+    Retorna None se a viagem não existir (ou estiver excluída).
     """
     # 1. Obter a referência da viagem (Caminho: viajantes/ID/viagens/ID)
     viagem_ref = get_viagem_ref(viajante_id, viagem_id)
-    viagem_doc = viagem_ref.get()
-    
-    if not viagem_doc.exists:
-        print(f"ERRO: Viagem {viagem_id} não encontrada para o usuário {viajante_id}")
-        return None
-    
-    # Pegamos o valor total definido para a viagem
-    dados_viagem = viagem_doc.to_dict()
-    valor_total_viagem = float(dados_viagem.get('valor_total', 0.0))
 
-    # 2. Acessar a subcoleção de atividades usando nossa função de referência
-    # Usamos .stream() que é mais eficiente para leitura de coleções no Firestore
-    atividades_ref = get_atividades_ref(viajante_id, viagem_id)
-    atividades_docs = atividades_ref.stream()
-    
-    total_gasto_atividades = 0.0
-    
-    # 3. Somar os valores de cada atividade
-    for doc in atividades_docs:
-        ativid_data = doc.to_dict()
-        # Somamos o valor, garantindo que seja tratado como número (float)
-        total_gasto_atividades += float(ativid_data.get('valor_atividade', 0.0))
-        
-    # 4. Calcular o novo valor restante
-    # Usamos round(..., 2) para garantir que o valor fique bonito (ex: 150.50)
-    valor_restante = round(valor_total_viagem - total_gasto_atividades, 2)
-    
-    # 5. Atualizar o documento da Viagem no Firestore
-    viagem_ref.update({
-        'valor_restante': valor_restante
-    })
+    @transactional
+    def _recalcular(transaction):
+        viagem_doc = _obter(viagem_ref, transaction=transaction)
+        if not viagem_doc.exists or _viagem_excluida(viagem_doc.to_dict()):
+            return None
 
-    print(f"--- SINCRO: Viagem {viagem_id} atualizada. Restante: R$ {valor_restante} ---")
+        # Pegamos o valor total definido para a viagem
+        valor_total_viagem = _valor_float(viagem_doc.to_dict().get('valor_total'))
+
+        # 2. Somar os valores das atividades (agregação no servidor, ver SALDO_AGREGACAO)
+        total_gasto_atividades = _somar_atividades(get_atividades_ref(viajante_id, viagem_id), transaction=transaction)
+
+        # 3. Calcular o novo valor restante e atualizar o documento da Viagem
+        campos = _campos_de_saldo(valor_total_viagem, total_gasto_atividades)
+        transaction.update(viagem_ref, {**campos, **_nova_versao()})
+        return campos['valor_restante']
+
+    valor_restante = _recalcular(db.transaction())
+    _invalidar_documentos(viagem_ref)
+
+    if valor_restante is None:
+        logger.warning("Recalculo: viagem %s não encontrada para o usuário %s", viagem_id, viajante_id)
+        return None
+
+    logger.info("Saldo da viagem %s recalculado. Restante: R$ %s", viagem_id, valor_restante)
     return valor_restante
 
 
 def atualizar_viagem(viajante_id, viagem_id, dados):
-    """Atualiza os campos de um documento de viagem específico."""
+    """
+    Atualiza os campos de um documento de viagem específico.
+    Se 'valor_total' mudar, o saldo é refeito a partir do 'total_gasto'
+    armazenado, na mesma transação (sem somar as atividades de novo).
+    Retorna False se a viagem não existir (ou estiver excluída).
+    """
     viagem_ref = get_viagem_ref(viajante_id, viagem_id)
-    viagem_ref.update(dados)
 
+    @transactional
+    def _atualizar(transaction):
+        viagem_snap = _obter(viagem_ref, transaction=transaction)
+        if not viagem_snap.exists or _viagem_excluida(viagem_snap.to_dict()):
+            return False
+
+        campos = {**dados, **_nova_versao()}
+        if 'valor_total' in dados:
+            dados_viagem = viagem_snap.to_dict() or {}
+            total_gasto = _total_gasto_na_transacao(transaction, viagem_ref, dados_viagem)
+            campos.update(_campos_de_saldo(_valor_float(dados.get('valor_total')), total_gasto))
+        transaction.update(viagem_ref, campos)
+        return True
+
+    atualizou = _atualizar(db.transaction())
+    _invalidar_documentos(viagem_ref)
+    return atualizou
 
 
 def deletar_viagem_completa(viajante_id, viagem_id):
     """
-    Deleta uma viagem e todas as suas atividades (subcoleção).
+    Marca a viagem como excluída (tombstone) e agenda a purga em segundo plano.
+    A partir da marca a viagem some das leituras; as atividades, os espelhos de
+    convite e os convites dos convidados são apagados depois pelo purgador.
     """
     viagem_ref = get_viagem_ref(viajante_id, viagem_id)
-    
-    # 1. No Firestore, temos que deletar os documentos da subcoleção manualmente
-    atividades_ref = get_atividades_ref(viajante_id, viagem_id)
-    atividades = atividades_ref.get()
-    
-    for doc in atividades:
-        doc.reference.delete()
-    
-    # 2. Agora deletamos o documento da viagem em si
-    viagem_ref.delete()
+    now = _agora_utc()
+
+    # 1. Tombstone + registro da purga pendente no mesmo commit
+    batch = db.batch()
+    batch.update(viagem_ref, {'excluida': True, 'excluida_em': now})
+    batch.set(_get_purga_ref(viajante_id, viagem_id), {
+        'owner_id': viajante_id,
+        'viagem_id': viagem_id,
+        'created_at': now,
+    })
+    _commit(batch)
+    _invalidar_documentos(viagem_ref)
+    _cache_acesso.invalidar_viagem(viajante_id, viagem_id)
+
+    # 2. A remoção pesada acontece fora da requisição
+    agendar_purga_viagem(viajante_id, viagem_id)
     return True
 
 
 def buscar_atividade_por_id(viajante_id, viagem_id, atividade_id):
     """Busca os dados de uma atividade específica."""
-    doc = get_atividades_ref(viajante_id, viagem_id).document(atividade_id).get()
+    doc = _ler_documento(get_atividades_ref(viajante_id, viagem_id).document(atividade_id))
     if doc.exists:
         data = doc.to_dict()
         data['doc_id'] = doc.id
@@ -216,9 +613,74 @@ def buscar_atividade_por_id(viajante_id, viagem_id, atividade_id):
 
 
 def atualizar_atividade(viajante_id, viagem_id, atividade_id, dados):
-    """Atualiza os campos de uma atividade específica."""
+    """
+    Atualiza os campos de uma atividade específica.
+    Se 'valor_atividade' mudar, a diferença é aplicada ao saldo da viagem
+    na mesma transação (uma leitura com get_all e um commit).
+    Retorna False se a atividade não existir.
+    """
+    viagem_ref = get_viagem_ref(viajante_id, viagem_id)
     ref = get_atividades_ref(viajante_id, viagem_id).document(atividade_id)
-    ref.update(dados)
+    dados = _com_valor_float(dados)
+
+    @transactional
+    def _atualizar(transaction):
+        atividade_snap, viagem_snap = _obter_atividade_e_viagem(transaction, ref, viagem_ref)
+        if not atividade_snap.exists:
+            return False
+
+        if 'valor_atividade' in dados and viagem_snap.exists:
+            valor_antigo = _valor_float((atividade_snap.to_dict() or {}).get('valor_atividade'))
+            delta = dados['valor_atividade'] - valor_antigo
+            _aplicar_delta_saldo(transaction, viagem_ref, viagem_snap, delta)
+        elif viagem_snap.exists:
+            transaction.update(viagem_ref, _nova_versao())
+
+        transaction.update(ref, dados)
+        return True
+
+    atualizou = _atualizar(db.transaction())
+    _invalidar_documentos(viagem_ref, ref)
+    return atualizou
+
+
+# --- IMPORTAÇÃO EM LOTE ---
+TAMANHO_LOTE_IMPORTACAO = 500
+
+
+def importar_atividades(viajante_id, viagem_id, atividades):
+    """
+    Grava muitas atividades de uma vez (ex.: planilha), em WriteBatches de até
+    TAMANHO_LOTE_IMPORTACAO documentos, e recalcula o saldo uma única vez no fim.
+
+    atividades: iterável de dicts já validados (pode ser um gerador; é
+    consumido uma vez, sem ser carregado inteiro na memória).
+    Retorna (quantidade gravada, novo valor restante), ou (None, None) se a
+    viagem não existir.
+
+    Os lotes não são atômicos entre si: se um commit falhar, os anteriores
+    ficam gravados, e o saldo é recalculado mesmo assim antes de o erro subir
+    (se o recálculo também falhar, sobe o erro original da importação).
+    """
+    if not buscar_cabecalho_viagem(viajante_id, viagem_id, campos=['valor_total']):
+        return None, None
+
+    atividades_ref = get_atividades_ref(viajante_id, viagem_id)
+    lote = _LoteEscritas(TAMANHO_LOTE_IMPORTACAO)
+    try:
+        for dados in atividades:
+            lote.set(atividades_ref.document(), _com_valor_float(dados))
+        lote.commit()
+    except Exception:
+        if lote.gravadas:
+            try:
+                atualizar_valor_restante(viajante_id, viagem_id)
+            except Exception:
+                logger.exception("Importação: falha ao recalcular o saldo da viagem %s", viagem_id)
+        raise
+
+    novo_restante = atualizar_valor_restante(viajante_id, viagem_id) if lote.gravadas else None
+    return lote.gravadas, novo_restante
 
 
 def listar_viagens_por_viajante(viajante_id):
@@ -227,17 +689,64 @@ def listar_viagens_por_viajante(viajante_id):
     """
     # Acessa a subcoleção: viajantes/{id}/viagens
     viagens_ref = VIAJANTES_REF.document(viajante_id).collection('viagens')
-    docs = viagens_ref.get()
+    docs = _iterar(viagens_ref)
     
     viagens = []
     for doc in docs:
         dados = doc.to_dict()
+        if _viagem_excluida(dados):
+            continue  # Em purga: já não aparece para o dono
         dados['doc_id'] = doc.id # Importante para links de edição/exclusão
         viagens.append(dados)
         
     return viagens
 
 
+# --- EXPORTAÇÃO (STREAMING) ---
+TAMANHO_PAGINA_EXPORTACAO = 300
+
+
+def _paginar(colecao_ref, tamanho):
+    """
+    Percorre uma coleção em páginas ordenadas pelo ID (cursor start_after),
+    gerando um documento por vez: só uma página fica na memória.
+    """
+    ultimo_id = None
+    while True:
+        query = colecao_ref.order_by('__name__').limit(tamanho)
+        if ultimo_id is not None:
+            query = query.start_after({'__name__': ultimo_id})
+
+        docs = list(_iterar(query))
+        yield from docs
+        if len(docs) < tamanho:
+            return
+        ultimo_id = docs[-1].id
+
+
+def iterar_exportacao(viajante_id):
+    """
+    Gera ('viagem', dados) para cada viagem do viajante, seguida de
+    ('atividade', dados) para cada atividade dela. Tudo é lido em páginas de
+    TAMANHO_PAGINA_EXPORTACAO, então o uso de memória não depende do tamanho
+    da conta. Viagens em purga ficam de fora.
+    """
+    viagens_ref = VIAJANTES_REF.document(viajante_id).collection('viagens')
+    for viagem_doc in _paginar(viagens_ref, TAMANHO_PAGINA_EXPORTACAO):
+        dados_viagem = viagem_doc.to_dict() or {}
+        if _viagem_excluida(dados_viagem):
+            continue
+        dados_viagem['doc_id'] = viagem_doc.id
+        yield 'viagem', dados_viagem
+
+        atividades_ref = viagens_ref.document(viagem_doc.id).collection('atividades')
+        for atividade_doc in _paginar(atividades_ref, TAMANHO_PAGINA_EXPORTACAO):
+            dados_atividade = atividade_doc.to_dict() or {}
+            dados_atividade['doc_id'] = atividade_doc.id
+            dados_atividade['viagem_id'] = viagem_doc.id
+            yield 'atividade', dados_atividade
+
+
 def criar_nova_viagem(viajante_id, dados_viagem):
     """
     Cria um novo documento na subcoleção 'viagens' do viajante.
@@ -248,10 +757,16 @@ def criar_nova_viagem(viajante_id, dados_viagem):
     # 2. Cria uma referência de documento vazia dentro dessa subcoleção
     novo_doc_ref = viagens_ref.document()
     
-    # 3. Salva os dados
-    novo_doc_ref.set(dados_viagem)
+    # 3. Salva os dados (com o saldo inicial e o percentual/cor já calculados)
+    dados_viagem = {
+        **dados_viagem,
+        **_campos_de_saldo(
+            _valor_float(dados_viagem.get('valor_total')), _valor_float(dados_viagem.get('total_gasto'))
+        ),
+    }
+    _gravar(novo_doc_ref, 'set', dados_viagem)
     
-    print(f"--- SUCESSO: Viagem criada no caminho: viajantes/{viajante_id}/viagens/{novo_doc_ref.id} ---")
+    logger.debug("Viagem criada em viajantes/%s/viagens/%s", viajante_id, novo_doc_ref.id)
     
     # 4. Retorna o ID gerado
     return novo_doc_ref.id
@@ -259,6 +774,76 @@ def criar_nova_viagem(viajante_id, dados_viagem):
 
 # --- CONVITES (NOVO) ---
 
+class _CacheAcesso:
+    """
+    Cache LRU com TTL, local ao processo, para as decisões de tem_acesso_a_viagem.
+    Chave: (viajante_id, owner_id, viagem_id) -> bool.
+    As funções de convite deste módulo invalidam as entradas explicitamente; o TTL
+    limita o tempo que outra instância do serviço pode ficar com uma decisão antiga.
+    """
+
+    def __init__(self, tamanho_maximo, ttl_segundos):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl_segundos = ttl_segundos
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chave):
+        """Retorna a decisão em cache ou None (ausente/expirada)."""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or item[1] < time.monotonic():
+                if item is not None:
+                    del self._itens[chave]
+                self.misses += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return item[0]
+
+    def set(self, chave, permitido):
+        with self._lock:
+            self._itens[chave] = (permitido, time.monotonic() + self.ttl_segundos)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, viajante_id, owner_id, viagem_id):
+        with self._lock:
+            self._itens.pop((viajante_id, owner_id, viagem_id), None)
+
+    def invalidar_viagem(self, owner_id, viagem_id):
+        """Remove as decisões de todos os viajantes para uma viagem."""
+        with self._lock:
+            for chave in [c for c in self._itens if c[1] == owner_id and c[2] == viagem_id]:
+                del self._itens[chave]
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "taxa_acerto": round(self.hits / total, 4) if total else 0.0,
+                "tamanho": len(self._itens),
+                "tamanho_maximo": self.tamanho_maximo,
+                "ttl_segundos": self.ttl_segundos,
+            }
+
+
+_cache_acesso = _CacheAcesso(
+    tamanho_maximo=int(os.getenv('ACESSO_CACHE_TAMANHO', '10000')),
+    ttl_segundos=float(os.getenv('ACESSO_CACHE_TTL', '60')),
+)
+
+
+def estatisticas_cache_acesso():
+    """Contadores de hit/miss do cache de tem_acesso_a_viagem (para ajustar tamanho/TTL)."""
+    return _cache_acesso.estatisticas()
+
+
 def _agora_utc():
     return datetime.now(timezone.utc)
 
@@ -275,13 +860,13 @@ def criar_convite_viagem(owner_id, viagem_id, guest_id, destino_snapshot=None, o
     viajantes/{owner_id}/viagens/{viagem_id}/convites/{guest_id}
     """
     # 1) valida existência do convidado
-    guest_doc = VIAJANTES_REF.document(guest_id).get()
+    guest_doc = _ler_documento(VIAJANTES_REF.document(guest_id))
     if not guest_doc.exists:
         return None, "convidado_nao_encontrado"
 
     # 2) valida existência da viagem do dono
-    viagem_doc = get_viagem_ref(owner_id, viagem_id).get()
-    if not viagem_doc.exists:
+    viagem_doc = _ler_documento(get_viagem_ref(owner_id, viagem_id))
+    if not viagem_doc.exists or _viagem_excluida(viagem_doc.to_dict()):
         return None, "viagem_nao_encontrada"
 
     now = _agora_utc()
@@ -301,12 +886,13 @@ def criar_convite_viagem(owner_id, viagem_id, guest_id, destino_snapshot=None, o
 
     # 3) cria convite com Auto-ID
     convite_ref = get_convites_ref(guest_id).document()
-    convite_ref.set(convite_data)
+    _gravar(convite_ref, 'set', convite_data)
+    _cache_acesso.invalidar(guest_id, owner_id, viagem_id)
 
     # 4) espelho (recomendado)
     try:
         espelho_ref = get_viagem_ref(owner_id, viagem_id).collection("convites").document(guest_id)
-        espelho_ref.set({
+        _gravar(espelho_ref, 'set', {
             "guest_id": guest_id,
             "status": "pendente",
             "created_at": now,
@@ -328,7 +914,7 @@ def listar_convites_do_viajante(viajante_id, status=None):
     if status:
         query = ref.where("status", "==", status)
 
-    docs = query.stream()
+    docs = _iterar(query)
     convites = []
     for doc in docs:
         data = doc.to_dict() or {}
@@ -337,43 +923,107 @@ def listar_convites_do_viajante(viajante_id, status=None):
     return convites
 
 
+def _convidados_aceitos_na_transacao(transaction, owner_id, viagem_id, dados_viagem):
+    """
+    Conjunto de convidados com acesso, guardado em 'convidados_aceitos' na viagem.
+    Viagens antigas (sem o campo) são semeadas a partir dos convites aceitos
+    (viajantes/{guest_id}/convites_viagem, a fonte de verdade; o espelho pode
+    faltar), lidos dentro da própria transação com uma query de grupo de coleções.
+    (No Firestore, essa query precisa de índice com escopo de grupo de coleções
+    em convites_viagem: owner_id + viagem_id + status.)
+    """
+    if 'convidados_aceitos' in dados_viagem:
+        return set(dados_viagem.get('convidados_aceitos') or [])
+
+    convites = _iterar(
+        db.collection_group('convites_viagem')
+        .where("owner_id", "==", owner_id)
+        .where("viagem_id", "==", viagem_id)
+        .where("status", "==", "aceito"),
+        transaction=transaction,
+    )
+    # viajantes/{guest_id}/convites_viagem/{convite_id}
+    return {doc.reference.parent.parent.id for doc in convites}
+
+
 def responder_convite(viajante_id, convite_id, acao):
     """
     Convidado aceita/recusa um convite.
     acao: "aceitar" | "recusar"
+
+    O convite, o espelho e a lista 'convidados_aceitos' da viagem são
+    atualizados na mesma transação. Recusar um convite só tira o acesso se
+    o convidado não tiver outro convite aceito para a mesma viagem.
     """
     if acao not in ("aceitar", "recusar"):
         return False, "acao_invalida"
 
     convite_ref = get_convites_ref(viajante_id).document(convite_id)
-    convite_doc = convite_ref.get()
-    if not convite_doc.exists:
-        return False, "convite_nao_encontrado"
+    novo_status = "aceito" if acao == "aceitar" else "recusado"
+    refs_escritas = [convite_ref]
 
-    convite = convite_doc.to_dict() or {}
-    owner_id = convite.get("owner_id")
-    viagem_id = convite.get("viagem_id")
+    @transactional
+    def _responder(transaction):
+        convite_doc = _obter(convite_ref, transaction=transaction)
+        if not convite_doc.exists:
+            return None
 
-    novo_status = "aceito" if acao == "aceitar" else "recusado"
-    now = _agora_utc()
+        convite = convite_doc.to_dict() or {}
+        owner_id = convite.get("owner_id")
+        viagem_id = convite.get("viagem_id")
 
-    convite_ref.update({
-        "status": novo_status,
-        "updated_at": now,
-    })
+        # Leituras (espelho + viagem + outros convites aceitos) antes de qualquer escrita
+        viagem_ref = espelho_snap = viagem_snap = None
+        if owner_id and viagem_id:
+            viagem_ref = get_viagem_ref(owner_id, viagem_id)
+            espelho_ref = viagem_ref.collection("convites").document(viajante_id)
+            espelho_snap = _obter(espelho_ref, transaction=transaction)
+            viagem_snap = _obter(viagem_ref, transaction=transaction)
+            refs_escritas.extend([viagem_ref, espelho_ref])
+
+        aceitos = None
+        outro_aceito = False
+        if viagem_snap is not None and viagem_snap.exists:
+            aceitos = _convidados_aceitos_na_transacao(transaction, owner_id, viagem_id, viagem_snap.to_dict() or {})
+            if novo_status == "recusado":
+                outros = _iterar(
+                    get_convites_ref(viajante_id)
+                    .where("owner_id", "==", owner_id)
+                    .where("viagem_id", "==", viagem_id)
+                    .where("status", "==", "aceito"),
+                    transaction=transaction,
+                )
+                outro_aceito = any(doc.id != convite_id for doc in outros)
+
+        now = _agora_utc()
+        transaction.update(convite_ref, {
+            "status": novo_status,
+            "updated_at": now,
+        })
 
-    # Atualiza espelho (se existir)
-    if owner_id and viagem_id:
-        try:
-            espelho_ref = get_viagem_ref(owner_id, viagem_id).collection("convites").document(viajante_id)
-            if espelho_ref.get().exists:
-                espelho_ref.update({
-                    "status": novo_status,
-                    "updated_at": now,
-                })
-        except Exception:
-            pass
+        # Atualiza espelho (se existir)
+        if espelho_snap is not None and espelho_snap.exists:
+            transaction.update(espelho_snap.reference, {
+                "status": novo_status,
+                "updated_at": now,
+            })
+
+        # Lista de acesso desnormalizada na viagem
+        if aceitos is not None:
+            if novo_status == "aceito":
+                aceitos.add(viajante_id)
+            elif not outro_aceito:
+                aceitos.discard(viajante_id)
+            transaction.update(viagem_ref, {"convidados_aceitos": sorted(aceitos)})
+
+        return owner_id, viagem_id
 
+    resultado = _responder(db.transaction())
+    if resultado is None:
+        return False, "convite_nao_encontrado"
+
+    _invalidar_documentos(*refs_escritas)
+    _cache_acesso.invalidar(viajante_id, *resultado)
     return True, None
 
 
@@ -381,58 +1031,94 @@ def revogar_convite(owner_id, viagem_id, guest_id):
     """
     Dono revoga acesso do convidado para uma viagem.
     Como o convite do convidado tem Auto-ID, localizamos por query (owner_id + viagem_id).
-    Marca como 'revogado' no lado do convidado e no espelho do dono.
+    Marca como 'revogado' no lado do convidado e no espelho do dono, e tira o
+    convidado de 'convidados_aceitos' na viagem, tudo na mesma transação.
     """
-    now = _agora_utc()
-
-    # 1) atualiza espelho do dono (se existir)
-    try:
-        espelho_ref = get_viagem_ref(owner_id, viagem_id).collection("convites").document(guest_id)
-        if espelho_ref.get().exists:
-            espelho_ref.update({
-                "status": "revogado",
-                "updated_at": now,
-            })
-    except Exception:
-        pass
+    viagem_ref = get_viagem_ref(owner_id, viagem_id)
+    espelho_ref = viagem_ref.collection("convites").document(guest_id)
 
-    # 2) atualiza convite(s) no lado do convidado (pode existir mais de 1 por segurança)
+    # Convite(s) no lado do convidado (pode existir mais de 1 por segurança)
     convites_query = (
         get_convites_ref(guest_id)
         .where("owner_id", "==", owner_id)
         .where("viagem_id", "==", viagem_id)
     )
 
-    atualizou = False
-    for doc in convites_query.stream():
-        doc.reference.update({
-            "status": "revogado",
-            "updated_at": now,
-        })
-        atualizou = True
+    @transactional
+    def _revogar(transaction):
+        convites = list(_iterar(convites_query, transaction=transaction))
+        espelho_snap = _obter(espelho_ref, transaction=transaction)
+        viagem_snap = _obter(viagem_ref, transaction=transaction)
 
-    return atualizou
+        aceitos = None
+        if viagem_snap.exists:
+            aceitos = _convidados_aceitos_na_transacao(transaction, owner_id, viagem_id, viagem_snap.to_dict() or {})
+
+        now = _agora_utc()
+
+        # 1) espelho do dono (se existir)
+        if espelho_snap.exists:
+            transaction.update(espelho_ref, {
+                "status": "revogado",
+                "updated_at": now,
+            })
+
+        # 2) convite(s) no lado do convidado
+        for doc in convites:
+            transaction.update(doc.reference, {
+                "status": "revogado",
+                "updated_at": now,
+            })
+
+        # 3) lista de acesso desnormalizada
+        if aceitos is not None and guest_id in aceitos:
+            aceitos.discard(guest_id)
+            transaction.update(viagem_ref, {"convidados_aceitos": sorted(aceitos)})
+
+        return [doc.reference for doc in convites]
+
+    refs_convites = _revogar(db.transaction())
+
+    _invalidar_documentos(viagem_ref, espelho_ref, *refs_convites)
+    _cache_acesso.invalidar(guest_id, owner_id, viagem_id)
+    return bool(refs_convites)
 
 
 def tem_acesso_a_viagem(viajante_id, owner_id, viagem_id):
     """
     True se:
       - viajante é o dono (owner), ou
-      - existe convite aceito no convidado apontando para (owner_id, viagem_id)
+      - o viajante está em 'convidados_aceitos' no documento da viagem
+
+    O documento da viagem é o mesmo que a rota lê em seguida (cache da requisição),
+    então a autorização não custa uma leitura extra. Viagens antigas, ainda sem
+    'convidados_aceitos', caem na query de convites aceitos do convidado.
     """
     if viajante_id == owner_id:
         return True
 
-    query = (
-        get_convites_ref(viajante_id)
-        .where("owner_id", "==", owner_id)
-        .where("viagem_id", "==", viagem_id)
-        .where("status", "==", "aceito")
-    )
+    chave = (viajante_id, owner_id, viagem_id)
+    permitido = _cache_acesso.get(chave)
+    if permitido is not None:
+        return permitido
 
-    for _ in query.stream():
-        return True
-    return False
+    viagem_doc = _ler_documento(get_viagem_ref(owner_id, viagem_id))
+    dados_viagem = (viagem_doc.to_dict() or {}) if viagem_doc.exists else {}
+
+    if 'convidados_aceitos' in dados_viagem:
+        permitido = viajante_id in (dados_viagem.get('convidados_aceitos') or [])
+    else:
+        query = (
+            get_convites_ref(viajante_id)
+            .where("owner_id", "==", owner_id)
+            .where("viagem_id", "==", viagem_id)
+            .where("status", "==", "aceito")
+            .limit(1)
+        )
+        permitido = any(True for _ in _iterar(query))
+
+    _cache_acesso.set(chave, permitido)
+    return permitido
 
 
 def listar_viagens_compartilhadas_para_viajante(viajante_id):
@@ -441,14 +1127,18 @@ def listar_viagens_compartilhadas_para_viajante(viajante_id):
     Cada item inclui os metadados necessários para o frontend diferenciar e navegar:
       - owner_id
       - papel = "convidado"
+
+    As viagens são lidas num único get_all (um round trip para todas) e sem a
+    subcoleção de atividades, que a listagem do perfil não usa.
     """
     query = (
         get_convites_ref(viajante_id)
         .where("status", "==", "aceito")
     )
 
-    viagens = []
-    for convite_doc in query.stream():
+    # 1) Junta as referências (sem duplicar a mesma viagem)
+    refs_por_caminho = {}
+    for convite_doc in _iterar(query):
         convite = convite_doc.to_dict() or {}
         owner_id = convite.get("owner_id")
         viagem_id = convite.get("viagem_id")
@@ -456,11 +1146,29 @@ def listar_viagens_compartilhadas_para_viajante(viajante_id):
         if not owner_id or not viagem_id:
             continue
 
-        viagem_data = buscar_viagem_por_id(owner_id, viagem_id)
-        if not viagem_data:
+        viagem_ref = get_viagem_ref(owner_id, viagem_id)
+        refs_por_caminho.setdefault(viagem_ref.path, (owner_id, viagem_ref))
+
+    if not refs_por_caminho:
+        return []
+
+    # 2) Busca todas as viagens de uma vez
+    snapshots = {
+        snap.reference.path: snap
+        for snap in _obter_varios([ref for _, ref in refs_por_caminho.values()])
+    }
+
+    # 3) Monta o resultado na ordem dos convites
+    viagens = []
+    for caminho, (owner_id, _) in refs_por_caminho.items():
+        snap = snapshots.get(caminho)
+        if snap is None or not snap.exists or _viagem_excluida(snap.to_dict()):
             # A viagem pode ter sido deletada pelo dono; ignoramos por enquanto
             continue
 
+        viagem_data = snap.to_dict() or {}
+        viagem_data["doc_id"] = snap.id
+
         # Metadados para o frontend
         viagem_data["owner_id"] = owner_id
         viagem_data["papel"] = "convidado"
@@ -475,7 +1183,7 @@ def listar_convites_da_viagem(owner_id, viagem_id):
       viajantes/{owner_id}/viagens/{viagem_id}/convites/{guest_id}
     """
     convites_ref = get_viagem_ref(owner_id, viagem_id).collection("convites")
-    docs = convites_ref.stream()
+    docs = _iterar(convites_ref)
 
     convites = []
     for doc in docs:
@@ -483,4 +1191,109 @@ def listar_convites_da_viagem(owner_id, viagem_id):
         data["doc_id"] = doc.id  # aqui deve ser o guest_id (email) se você usou assim
         convites.append(data)
 
-    return convites
\ No newline at end of file
+    return convites
+
+
+# -------------------------------------------------------------
+# 4. PURGA DE VIAGENS EXCLUÍDAS (SEGUNDO PLANO)
+# -------------------------------------------------------------
+# Cada exclusão deixa um documento em 'purgas_viagens'. O purgador apaga tudo
+# em lotes (batch) de até 500 operações e só remove o registro no fim, então
+# uma purga interrompida (instância reciclada) é retomada do ponto em que parou.
+
+PURGAS_REF = db.collection('purgas_viagens')
+
+TAMANHO_LOTE_PURGA = 500
+
+_fila_purga = queue.Queue()
+_purgador_lock = threading.Lock()
+_purgador_thread = None
+
+
+def _get_purga_ref(owner_id, viagem_id):
+    # O caminho da viagem identifica a purga (idempotente se agendada 2x)
+    return PURGAS_REF.document(get_viagem_ref(owner_id, viagem_id).path.replace('/', '__'))
+
+
+def _apagar_em_lotes(query, lote):
+    """Apaga tudo o que a query devolve, uma página (= um lote) por vez."""
+    while True:
+        docs = list(_iterar(query.limit(TAMANHO_LOTE_PURGA)))
+        if not docs:
+            return
+        for doc in docs:
+            lote.delete(doc.reference)
+        lote.commit()
+
+
+def purgar_viagem(owner_id, viagem_id):
+    """
+    Remove definitivamente uma viagem marcada como excluída:
+      1) atividades (subcoleção)
+      2) convites dos convidados (viajantes/{guest}/convites_viagem), achados
+         pela query de grupo de coleções (mesma de _convidados_aceitos_na_transacao;
+         o espelho pode não existir), e depois os espelhos
+      3) o próprio documento da viagem e o registro da purga
+    Pode ser chamada de novo a qualquer momento: o que já foi apagado é ignorado.
+    """
+    viagem_ref = get_viagem_ref(owner_id, viagem_id)
+    lote = _LoteEscritas(TAMANHO_LOTE_PURGA)
+
+    # 1) Atividades, em páginas do tamanho do lote
+    _apagar_em_lotes(get_atividades_ref(owner_id, viagem_id), lote)
+
+    # 2) Convites no lado de cada convidado (qualquer status) e espelhos do dono
+    convites_query = (
+        db.collection_group('convites_viagem')
+        .where("owner_id", "==", owner_id)
+        .where("viagem_id", "==", viagem_id)
+    )
+    _apagar_em_lotes(convites_query, lote)
+    _apagar_em_lotes(viagem_ref.collection("convites"), lote)
+
+    # 3) Documento da viagem e registro da purga
+    lote.delete(viagem_ref)
+    lote.delete(_get_purga_ref(owner_id, viagem_id))
+    lote.commit()
+
+    logger.info("Purga concluída: viajantes/%s/viagens/%s", owner_id, viagem_id)
+
+
+def _executar_purgas():
+    while True:
+        owner_id, viagem_id = _fila_purga.get()
+        try:
+            purgar_viagem(owner_id, viagem_id)
+        except Exception:
+            # O registro em 'purgas_viagens' continua; será retomado no próximo start
+            logger.exception("Falha na purga da viagem %s de %s", viagem_id, owner_id)
+        finally:
+            _fila_purga.task_done()
+
+
+def _garantir_purgador():
+    global _purgador_thread
+    with _purgador_lock:
+        if _purgador_thread is None or not _purgador_thread.is_alive():
+            _purgador_thread = threading.Thread(target=_executar_purgas, name='purgador-viagens', daemon=True)
+            _purgador_thread.start()
+
+
+def agendar_purga_viagem(owner_id, viagem_id):
+    """Coloca a purga de uma viagem na fila do purgador em segundo plano."""
+    _garantir_purgador()
+    _fila_purga.put((owner_id, viagem_id))
+
+
+def retomar_purgas_pendentes():
+    """
+    Reagenda as purgas que ficaram pela metade (ex.: instância reciclada).
+    Chamado na inicialização do app.
+    """
+    try:
+        for doc in _iterar(PURGAS_REF):
+            dados = doc.to_dict() or {}
+            if dados.get('owner_id') and dados.get('viagem_id'):
+                agendar_purga_viagem(dados['owner_id'], dados['viagem_id'])
+    except Exception as e:
+        logger.warning("Não foi possível retomar purgas pendentes: %s", e)
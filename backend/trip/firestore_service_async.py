@@ -0,0 +1,322 @@
+"""
+Versão assíncrona das leituras do firestore_service (Firestore AsyncClient).
+
+As rotas de leitura mais usadas são async e disparam as leituras independentes
+ao mesmo tempo (documento da viagem + página de atividades, checagem do dono +
+lista de convites), então a requisição espera só pela leitura mais lenta em vez
+da soma de todas.
+
+Todas as corrotinas rodam num único event loop, numa thread própria do processo:
+o AsyncClient (e o canal gRPC dele) fica preso ao loop em que foi criado, e o
+loop de cada view async do Flask dura só uma requisição. As rotas entregam as
+corrotinas com `await executar(...)`:
+
+    viagem, (atividades, cursor) = await executar(
+        buscar_cabecalho_viagem(viajante_id, viagem_id),
+        listar_atividades_paginadas(viajante_id, viagem_id, limite, start_after),
+    )
+
+Concorrência limitada: no máximo FIRESTORE_ASYNC_CONCORRENCIA leituras em voo
+no processo (padrão 32); o resto espera na fila do semáforo. executar() aceita
+um prazo (segundos) para o grupo inteiro: estourado, as leituras pendentes são
+canceladas e a rota recebe asyncio.TimeoutError.
+
+Com ARMAZENAMENTO=memoria o cliente é o ClienteMemoriaAsync (mesmos dados do
+ClienteMemoria do firestore_service). Escritas e transações continuam no
+firestore_service síncrono.
+
+O que isto NÃO muda: o app continua WSGI (gunicorn com 1 worker e 8 threads),
+e uma view async do Flask ocupa uma dessas threads do começo ao fim, esperando
+o próprio loop. Ganha-se só dentro da requisição (a latência vira a da leitura
+mais lenta do grupo); o número de requisições simultâneas por instância
+continua limitado pelas threads do gunicorn.
+"""
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+
+from trip import app, metricas
+from trip.firestore_service import _cache_acesso, _viagem_excluida
+from trip.models import Viagem
+
+
+# -------------------------------------------------------------
+# 1. EVENT LOOP E CLIENTE
+# -------------------------------------------------------------
+
+_loop = None
+_loop_lock = threading.Lock()
+_cliente = None
+
+# Teto de leituras simultâneas (todas as requisições do processo)
+_semaforo = asyncio.Semaphore(int(os.getenv('FIRESTORE_ASYNC_CONCORRENCIA', '32')))
+
+# get_all acima deste tamanho é dividido em lotes lidos em paralelo
+TAMANHO_LOTE_GET_ALL = 100
+
+
+def _garantir_loop():
+    """Sobe (uma vez) a thread com o event loop das leituras assíncronas."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='firestore-async', daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def _db():
+    """Cliente assíncrono, criado dentro do loop na primeira leitura."""
+    global _cliente
+    if _cliente is None:
+        if app.config['ARMAZENAMENTO'] == 'memoria':
+            from trip.armazenamento import ClienteMemoriaAsync
+            _cliente = ClienteMemoriaAsync(app.config['FIREBASE_DB'])
+        else:
+            from firebase_admin import firestore_async
+            _cliente = firestore_async.client()
+    return _cliente
+
+
+def _viajantes_ref():
+    return _db().collection('viajantes')
+
+
+def _viagem_ref(viajante_id, viagem_id):
+    return _viajantes_ref().document(viajante_id).collection('viagens').document(viagem_id)
+
+
+def _convites_ref(viajante_id):
+    return _viajantes_ref().document(viajante_id).collection('convites_viagem')
+
+
+# -------------------------------------------------------------
+# 2. EXECUÇÃO A PARTIR DAS ROTAS (E CONTABILIDADE)
+# -------------------------------------------------------------
+# As leituras rodam fora do contexto da requisição (na thread do loop), então
+# cada grupo conta as próprias operações e a rota soma tudo em trip/metricas.py
+# quando o grupo termina.
+
+_contagem = contextvars.ContextVar('contagem_store_async', default=None)
+
+
+def _contar(operacao, leituras):
+    contagem = _contagem.get()
+    if contagem is not None:
+        contagem[operacao] += 1
+        contagem['leituras'] += leituras
+
+
+async def _executar_no_loop(corrotinas, contagem, prazo):
+    _contagem.set(contagem)
+    # wait_for cancela as leituras que ainda não terminaram quando o prazo estoura
+    return await asyncio.wait_for(asyncio.gather(*corrotinas), prazo)
+
+
+async def executar(*corrotinas, prazo=None):
+    """
+    Roda as corrotinas ao mesmo tempo no loop do serviço e devolve os resultados
+    na mesma ordem (ou o resultado direto, se for uma só). Exceções são repassadas.
+    prazo: segundos para o grupo todo (None = sem limite); estourado, levanta
+    asyncio.TimeoutError.
+    """
+    contagem = {'gets': 0, 'queries': 0, 'leituras': 0}
+    inicio = time.perf_counter()
+    futuro = asyncio.run_coroutine_threadsafe(
+        _executar_no_loop(corrotinas, contagem, prazo), _garantir_loop()
+    )
+    try:
+        resultados = await asyncio.wrap_future(futuro)
+    finally:
+        metricas.registrar_concorrentes(contagem, inicio)
+    return resultados[0] if len(resultados) == 1 else resultados
+
+
+async def _obter(doc_ref, campos=None):
+    """await doc_ref.get() contabilizado (1 leitura)."""
+    async with _semaforo:
+        snap = await doc_ref.get(field_paths=campos)
+    _contar('gets', 1)
+    return snap
+
+
+async def _listar(query):
+    """Lista o resultado de uma query (1 leitura por documento, mínimo 1)."""
+    async with _semaforo:
+        docs = [doc async for doc in query.stream()]
+    _contar('queries', max(1, len(docs)))
+    return docs
+
+
+async def _obter_lote(refs):
+    async with _semaforo:
+        snapshots = [snap async for snap in _db().get_all(refs)]
+    _contar('gets', len(snapshots))
+    return snapshots
+
+
+async def _obter_varios(refs):
+    """
+    get_all() contabilizado (1 leitura por documento). Listas grandes são
+    divididas em lotes de TAMANHO_LOTE_GET_ALL lidos em paralelo.
+    """
+    lotes = [refs[i:i + TAMANHO_LOTE_GET_ALL] for i in range(0, len(refs), TAMANHO_LOTE_GET_ALL)]
+    resultados = await asyncio.gather(*(_obter_lote(lote) for lote in lotes))
+    return [snap for lote in resultados for snap in lote]
+
+
+async def _agregar(agregacao):
+    """AggregationQuery com count(alias='qtd'); 1 leitura a cada 1000 documentos."""
+    async with _semaforo:
+        resultado = await agregacao.get()
+    valores = {item.alias: item.value for item in resultado[0]}
+    _contar('queries', max(1, math.ceil((valores.get('qtd') or 0) / 1000)))
+    return valores
+
+
+# -------------------------------------------------------------
+# 3. LEITURAS (mesma semântica das funções do firestore_service)
+# -------------------------------------------------------------
+
+async def buscar_cabecalho_viagem(viajante_id, viagem_id, campos=None):
+    """
+    Documento da viagem sem as atividades (None se não existe ou está em purga).
+    'atualizado_em' traz o update_time do documento (validador do ETag).
+    """
+    if campos is not None:
+        campos = list(campos) + ['excluida']
+    viagem_doc = await _obter(_viagem_ref(viajante_id, viagem_id.strip()), campos)
+
+    if viagem_doc.exists and not _viagem_excluida(viagem_doc.to_dict()):
+        viagem_data = viagem_doc.to_dict() or {}
+        viagem_data['doc_id'] = viagem_doc.id
+        viagem_data['atualizado_em'] = viagem_doc.update_time
+        return viagem_data
+
+    return None
+
+
+async def listar_atividades_paginadas(viajante_id, viagem_id, limite, start_after=None):
+    """Uma página de atividades ordenada pelo ID; retorna (atividades, proximo_cursor)."""
+    query = _viagem_ref(viajante_id, viagem_id).collection('atividades').order_by('__name__')
+    if start_after:
+        query = query.start_after({'__name__': start_after})
+
+    docs = await _listar(query.limit(limite + 1))
+
+    atividades = []
+    for doc in docs[:limite]:
+        ativid_data = doc.to_dict() or {}
+        ativid_data['doc_id'] = doc.id
+        atividades.append(ativid_data)
+
+    proximo_cursor = atividades[-1]['doc_id'] if len(docs) > limite else None
+    return atividades, proximo_cursor
+
+
+async def resumo_atividades(viajante_id, viagem_id):
+    """
+    Quantidade de atividades e gasto médio por atividade, calculados no servidor
+    (agregação count/avg): nenhum documento de atividade é baixado.
+    """
+    agregacao = (
+        _viagem_ref(viajante_id, viagem_id).collection('atividades')
+        .count(alias='qtd')
+        .avg('valor_atividade', alias='media')
+    )
+    valores = await _agregar(agregacao)
+    return {
+        'qtd_atividades': int(valores.get('qtd') or 0),
+        'media_gasto': round(float(valores.get('media') or 0.0), 2),
+    }
+
+
+async def tem_acesso_a_viagem(viajante_id, owner_id, viagem_id, dados_viagem=None):
+    """
+    Mesma regra do firestore_service.tem_acesso_a_viagem (e o mesmo cache LRU).
+    dados_viagem: documento da viagem já lido pela rota, para não lê-lo de novo.
+    """
+    if viajante_id == owner_id:
+        return True
+
+    chave = (viajante_id, owner_id, viagem_id)
+    permitido = _cache_acesso.get(chave)
+    if permitido is not None:
+        return permitido
+
+    if dados_viagem is None:
+        dados_viagem = await buscar_cabecalho_viagem(owner_id, viagem_id) or {}
+
+    if 'convidados_aceitos' in dados_viagem:
+        permitido = viajante_id in (dados_viagem.get('convidados_aceitos') or [])
+    else:
+        # Viagem antiga, sem a lista desnormalizada
+        query = (
+            _convites_ref(viajante_id)
+            .where("owner_id", "==", owner_id)
+            .where("viagem_id", "==", viagem_id)
+            .where("status", "==", "aceito")
+            .limit(1)
+        )
+        permitido = bool(await _listar(query))
+
+    _cache_acesso.set(chave, permitido)
+    return permitido
+
+
+async def listar_viagens_por_viajante(viajante_id):
+    """Viagens do viajante como dono (objetos Viagem, sem as que estão em purga)."""
+    docs = await _listar(_viajantes_ref().document(viajante_id).collection('viagens'))
+
+    viagens = [Viagem.from_snapshot(doc, owner_id=viajante_id, papel="dono") for doc in docs]
+    return [viagem for viagem in viagens if not viagem.excluida]
+
+
+async def listar_viagens_compartilhadas_para_viajante(viajante_id):
+    """Viagens com convite aceito (objetos Viagem, papel "convidado"), lidas num único get_all."""
+    convites = await _listar(_convites_ref(viajante_id).where("status", "==", "aceito"))
+
+    refs_por_caminho = {}
+    for convite_doc in convites:
+        convite = convite_doc.to_dict() or {}
+        owner_id = convite.get("owner_id")
+        viagem_id = convite.get("viagem_id")
+        if not owner_id or not viagem_id:
+            continue
+        viagem_ref = _viagem_ref(owner_id, viagem_id)
+        refs_por_caminho.setdefault(viagem_ref.path, (owner_id, viagem_ref))
+
+    if not refs_por_caminho:
+        return []
+
+    snapshots = {
+        snap.reference.path: snap
+        for snap in await _obter_varios([ref for _, ref in refs_por_caminho.values()])
+    }
+
+    viagens = []
+    for caminho, (owner_id, _) in refs_por_caminho.items():
+        snap = snapshots.get(caminho)
+        if snap is None or not snap.exists:
+            continue
+        viagem = Viagem.from_snapshot(snap, owner_id=owner_id, papel="convidado")
+        if not viagem.excluida:
+            viagens.append(viagem)
+
+    return viagens
+
+
+async def listar_convites_da_viagem(owner_id, viagem_id):
+    """Convites (espelho) em viajantes/{owner_id}/viagens/{viagem_id}/convites."""
+    docs = await _listar(_viagem_ref(owner_id, viagem_id).collection("convites"))
+
+    convites = []
+    for doc in docs:
+        data = doc.to_dict() or {}
+        data["doc_id"] = doc.id
+        convites.append(data)
+    return convites
@@ -0,0 +1,183 @@
+"""
+Leitura e validação das linhas da importação de atividades em lote.
+
+Formatos aceitos pela rota /api/viagem/<id>/atividades:bulk:
+  - NDJSON: um objeto {"nome_atividade": ..., "valor_atividade": ...} por
+    linha, lido linha a linha do corpo ou do upload;
+  - CSV: cabeçalho com nome_atividade e valor_atividade, separador ',' ou ';'
+    (o de planilhas em português). O arquivo é lido linha a linha do upload;
+  - JSON: lista desses objetos. Uma lista só pode ser interpretada inteira,
+    então o corpo é lido de uma vez e limitado a MAX_BYTES_JSON (acima disso,
+    use NDJSON ou CSV).
+
+Cada linha é validada assim que é lida; as válidas seguem (como gerador) para
+firestore_service.importar_atividades e as inválidas viram um erro por linha.
+"""
+import codecs
+import csv
+import json
+import math
+
+MAX_LINHAS_IMPORTACAO = 20000
+MAX_BYTES_JSON = 5 * 1024 * 1024
+MAX_ERROS_RELATADOS = 500
+TAMANHO_MAXIMO_NOME = 200
+
+CAMPOS_OBRIGATORIOS = ('nome_atividade', 'valor_atividade')
+
+
+class JSONGrandeDemais(ValueError):
+    """Lista JSON maior que MAX_BYTES_JSON."""
+
+
+class LinhaIlegivel:
+    """Linha que não pôde nem ser lida (CSV ou JSON malformado); vira erro da linha."""
+
+    __slots__ = ('erro',)
+
+    def __init__(self, erro):
+        self.erro = erro
+
+
+def _valor_numerico(valor):
+    """
+    Converte o valor de uma linha em float. Aceita número ou texto nos formatos
+    '12.50', '12,50', '1.234,56' e 'R$ 10'. Levanta ValueError se não der.
+    """
+    if isinstance(valor, bool):
+        raise ValueError
+    if isinstance(valor, (int, float)):
+        numero = float(valor)
+    else:
+        texto = str(valor or '').replace('R$', '').replace(' ', '').strip()
+        if ',' in texto:
+            # Formato brasileiro: ponto separa milhar, vírgula separa decimais
+            texto = texto.replace('.', '').replace(',', '.')
+        numero = float(texto)
+
+    if not math.isfinite(numero):
+        raise ValueError
+    return numero
+
+
+def _validar_linha(linha):
+    """Retorna (dados_da_atividade, None) ou (None, mensagem_de_erro)."""
+    if isinstance(linha, LinhaIlegivel):
+        return None, linha.erro
+    if not isinstance(linha, dict):
+        return None, "linha deve ser um objeto"
+
+    nome = str(linha.get('nome_atividade') or '').strip()
+    if not nome:
+        return None, "nome_atividade vazio"
+    if len(nome) > TAMANHO_MAXIMO_NOME:
+        return None, f"nome_atividade com mais de {TAMANHO_MAXIMO_NOME} caracteres"
+
+    try:
+        valor = _valor_numerico(linha.get('valor_atividade'))
+    except (TypeError, ValueError):
+        return None, f"valor_atividade inválido: {linha.get('valor_atividade')!r}"
+    if valor < 0:
+        return None, "valor_atividade negativo"
+
+    return {'nome_atividade': nome, 'valor_atividade': round(valor, 2)}, None
+
+
+def validar_linhas(linhas, resumo):
+    """
+    Gera os dados das linhas válidas, na ordem em que chegam.
+    linhas: iterável de (numero_da_linha, dict).
+    resumo: {'erros': [], 'recusadas': 0}; recebe {"linha": n, "erro": "..."}
+    de cada linha recusada (até MAX_ERROS_RELATADOS; as demais só são contadas).
+    """
+    for quantidade, (numero, linha) in enumerate(linhas, start=1):
+        if quantidade > MAX_LINHAS_IMPORTACAO:
+            resumo['erros'].append({
+                "linha": numero,
+                "erro": f"limite de {MAX_LINHAS_IMPORTACAO} linhas atingido; o restante foi ignorado",
+            })
+            return
+
+        dados, erro = _validar_linha(linha)
+        if erro:
+            resumo['recusadas'] += 1
+            if len(resumo['erros']) < MAX_ERROS_RELATADOS:
+                resumo['erros'].append({"linha": numero, "erro": erro})
+            continue
+        yield dados
+
+
+def linhas_json(arquivo):
+    """
+    (numero, objeto) de uma lista JSON lida do arquivo binário; a numeração
+    começa em 1. Levanta JSONGrandeDemais se passar de MAX_BYTES_JSON e
+    ValueError se não for uma lista JSON válida.
+    """
+    conteudo = arquivo.read(MAX_BYTES_JSON + 1)
+    if len(conteudo) > MAX_BYTES_JSON:
+        raise JSONGrandeDemais(
+            f"JSON com mais de {MAX_BYTES_JSON // (1024 * 1024)} MB; envie NDJSON ou CSV, que são lidos em streaming"
+        )
+    try:
+        lista = json.loads(conteudo)
+    except ValueError:
+        raise ValueError("JSON inválido") from None
+    if not isinstance(lista, list):
+        raise ValueError("O JSON deve ser uma lista de atividades")
+    return enumerate(lista, start=1)
+
+
+def linhas_ndjson(arquivo):
+    """
+    (numero, objeto) de um NDJSON binário, lido linha a linha. Linhas em
+    branco são puladas; uma linha que não é JSON vira erro só dela.
+    """
+    texto = codecs.getreader('utf-8-sig')(arquivo, errors='replace')
+    for numero, linha in enumerate(texto, start=1):
+        if not linha.strip():
+            continue
+        try:
+            yield numero, json.loads(linha)
+        except ValueError:
+            yield numero, LinhaIlegivel("JSON inválido")
+
+
+def linhas_csv(arquivo):
+    """
+    (numero, dict) de um CSV binário (upload), lido linha a linha.
+    O número é o da linha no arquivo (o cabeçalho é a linha 1).
+    Levanta ValueError se o cabeçalho não tiver as colunas obrigatórias ou não
+    puder ser lido; uma linha malformada depois dele vira erro só dela.
+    """
+    # utf-8-sig ignora o BOM que o Excel coloca no começo do arquivo
+    texto = codecs.getreader('utf-8-sig')(arquivo, errors='replace')
+
+    cabecalho = texto.readline()
+    delimitador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    try:
+        colunas = [coluna.strip().lower() for coluna in next(csv.reader([cabecalho], delimiter=delimitador), [])]
+    except csv.Error as e:
+        raise ValueError(f"Cabeçalho do CSV malformado: {e}") from None
+
+    faltando = [campo for campo in CAMPOS_OBRIGATORIOS if campo not in colunas]
+    if faltando:
+        raise ValueError(f"CSV sem a(s) coluna(s): {', '.join(faltando)}")
+
+    def _gerar():
+        leitor = csv.DictReader(texto, fieldnames=colunas, delimiter=delimitador)
+        while True:
+            try:
+                linha = next(leitor)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # O leitor já descartou a linha ruim (e não contou em line_num);
+                # a leitura segue na próxima
+                yield leitor.line_num + 2, LinhaIlegivel(f"CSV malformado: {e}")
+                continue
+            if not any(isinstance(valor, str) and valor.strip() for valor in linha.values()):
+                continue  # linha só com separadores
+            # line_num conta as linhas lidas depois do cabeçalho
+            yield leitor.line_num + 1, linha
+
+    return _gerar()
@@ -0,0 +1,156 @@
+"""
+Contabilidade por requisição das operações no armazenamento (Firestore).
+
+O firestore_service registra aqui cada get, query, set/update/delete e commit,
+com o número de documentos lidos/escritos e o tempo gasto. No fim da requisição
+os totais saem nos headers da resposta:
+  - Server-Timing: store;dur=<ms>, app;dur=<ms>
+  - X-Store-Reads / X-Store-Writes
+e num evento de log estruturado no logger 'trip.store' (ver trip/registro.py).
+
+Respostas em streaming (exportação) leem o armazenamento depois que os headers
+saíram: acompanhar_streaming soma essas leituras e registra os totais da
+requisição inteira num evento 'store_streaming' quando o envio termina.
+
+METRICAS_STORE=0 desliga tudo: os wrappers do firestore_service chamam o
+cliente direto e nenhum hook é registrado no app.
+"""
+import logging
+import os
+import time
+
+from flask import g, has_request_context, request
+
+ATIVO = os.getenv('METRICAS_STORE', '1') != '0'
+
+logger = logging.getLogger('trip.store')
+
+
+def _metricas_requisicao():
+    """Totais da requisição atual (None se desligado ou fora de requisição)."""
+    if not ATIVO or not has_request_context():
+        return None
+    metricas = getattr(g, '_metricas_store', None)
+    if metricas is None:
+        metricas = g._metricas_store = {
+            'gets': 0,
+            'queries': 0,
+            'commits': 0,
+            'leituras': 0,
+            'escritas': 0,
+            'store_ms': 0.0,
+        }
+    return metricas
+
+
+def registrar(operacao, inicio, leituras=0, escritas=0):
+    """
+    Soma uma operação ao total da requisição.
+    operacao: 'gets' | 'queries' | 'commits'; inicio: time.perf_counter() antes da chamada.
+    """
+    metricas = _metricas_requisicao()
+    if metricas is None:
+        return
+    metricas[operacao] += 1
+    metricas['leituras'] += leituras
+    metricas['escritas'] += escritas
+    metricas['store_ms'] += (time.perf_counter() - inicio) * 1000
+
+
+def registrar_transacao(inicio, store_ms_antes, escritas):
+    """
+    Fecha a conta de uma transação: as leituras de dentro dela já foram
+    registradas; aqui entram as escritas e o tempo restante (commit/retries).
+    """
+    metricas = _metricas_requisicao()
+    if metricas is None:
+        return
+    decorrido = (time.perf_counter() - inicio) * 1000
+    leituras_ms = metricas['store_ms'] - store_ms_antes
+    metricas['commits'] += 1
+    metricas['escritas'] += escritas
+    metricas['store_ms'] += max(0.0, decorrido - leituras_ms)
+
+
+def registrar_concorrentes(contagem, inicio):
+    """
+    Soma um grupo de leituras feitas em paralelo (firestore_service_async).
+    contagem: {'gets': n, 'queries': n, 'leituras': n}; o tempo somado é o
+    de parede do grupo inteiro, não a soma das operações sobrepostas.
+    """
+    metricas = _metricas_requisicao()
+    if metricas is None:
+        return
+    for chave in ('gets', 'queries', 'leituras'):
+        metricas[chave] += contagem.get(chave, 0)
+    metricas['store_ms'] += (time.perf_counter() - inicio) * 1000
+
+
+def store_ms_atual():
+    metricas = _metricas_requisicao()
+    return metricas['store_ms'] if metricas is not None else 0.0
+
+
+def _inicio_requisicao():
+    g._inicio_requisicao = time.perf_counter()
+
+
+def _anexar_metricas(response):
+    metricas = _metricas_requisicao()
+    if metricas is None:
+        return response
+
+    app_ms = (time.perf_counter() - getattr(g, '_inicio_requisicao', time.perf_counter())) * 1000
+
+    response.headers['Server-Timing'] = (
+        f'store;dur={metricas["store_ms"]:.1f};desc="Firestore", app;dur={app_ms:.1f}'
+    )
+    response.headers['X-Store-Reads'] = str(metricas['leituras'])
+    response.headers['X-Store-Writes'] = str(metricas['escritas'])
+
+    _registrar_evento('store_requisicao', metricas, response.status_code, app_ms)
+    return response
+
+
+def _registrar_evento(evento, metricas, status, app_ms):
+    logger.info(evento, extra={'dados': {
+        'metodo': request.method,
+        'rota': request.url_rule.rule if request.url_rule else request.path,
+        'status': status,
+        'leituras': metricas['leituras'],
+        'escritas': metricas['escritas'],
+        'gets': metricas['gets'],
+        'queries': metricas['queries'],
+        'commits': metricas['commits'],
+        'store_ms': round(metricas['store_ms'], 2),
+        'app_ms': round(app_ms, 2),
+    }})
+
+
+def acompanhar_streaming(corpo, status=200):
+    """
+    Envolve o corpo (iterável) de uma resposta em streaming. Use dentro de
+    stream_with_context, para as leituras feitas durante a geração caírem na
+    conta da requisição. No fim do envio (ou se o cliente desconectar), loga
+    'store_streaming' com os totais da requisição inteira e o tempo até ali.
+    """
+    if not ATIVO:
+        yield from corpo
+        return
+
+    try:
+        yield from corpo
+    finally:
+        metricas = _metricas_requisicao()
+        if metricas is not None:
+            app_ms = (time.perf_counter() - getattr(g, '_inicio_requisicao', time.perf_counter())) * 1000
+            _registrar_evento('store_streaming', metricas, status, app_ms)
+
+
+def iniciar_metricas(app):
+    """Registra os hooks de início/fim de requisição (só se METRICAS_STORE estiver ligado)."""
+    if not ATIVO:
+        return
+
+    app.before_request(_inicio_requisicao)
+    app.after_request(_anexar_metricas)
@@ -7,8 +7,10 @@ class Viajante(UserMixin):
     """
     Classe simples para mapear dados de um Documento 'viajantes' do Firestore.
     Herdar de UserMixin facilita a integração com Flask-Login.
+    (O UserMixin não tem __slots__, então aqui eles não economizam memória;
+    só existe um Viajante por requisição.)
     """
-    
+
     # ATENÇÃO: O 'id' relacional foi substituído pelo 'doc_id' do Firestore
     def __init__(self, data):
         self.doc_id = data.get('doc_id')         # ID do Documento no Firestore
@@ -17,7 +19,23 @@ class Viajante(UserMixin):
         self.senha = data.get('senha')           # Hash da senha
         self.is_verified = data.get('is_verified', False)
         # Não precisamos de 'viagem' aqui, pois relações são estruturadas de forma diferente no NoSQL
-    
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Direto do DocumentSnapshot do Firestore (doc_id = ID do documento)."""
+        viajante = cls(snapshot.to_dict() or {})
+        viajante.doc_id = snapshot.id
+        return viajante
+
+    def to_json(self):
+        """Dados públicos do viajante (o hash da senha nunca sai do backend)."""
+        return {
+            'doc_id': self.doc_id,
+            'nome': self.nome,
+            'email': self.email,
+            'is_verified': self.is_verified,
+        }
+
     # Método obrigatório para o Flask-Login
     def get_id(self):
         # Retornamos o ID do Documento do Firestore, que será usado no user_loader
@@ -30,33 +48,85 @@ class Viajante(UserMixin):
 # No Firestore, as coleções filhas (Viagem e Atividade) geralmente
 # são armazenadas em Documentos separados ou subcoleções.
 # As classes abaixo servem para estruturar os dados.
+# Como aparecem em listas grandes (perfil, páginas de atividades), usam
+# __slots__: sem __dict__ por instância, e to_json() monta a resposta direto
+# dos atributos.
 
 class Viagem:
-    
+
+    __slots__ = (
+        'doc_id', 'destino', 'valor_total', 'valor_restante',
+        'total_gasto', 'percentual_gasto', 'cor', 'id_viajante', 'atividades', 'excluida',
+        # Contexto da leitura (não são campos do documento)
+        'owner_id', 'papel', 'atualizado_em', 'versao',
+    )
+
+    # Campos de cada viagem na listagem do perfil
+    CAMPOS_JSON = ('doc_id', 'destino', 'valor_total', 'valor_restante', 'percentual_gasto', 'cor', 'papel', 'owner_id')
+
     def __init__(self, data):
         self.doc_id = data.get('doc_id')
         self.destino = data.get('destino')
         self.valor_total = data.get('valor_total')
         self.valor_restante = data.get('valor_restante', self.valor_total)
+        # Gravados junto com o saldo (None em viagens antigas: calculados na leitura)
+        self.total_gasto = data.get('total_gasto')
+        self.percentual_gasto = data.get('percentual_gasto')
+        self.cor = data.get('cor')
         self.id_viajante = data.get('id_viajante')
         self.atividades = data.get('atividades', [])
-        
+        self.excluida = bool(data.get('excluida'))  # marca de exclusão (aguardando a purga)
+        self.owner_id = data.get('owner_id')
+        self.papel = data.get('papel')
+        self.atualizado_em = data.get('atualizado_em')
+        self.versao = data.get('versao')
+
+    @classmethod
+    def from_snapshot(cls, snapshot, **contexto):
+        """
+        Direto do DocumentSnapshot do Firestore: doc_id = ID do documento e
+        atualizado_em = update_time. contexto: owner_id/papel da listagem.
+        """
+        viagem = cls(snapshot.to_dict() or {})
+        viagem.doc_id = snapshot.id
+        viagem.atualizado_em = snapshot.update_time
+        for campo, valor in contexto.items():
+            setattr(viagem, campo, valor)
+        return viagem
+
+    def to_json(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS_JSON}
+
     # No Firestore, 'atualizar_valor_restante' exigirá uma consulta a subcoleções
     # e uma escrita (update) no documento pai (Viagem).
     # O método deve ser implementado no firestore_service.py para acessar o DB.
-    
+
     def __repr__(self):
         return f"<Viagem para {self.destino}>"
 
 
 class Atividade:
-    
+
+    __slots__ = ('doc_id', 'nome_atividade', 'valor_atividade', 'id_viagem')
+
+    CAMPOS_JSON = ('doc_id', 'nome_atividade', 'valor_atividade')
+
     def __init__(self, data):
         self.doc_id = data.get('doc_id')
         self.nome_atividade = data.get('nome_atividade')
         self.valor_atividade = data.get('valor_atividade')
         self.id_viagem = data.get('id_viagem')
-        
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Direto do DocumentSnapshot do Firestore (doc_id = ID do documento)."""
+        atividade = cls(snapshot.to_dict() or {})
+        atividade.doc_id = snapshot.id
+        return atividade
+
+    def to_json(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS_JSON}
+
     def __repr__(self):
         return f"<Atividade {self.nome_atividade}>"
 
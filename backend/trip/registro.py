@@ -0,0 +1,126 @@
+"""
+Camada de logs do backend (substitui os print() nos caminhos quentes).
+
+- Logs em JSON, uma linha por evento, no logger 'trip' e filhos
+  (ex.: 'trip.firestore', 'trip.routes', 'trip.store').
+- Formatação preguiçosa: use logger.debug("texto %s", valor); a string só é
+  montada se o evento for realmente emitido.
+- Amostragem por logger: LOG_AMOSTRAGEM="trip.firestore=0.1,trip.routes=0.5"
+  emite só essa fração dos eventos DEBUG/INFO (WARNING ou acima sempre passam).
+- Escrita não bloqueante: a requisição só coloca o evento numa fila
+  (QueueHandler); uma thread separada (QueueListener) escreve no stdout.
+
+Nível geral em LOG_LEVEL (padrão INFO).
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+LOGGER_RAIZ = 'trip'
+
+_listener = None
+
+
+def _ler_amostragem(texto):
+    """'trip.firestore=0.1,trip.routes=1' -> {'trip.firestore': 0.1, 'trip.routes': 1.0}"""
+    taxas = {}
+    for item in (texto or '').split(','):
+        nome, _, taxa = item.partition('=')
+        if nome.strip() and taxa.strip():
+            try:
+                taxas[nome.strip()] = max(0.0, min(float(taxa), 1.0))
+            except ValueError:
+                continue
+    return taxas
+
+
+class FiltroAmostragem(logging.Filter):
+    """Deixa passar só uma fração dos eventos DEBUG/INFO de cada logger."""
+
+    def __init__(self, taxas):
+        super().__init__()
+        # Prefixo mais específico primeiro ('trip.firestore' antes de 'trip')
+        self.taxas = sorted(taxas.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _taxa(self, nome):
+        for prefixo, taxa in self.taxas:
+            if nome == prefixo or nome.startswith(prefixo + '.'):
+                return taxa
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        taxa = self._taxa(record.name)
+        return taxa >= 1.0 or random.random() < taxa
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por evento; campos extras vêm de extra={'dados': {...}}."""
+
+    def format(self, record):
+        evento = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        dados = getattr(record, 'dados', None)
+        if dados:
+            evento.update(dados)
+        # Pela fila, a exceção chega já formatada em exc_text (ver HandlerFila)
+        if record.exc_info:
+            evento['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            evento['exc'] = record.exc_text
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+class HandlerFila(logging.handlers.QueueHandler):
+    """
+    QueueHandler que preserva a exceção do evento. O prepare() padrão junta o
+    traceback ao texto da mensagem e apaga exc_info/exc_text; aqui a mensagem
+    fica só com o texto e o traceback vai formatado em exc_text (o exc_info
+    não atravessa a fila, porque prende os frames da requisição).
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configurar_logs():
+    """Configura o logger 'trip' com fila + thread de escrita (idempotente)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    saida = logging.StreamHandler(sys.stdout)
+    saida.setFormatter(FormatadorJSON())
+
+    fila = queue.SimpleQueue()
+    handler_fila = HandlerFila(fila)
+    handler_fila.addFilter(FiltroAmostragem(_ler_amostragem(os.getenv('LOG_AMOSTRAGEM'))))
+
+    raiz = logging.getLogger(LOGGER_RAIZ)
+    raiz.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    raiz.addHandler(handler_fila)
+    raiz.propagate = False
+
+    _listener = logging.handlers.QueueListener(fila, saida, respect_handler_level=True)
+    _listener.start()
+    # Esvazia a fila ao encerrar o processo
+    atexit.register(_listener.stop)
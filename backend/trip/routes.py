@@ -1,56 +1,152 @@
-from flask import redirect, request, jsonify, url_for
-from trip import app, bcrypt, google
+from flask import Response, redirect, request, jsonify, stream_with_context, url_for
+from trip import app, google
 from trip.models import Viajante, Viagem, Atividade
 from flask_login import login_user, logout_user, current_user, login_required
 from trip.utility import calcular_percentual_e_cor, confirm_token, send_confirmation_email
+from trip import firestore_service_async as servico_async
+from trip import exportacao, importacao, metricas, senhas
+import asyncio
+import hashlib
+import logging
 import os
 from .firestore_service import ( atualizar_valor_restante,
     criar_atividade,
-    buscar_viagem_por_id,
+    buscar_cabecalho_viagem,
     deletar_atividade,
+    importar_atividades,
+    iterar_exportacao,
     atualizar_viagem,
     deletar_viagem_completa,
     buscar_atividade_por_id,
     atualizar_atividade,
     buscar_viajante_por_email,
     atualizar_status_verificacao,
+    atualizar_senha_viajante,
     criar_viajante,
     criar_nova_viagem,
-    listar_viagens_por_viajante,
     criar_convite_viagem,
     listar_convites_do_viajante,
     responder_convite,
     revogar_convite,
     tem_acesso_a_viagem,
-    listar_viagens_compartilhadas_para_viajante,
-    listar_convites_da_viagem,
+    estatisticas_cache_acesso,
 )
 
+logger = logging.getLogger('trip.routes')
+
+
+LIMITE_PADRAO_ATIVIDADES = 50
+LIMITE_MAXIMO_ATIVIDADES = 500
+
+# Prazo (segundos) para as leituras do /api/perfil
+PRAZO_PERFIL = float(os.getenv('PERFIL_PRAZO_S', '10'))
+
+
+def _parametros_paginacao():
+    """Lê ?limit= e ?start_after= da query string (com limites de segurança)."""
+    try:
+        limite = int(request.args.get('limit', LIMITE_PADRAO_ATIVIDADES))
+    except (TypeError, ValueError):
+        limite = LIMITE_PADRAO_ATIVIDADES
+    limite = max(1, min(limite, LIMITE_MAXIMO_ATIVIDADES))
+
+    start_after = request.args.get('start_after') or None
+    return limite, start_after
+
+
+# --- ETAG / GET CONDICIONAL ---
+# O ETag das rotas de detalhe e do perfil sai do update_time e da 'versao' das
+# viagens (toda mutação de atividade regrava o documento da viagem). Com
+# If-None-Match igual, a rota responde 304 sem montar nem serializar o JSON.
+
+def _etag(*partes):
+    return hashlib.sha1(repr(partes).encode()).hexdigest()[:24]
+
+
+def _validador_viagem(viagem_data):
+    return viagem_data.get('doc_id'), str(viagem_data.get('atualizado_em')), viagem_data.get('versao')
+
+
+def _nao_modificado(etag):
+    """Resposta 304 se o cliente já tem essa versão (If-None-Match), senão None."""
+    # Comparação fraca: a resposta comprimida sai com W/"..." (ver trip/compressao.py)
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    resposta = app.response_class(status=304)
+    resposta.set_etag(etag)
+    return resposta
+
+
+def _com_etag(resposta, etag):
+    resposta.set_etag(etag)
+    # O cliente pode guardar, mas precisa revalidar sempre
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+
+async def _ler_viagem_e_atividades(owner_id, viagem_id, limite, start_after):
+    """
+    Documento da viagem + (página de atividades, resumo).
+    Sem If-None-Match tudo é lido em paralelo. Com ele, só o documento da
+    viagem é lido aqui (o resto vem de _ler_atividades depois de comparar o
+    ETag), para um 304 custar uma leitura só.
+    """
+    if request.if_none_match:
+        viagem_raw = await servico_async.executar(servico_async.buscar_cabecalho_viagem(owner_id, viagem_id))
+        return viagem_raw, None
+
+    viagem_raw, pagina, resumo = await servico_async.executar(
+        servico_async.buscar_cabecalho_viagem(owner_id, viagem_id),
+        servico_async.listar_atividades_paginadas(owner_id, viagem_id, limite, start_after),
+        servico_async.resumo_atividades(owner_id, viagem_id),
+    )
+    return viagem_raw, (pagina, resumo)
+
+
+async def _ler_atividades(owner_id, viagem_id, limite, start_after):
+    return await servico_async.executar(
+        servico_async.listar_atividades_paginadas(owner_id, viagem_id, limite, start_after),
+        servico_async.resumo_atividades(owner_id, viagem_id),
+    )
+
 
 @app.route('/api/viagem/<string:id_viagem>', methods=["GET"])
-def api_viagem_detalhe(id_viagem):
+async def api_viagem_detalhe(id_viagem):
     viajante_id = request.headers.get('X-Viajante-ID')
     if not viajante_id:
         return jsonify({"erro": "Autenticação necessária (header X-Viajante-ID ausente)"}), 401
 
-    viagem_raw = buscar_viagem_por_id(viajante_id, id_viagem)
+    # Totais vêm dos campos gravados na viagem; atividades vêm paginadas;
+    # quantidade e média vêm de uma agregação.
+    limite, start_after = _parametros_paginacao()
+    viagem_raw, detalhe = await _ler_viagem_e_atividades(viajante_id, id_viagem, limite, start_after)
 
     if not viagem_raw:
         return jsonify({"erro": "Viagem não encontrada"}), 404
 
+    etag = _etag(_validador_viagem(viagem_raw), limite, start_after)
+    nao_modificado = _nao_modificado(etag)
+    if nao_modificado:
+        return nao_modificado
+
+    (atividades, proximo_cursor), resumo = detalhe or await _ler_atividades(viajante_id, id_viagem, limite, start_after)
+
     # Lógica de processamento de dados (Cálculos) permanece no Backend
     viagem = Viagem(viagem_raw)
     viagem_pronta = calcular_percentual_e_cor([viagem])[0]
 
     # Retornamos os dados limpos para o Frontend
-    return jsonify({
+    return _com_etag(jsonify({
         "destino": viagem_pronta.destino,
         "valor_total": viagem_pronta.valor_total,
         "valor_restante": viagem_pronta.valor_restante,
         "percentual_gasto": viagem_pronta.percentual_gasto,
         "cor": viagem_pronta.cor,
-        "atividades": viagem_pronta.atividades
-    }), 200
+        "qtd_atividades": resumo["qtd_atividades"],
+        "media_gasto": resumo["media_gasto"],
+        "atividades": atividades,
+        "proximo_cursor": proximo_cursor
+    }), etag)
 
 
 @app.route('/api/viagem/<string:id_viagem>/atividade', methods=["POST"])
@@ -61,19 +157,80 @@ def api_criar_atividade(id_viagem):
 
     dados = request.json  # O backend recebe JSON puro
 
-    criar_atividade(viajante_id, id_viagem, dados)
-    novo_restante = atualizar_valor_restante(viajante_id, id_viagem)
+    # Cria a atividade e ajusta o saldo da viagem numa única transação
+    atividade_id, novo_restante = criar_atividade(viajante_id, id_viagem, dados)
+    if not atividade_id:
+        return jsonify({"erro": "Viagem não encontrada"}), 404
 
     return jsonify({"mensagem": "Atividade criada", "novo_restante": novo_restante}), 201
 
 
+@app.route('/api/viagem/<string:id_viagem>/atividades:bulk', methods=["POST"])
+def api_importar_atividades(id_viagem):
+    """
+    Importa atividades em lote. Aceita, no corpo ou como upload multipart no
+    campo 'arquivo' (o formato do upload vem da extensão):
+      - NDJSON (application/x-ndjson, .ndjson) e CSV (text/csv, .csv), lidos
+        em streaming;
+      - JSON (lista de objetos, .json), lido inteiro: até
+        importacao.MAX_BYTES_JSON, acima disso 413.
+    Linhas inválidas (inclusive malformadas) não impedem as demais: voltam em
+    "erros" com o número da linha.
+    """
+    viajante_id = request.headers.get('X-Viajante-ID')
+    if not viajante_id:
+        return jsonify({"erro": "Autenticação necessária (header X-Viajante-ID ausente)"}), 401
+
+    arquivo = request.files.get('arquivo')
+    try:
+        if arquivo is not None:
+            nome_arquivo = arquivo.filename.lower()
+            if nome_arquivo.endswith('.ndjson'):
+                linhas = importacao.linhas_ndjson(arquivo.stream)
+            elif nome_arquivo.endswith('.json'):
+                linhas = importacao.linhas_json(arquivo.stream)
+            else:
+                linhas = importacao.linhas_csv(arquivo.stream)
+        elif request.mimetype == 'application/x-ndjson':
+            linhas = importacao.linhas_ndjson(request.stream)
+        elif request.mimetype == 'text/csv':
+            linhas = importacao.linhas_csv(request.stream)
+        elif request.is_json:
+            linhas = importacao.linhas_json(request.stream)
+        else:
+            return jsonify({"erro": "Envie NDJSON, CSV ou uma lista JSON (no corpo ou no campo 'arquivo')"}), 415
+    except importacao.JSONGrandeDemais as e:
+        return jsonify({"erro": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    # Validação e gravação acontecem enquanto as linhas são lidas
+    resumo = {'erros': [], 'recusadas': 0}
+    importadas, novo_restante = importar_atividades(
+        viajante_id, id_viagem, importacao.validar_linhas(linhas, resumo)
+    )
+    if importadas is None:
+        return jsonify({"erro": "Viagem não encontrada"}), 404
+
+    logger.info("Importação na viagem %s: %d gravadas, %d recusadas",
+                id_viagem, importadas, resumo['recusadas'])
+    return jsonify({
+        "importadas": importadas,
+        "recusadas": resumo['recusadas'],
+        "erros": resumo['erros'],
+        "novo_restante": novo_restante,
+    }), 201 if importadas else 200
+
+
 @app.route('/api/viagem/<string:id_viagem>/editar', methods=['GET'])
 def api_get_viagem_editar(id_viagem):
     viajante_id = request.headers.get('X-Viajante-ID')
     if not viajante_id:
         return jsonify({"erro": "Autenticação necessária (header X-Viajante-ID ausente)"}), 401
 
-    viagem_data = buscar_viagem_por_id(viajante_id, id_viagem)
+    viagem_data = buscar_cabecalho_viagem(
+        viajante_id, id_viagem, campos=['destino', 'valor_total', 'valor_restante', 'id_viajante']
+    )
     if not viagem_data:
         return jsonify({"erro": "Viagem não encontrada"}), 404
 
@@ -81,31 +238,53 @@ def api_get_viagem_editar(id_viagem):
     return jsonify(viagem_data), 200
 
 
+# Únicos campos que o cliente edita; saldo, versao, excluida e
+# convidados_aceitos são mantidos só pelo backend
+CAMPOS_EDITAVEIS_VIAGEM = ('destino', 'valor_total')
+
+
 @app.route('/api/viagem/<string:id_viagem>/editar', methods=['PUT'])
 def api_update_viagem(id_viagem):
     viajante_id = request.headers.get('X-Viajante-ID')
     if not viajante_id:
         return jsonify({"erro": "Autenticação necessária (header X-Viajante-ID ausente)"}), 401
 
-    dados_novos = request.json  # Recebe JSON do frontend
-
-    # 1. Atualiza os dados básicos
-    atualizar_viagem(viajante_id, id_viagem, dados_novos)
+    dados_novos = request.get_json(silent=True)  # Recebe JSON do frontend
+    if not isinstance(dados_novos, dict) or not dados_novos:
+        return jsonify({"erro": "Envie um objeto JSON com destino e/ou valor_total"}), 400
+    nao_editaveis = sorted(set(dados_novos) - set(CAMPOS_EDITAVEIS_VIAGEM))
+    if nao_editaveis:
+        return jsonify({"erro": f"Campos não editáveis: {', '.join(nao_editaveis)}"}), 400
 
-    # 2. Recalcula o saldo (caso o valor_total tenha mudado)
-    atualizar_valor_restante(viajante_id, id_viagem)
+    # Atualiza os dados básicos (o saldo é refeito se o valor_total mudar)
+    if not atualizar_viagem(viajante_id, id_viagem, dados_novos):
+        return jsonify({"erro": "Viagem não encontrada"}), 404
 
     return jsonify({"mensagem": "Viagem atualizada com sucesso!"}), 200
 
 
+@app.route('/api/viagem/<string:id_viagem>/recalcular', methods=['POST'])
+def api_recalcular_saldo(id_viagem):
+    viajante_id = request.headers.get('X-Viajante-ID')
+    if not viajante_id:
+        return jsonify({"erro": "Autenticação necessária (header X-Viajante-ID ausente)"}), 401
+
+    # Soma completa das atividades (correção manual de saldos antigos)
+    novo_restante = atualizar_valor_restante(viajante_id, id_viagem)
+    if novo_restante is None:
+        return jsonify({"erro": "Viagem não encontrada"}), 404
+
+    return jsonify({"mensagem": "Saldo recalculado", "novo_restante": novo_restante}), 200
+
+
 @app.route('/api/viagem/<string:viagem_id>', methods=['DELETE'])
 def api_deletar_viagem(viagem_id):
     viajante_id = request.headers.get('X-Viajante-ID')
     if not viajante_id:
         return jsonify({"erro": "Autenticação necessária (header X-Viajante-ID ausente)"}), 401
 
-    # Busca a viagem para verificar posse
-    viagem_data = buscar_viagem_por_id(viajante_id, viagem_id)
+    # Busca a viagem para verificar posse (só o campo do dono)
+    viagem_data = buscar_cabecalho_viagem(viajante_id, viagem_id, campos=['id_viajante'])
 
     if not viagem_data:
         return jsonify({"erro": "Viagem não encontrada"}), 404
@@ -123,36 +302,46 @@ def api_deletar_viagem(viagem_id):
 
 @app.route('/api/viagem/<string:id_viagem>/atividade/<string:id_atividade>', methods=['DELETE'])
 def api_excluir_atividade(id_viagem, id_atividade):
-    print(f"DEBUG: Rota DELETE chamada para viagem {id_viagem}, atividade {id_atividade}")
+    logger.debug("DELETE atividade: viagem %s, atividade %s", id_viagem, id_atividade)
 
     viajante_id = request.headers.get('X-Viajante-ID')
     if not viajante_id:
-        print("DEBUG: Header X-Viajante-ID ausente")
+        logger.debug("DELETE atividade sem header X-Viajante-ID")
         return jsonify({"erro": "Autenticação necessária (header X-Viajante-ID ausente)"}), 401
 
-    # 1. Tenta deletar a atividade
-    sucesso = deletar_atividade(viajante_id, id_viagem, id_atividade)
-    if sucesso:
-        print("DEBUG: Atividade deletada com sucesso")
-    else:
-        print("DEBUG: Atividade não encontrada para deleção")
+    # Deleta a atividade e desconta o valor do saldo numa única transação
+    try:
+        sucesso = deletar_atividade(viajante_id, id_viagem, id_atividade)
+    except Exception:
+        logger.exception("Erro ao excluir atividade %s da viagem %s", id_atividade, id_viagem)
+        return jsonify({"erro": "Erro ao excluir atividade."}), 500
 
     if sucesso:
-        try:
-            # 2. Recalcula o valor restante da viagem pai
-            atualizar_valor_restante(viajante_id, id_viagem)
-            return jsonify({"mensagem": "Atividade excluída com sucesso!"}), 200
-        except Exception as e:
-            print(f"DEBUG: Erro ao atualizar saldo: {str(e)}")
-            return jsonify({"erro": "Atividade excluída, mas erro ao atualizar saldo."}), 206
+        logger.debug("Atividade %s deletada", id_atividade)
+        return jsonify({"mensagem": "Atividade excluída com sucesso!"}), 200
 
+    logger.debug("Atividade %s não encontrada para deleção", id_atividade)
     return jsonify({"erro": "Atividade não encontrada."}), 404
 
 
+@app.route('/api/cache/acesso', methods=['GET'])
+def api_estatisticas_cache_acesso():
+    # Contadores do cache de permissões (para ajustar ACESSO_CACHE_TAMANHO / ACESSO_CACHE_TTL)
+    _, err = _get_viajante_id_or_401()
+    if err:
+        return err
+    return jsonify(estatisticas_cache_acesso()), 200
+
+
 @app.route('/test_delete', methods=['DELETE'])
 def test_delete():
     return jsonify({"mensagem": "Teste DELETE bem-sucedido!"}), 200
 
+# Campos da viagem que a tela de uma atividade usa (o documento completo tem
+# 'convidados_aceitos', que não pode chegar aos convidados)
+CAMPOS_VIAGEM_DA_ATIVIDADE = ['destino', 'valor_total', 'valor_restante', 'percentual_gasto', 'cor']
+
+
 @app.route('/api/viagem/<string:id_viagem>/atividade/<string:id_atividade>', methods=['GET'])
 def api_get_atividade(id_viagem, id_atividade):
     viajante_id = request.headers.get('X-Viajante-ID')
@@ -160,7 +349,7 @@ def api_get_atividade(id_viagem, id_atividade):
         return jsonify({"erro": "Autenticação necessária (header X-Viajante-ID ausente)"}), 401
 
     # Busca dados da viagem (para contexto) e da atividade específica
-    viagem_data = buscar_viagem_por_id(viajante_id, id_viagem)
+    viagem_data = buscar_cabecalho_viagem(viajante_id, id_viagem, campos=CAMPOS_VIAGEM_DA_ATIVIDADE)
     atividade_data = buscar_atividade_por_id(viajante_id, id_viagem, id_atividade)
 
     if not viagem_data or not atividade_data:
@@ -181,15 +370,16 @@ def api_atualizar_atividade(id_viagem, id_atividade):
     novos_dados = request.json  # Recebe JSON do frontend
 
     try:
-        # 1. Atualiza a atividade
-        atualizar_atividade(viajante_id, id_viagem, id_atividade, novos_dados)
-        # 2. Recalcula o saldo da viagem pai
-        atualizar_valor_restante(viajante_id, id_viagem)
-
-        return jsonify({"mensagem": "Atividade editada com sucesso!"}), 200
+        # Atualiza a atividade e aplica a diferença de valor no saldo da viagem
+        # numa única transação
+        atualizou = atualizar_atividade(viajante_id, id_viagem, id_atividade, novos_dados)
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
 
+    if not atualizou:
+        return jsonify({"erro": "Atividade não encontrada."}), 404
+    return jsonify({"mensagem": "Atividade editada com sucesso!"}), 200
+
 
 @app.route('/api/confirmar/<token>', methods=['GET'])
 def api_confirmar_email(token):
@@ -211,11 +401,19 @@ def api_confirmar_email(token):
             viajante_data['is_verified'] = True
 
         # Retornamos os dados para o Frontend logar o usuário
-        return jsonify(viajante_data), 200
+        return jsonify(Viajante(viajante_data).to_json()), 200
 
     return jsonify({"erro": "Usuário não encontrado."}), 404
 
 
+def _servidor_ocupado():
+    """503 quando a fila de hash de senhas está cheia (o cliente tenta de novo)."""
+    resposta = jsonify({"erro": "servidor_ocupado"})
+    resposta.status_code = 503
+    resposta.headers['Retry-After'] = '1'
+    return resposta
+
+
 @app.route('/api/login', methods=['POST'])
 def api_login():
     dados = request.json
@@ -225,16 +423,25 @@ def api_login():
     viajante_data = buscar_viajante_por_email(email)
 
     if viajante_data:
-        # Verifica a senha usando o bcrypt do Backend
-        if bcrypt.check_password_hash(viajante_data.get('senha'), senha):
+        # Verifica a senha no pool de processos do bcrypt (trip/senhas.py)
+        try:
+            confere, novo_hash = senhas.verificar_senha(senha, viajante_data.get('senha'))
+        except senhas.SenhasOcupadas:
+            return _servidor_ocupado()
+
+        if confere:
+            # Hash com custo antigo: grava o refeito com o BCRYPT_CUSTO atual
+            if novo_hash:
+                atualizar_senha_viajante(email, novo_hash)
+
             if not viajante_data.get('is_verified'):
                 return jsonify({"erro": "conta_nao_ativada"}), 403
 
-            if 'doc_id' not in viajante_data:
-                viajante_data['doc_id'] = viajante_data.get('email')
+            viajante = Viajante(viajante_data)
+            viajante.doc_id = viajante.doc_id or viajante.email
 
             # Retorna os dados do usuário para o frontend logar
-            return jsonify(viajante_data), 200
+            return jsonify(viajante.to_json()), 200
 
     return jsonify({"erro": "credenciais_invalidas"}), 401
 
@@ -243,8 +450,11 @@ def api_login():
 def api_cadastro():
     dados = request.json
 
-    # Criptografia e preparação dos dados
-    senha_hash = bcrypt.generate_password_hash(dados['senha']).decode('utf-8')
+    # Criptografia (no pool de processos do bcrypt) e preparação dos dados
+    try:
+        senha_hash = senhas.gerar_hash(dados['senha'])
+    except senhas.SenhasOcupadas:
+        return _servidor_ocupado()
     novo_viajante = {
         'nome': dados['nome'],
         'email': dados['email'],
@@ -295,7 +505,7 @@ def api_auth_google():
         return redirect(f"{frontend_url}/login/callback?email={email}")
 
     except Exception as e:
-        print(f"Erro na autenticação Google: {e}")
+        logger.warning("Erro na autenticação Google: %s", e)
         return redirect(f"{frontend_url}/acesso?erro=auth_failed")
 
 
@@ -303,7 +513,7 @@ def api_auth_google():
 def api_get_usuario_por_email(email):
     viajante_data = buscar_viajante_por_email(email)
     if viajante_data:
-        return jsonify(viajante_data), 200
+        return jsonify(Viajante(viajante_data).to_json()), 200
     return jsonify({"erro": "Usuário não encontrado"}), 404
 
 
@@ -315,44 +525,68 @@ def api_sair():
 
 
 @app.route('/api/perfil', methods=['GET'])
-def api_perfil():
+async def api_perfil():
+    viajante_id = request.headers.get('X-Viajante-ID')
+    if not viajante_id:
+        return jsonify({"erro": "Autenticação necessária (header X-Viajante-ID ausente)"}), 401
+
+    # 1) e 2) Viagens próprias (dono) e compartilhadas (convidado), ao mesmo
+    # tempo: a resposta espera pela leitura mais lenta, não pela soma delas.
+    # Já chegam como objetos Viagem, montados direto dos snapshots.
+    try:
+        viagens_proprias, viagens_compartilhadas = await servico_async.executar(
+            servico_async.listar_viagens_por_viajante(viajante_id),
+            servico_async.listar_viagens_compartilhadas_para_viajante(viajante_id),
+            prazo=PRAZO_PERFIL,
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Perfil de %s estourou o prazo de %gs", viajante_id, PRAZO_PERFIL)
+        return jsonify({"erro": "Tempo esgotado ao carregar as viagens"}), 504
+
+    # 3) Nenhuma viagem mudou desde a última visita? 304, sem cálculos nem JSON
+    viagens = viagens_proprias + viagens_compartilhadas
+    etag = _etag(viajante_id, [(v.owner_id, v.doc_id, str(v.atualizado_em), v.versao) for v in viagens])
+    nao_modificado = _nao_modificado(etag)
+    if nao_modificado:
+        return nao_modificado
+
+    # 4) Percentual/cor: gravados na viagem; calculados aqui só nas viagens antigas
+    calcular_percentual_e_cor(viagens)
+
+    # 5) Serializa para JSON (com papel/owner_id)
+    return _com_etag(jsonify({
+        "qtd_viagens": len(viagens),
+        "viagens": [v.to_json() for v in viagens]
+    }), etag)
+
+
+@app.route('/api/exportar', methods=['GET'])
+def api_exportar():
+    """
+    Exporta todas as viagens do viajante (e as atividades de cada uma) em
+    streaming: ?formato=ndjson (padrão) ou ?formato=csv. Os documentos são
+    lidos em páginas enquanto a resposta é enviada; como isso acontece depois
+    dos headers, as leituras não entram no X-Store-Reads e vão para o log
+    ('store_streaming', ver trip/metricas.py).
+    """
     viajante_id = request.headers.get('X-Viajante-ID')
     if not viajante_id:
         return jsonify({"erro": "Autenticação necessária (header X-Viajante-ID ausente)"}), 401
 
-    # 1) Viagens próprias (dono)
-    viagens_proprias_data = listar_viagens_por_viajante(viajante_id)
-    for v in viagens_proprias_data:
-        v["papel"] = "dono"
-        v["owner_id"] = viajante_id
-
-    # 2) Viagens compartilhadas (convidado)
-    viagens_compartilhadas_data = listar_viagens_compartilhadas_para_viajante(viajante_id)
-
-    # 3) Calcula percentual/cor para todas
-    viagens_todas_data = viagens_proprias_data + viagens_compartilhadas_data
-    viagens_objs = [Viagem(dados) for dados in viagens_todas_data]
-    viagens_com_calculos = calcular_percentual_e_cor(viagens_objs)
-
-    # 4) Serializa para JSON mantendo papel/owner_id
-    lista_final = []
-    for idx, v in enumerate(viagens_com_calculos):
-        original = viagens_todas_data[idx]
-        lista_final.append({
-            "doc_id": v.doc_id,
-            "destino": v.destino,
-            "valor_total": v.valor_total,
-            "valor_restante": v.valor_restante,
-            "percentual_gasto": v.percentual_gasto,
-            "cor": v.cor,
-            "papel": original.get("papel"),
-            "owner_id": original.get("owner_id"),
-        })
+    formato = request.args.get('formato', 'ndjson').lower()
+    if formato == 'csv':
+        corpo, mimetype = exportacao.gerar_csv(iterar_exportacao(viajante_id)), 'text/csv'
+    elif formato == 'ndjson':
+        corpo, mimetype = exportacao.gerar_ndjson(iterar_exportacao(viajante_id)), 'application/x-ndjson'
+    else:
+        return jsonify({"erro": "formato deve ser 'ndjson' ou 'csv'"}), 400
 
-    return jsonify({
-        "qtd_viagens": len(lista_final),
-        "viagens": lista_final
-    }), 200
+    corpo = stream_with_context(metricas.acompanhar_streaming(corpo))
+    return Response(corpo, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=mytrip_exportacao.{formato}',
+        # Proxies não devem acumular a resposta antes de repassar
+        'X-Accel-Buffering': 'no',
+    })
 
 
 @app.route('/api/viagem/criar', methods=['POST'])
@@ -368,6 +602,8 @@ def api_criar_viagem():
         'destino': dados.get('destino'),
         'valor_total': dados.get('valor_total'),
         'valor_restante': dados.get('valor_total'), # Inicialmente sobra tudo
+        'total_gasto': 0.0, # Mantido por delta nas mutações de atividade
+        'convidados_aceitos': [], # Convidados com acesso (autorização numa só leitura)
         'id_viajante': viajante_id
     }
 
@@ -389,7 +625,8 @@ def api_criar_convite(viagem_id):
         return jsonify({"erro": "Campo obrigatório: email_convidado"}), 400
 
     # Valida e pega snapshot opcional (ajuda o frontend depois, mas não é UI agora)
-    viagem_data = buscar_viagem_por_id(owner_id, viagem_id)
+    # (documento completo: criar_convite_viagem relê a viagem e aproveita o cache da requisição)
+    viagem_data = buscar_cabecalho_viagem(owner_id, viagem_id)
     if not viagem_data:
         return jsonify({"erro": "Viagem não encontrada"}), 404
 
@@ -453,7 +690,7 @@ def api_revogar_convite(viagem_id, guest_id):
         return jsonify({"erro": "Autenticação necessária (header X-Viajante-ID ausente)"}), 401
 
     # Garantir que a viagem existe e pertence ao dono (padrão atual do seu projeto)
-    viagem_data = buscar_viagem_por_id(owner_id, viagem_id)
+    viagem_data = buscar_cabecalho_viagem(owner_id, viagem_id, campos=['id_viajante'])
     if not viagem_data:
         return jsonify({"erro": "Viagem não encontrada"}), 404
     if viagem_data.get("id_viajante") != owner_id:
@@ -476,38 +713,64 @@ def _get_viajante_id_or_401():
 def _check_access_or_403(viajante_id, owner_id, viagem_id):
     if not tem_acesso_a_viagem(viajante_id, owner_id, viagem_id):
         return jsonify({"erro": "Permissão negada (convite não aceito ou revogado)"}), 403
-    # (Opcional) também garantir que a viagem existe no owner:
-    viagem = buscar_viagem_por_id(owner_id, viagem_id)
+    # (Opcional) também garantir que a viagem existe no owner (sem ler atividades).
+    # Lê o documento completo: a rota reaproveita o snapshot do cache da requisição.
+    viagem = buscar_cabecalho_viagem(owner_id, viagem_id)
     if not viagem:
         return jsonify({"erro": "Viagem não encontrada"}), 404
     return None
 
 
 @app.route('/api/viagem/<string:owner_id>/<string:viagem_id>', methods=["GET"])
-def api_viagem_detalhe_compartilhada(owner_id, viagem_id):
+async def api_viagem_detalhe_compartilhada(owner_id, viagem_id):
     viajante_id, err = _get_viajante_id_or_401()
     if err:
         return err
 
-    acesso_err = _check_access_or_403(viajante_id, owner_id, viagem_id)
-    if acesso_err:
-        return acesso_err
+    # A autorização usa o próprio documento da viagem ('convidados_aceitos'), e
+    # nada é devolvido (nem um 304) antes dela. Para o dono, documento e página
+    # de atividades são lidos ao mesmo tempo; para os outros, as atividades só
+    # são lidas depois da autorização (um 403 custa só a leitura da viagem).
+    limite, start_after = _parametros_paginacao()
+    if viajante_id == owner_id:
+        viagem_raw, detalhe = await _ler_viagem_e_atividades(owner_id, viagem_id, limite, start_after)
+    else:
+        viagem_raw = await servico_async.executar(servico_async.buscar_cabecalho_viagem(owner_id, viagem_id))
+        detalhe = None
+
+    permitido = await servico_async.executar(
+        servico_async.tem_acesso_a_viagem(viajante_id, owner_id, viagem_id, dados_viagem=viagem_raw or {})
+    )
+    if not permitido:
+        return jsonify({"erro": "Permissão negada (convite não aceito ou revogado)"}), 403
+    if not viagem_raw:
+        return jsonify({"erro": "Viagem não encontrada"}), 404
+
+    papel = "dono" if viajante_id == owner_id else "convidado"
+    etag = _etag(owner_id, _validador_viagem(viagem_raw), papel, limite, start_after)
+    nao_modificado = _nao_modificado(etag)
+    if nao_modificado:
+        return nao_modificado
+
+    (atividades, proximo_cursor), resumo = detalhe or await _ler_atividades(owner_id, viagem_id, limite, start_after)
 
-    viagem_raw = buscar_viagem_por_id(owner_id, viagem_id)
     viagem = Viagem(viagem_raw)
     viagem_pronta = calcular_percentual_e_cor([viagem])[0]
 
-    return jsonify({
+    return _com_etag(jsonify({
         "doc_id": viagem_pronta.doc_id,
         "owner_id": owner_id,
-        "papel": "dono" if viajante_id == owner_id else "convidado",
+        "papel": papel,
         "destino": viagem_pronta.destino,
         "valor_total": viagem_pronta.valor_total,
         "valor_restante": viagem_pronta.valor_restante,
         "percentual_gasto": viagem_pronta.percentual_gasto,
         "cor": viagem_pronta.cor,
-        "atividades": viagem_pronta.atividades
-    }), 200
+        "qtd_atividades": resumo["qtd_atividades"],
+        "media_gasto": resumo["media_gasto"],
+        "atividades": atividades,
+        "proximo_cursor": proximo_cursor
+    }), etag)
 
 
 @app.route('/api/viagem/<string:owner_id>/<string:viagem_id>/atividade', methods=["POST"])
@@ -527,8 +790,9 @@ def api_criar_atividade_compartilhada(owner_id, viagem_id):
     # Marca quem criou (útil para auditoria)
     dados["criado_por"] = viajante_id
 
-    criar_atividade(owner_id, viagem_id, dados)
-    novo_restante = atualizar_valor_restante(owner_id, viagem_id)
+    atividade_id, novo_restante = criar_atividade(owner_id, viagem_id, dados)
+    if not atividade_id:
+        return jsonify({"erro": "Viagem não encontrada"}), 404
 
     return jsonify({"mensagem": "Atividade criada", "novo_restante": novo_restante}), 201
 
@@ -543,7 +807,7 @@ def api_get_atividade_compartilhada(owner_id, viagem_id, atividade_id):
     if acesso_err:
         return acesso_err
 
-    viagem_data = buscar_viagem_por_id(owner_id, viagem_id)
+    viagem_data = buscar_cabecalho_viagem(owner_id, viagem_id, campos=CAMPOS_VIAGEM_DA_ATIVIDADE)
     atividade_data = buscar_atividade_por_id(owner_id, viagem_id, atividade_id)
 
     if not atividade_data:
@@ -572,12 +836,14 @@ def api_atualizar_atividade_compartilhada(owner_id, viagem_id, atividade_id):
         return jsonify({"erro": "Body JSON vazio"}), 400
 
     try:
-        atualizar_atividade(owner_id, viagem_id, atividade_id, novos_dados)
-        atualizar_valor_restante(owner_id, viagem_id)
-        return jsonify({"mensagem": "Atividade editada com sucesso!"}), 200
+        atualizou = atualizar_atividade(owner_id, viagem_id, atividade_id, novos_dados)
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
 
+    if not atualizou:
+        return jsonify({"erro": "Atividade não encontrada."}), 404
+    return jsonify({"mensagem": "Atividade editada com sucesso!"}), 200
+
 
 @app.route('/api/viagem/<string:owner_id>/<string:viagem_id>/atividade/<string:atividade_id>', methods=['DELETE'])
 def api_excluir_atividade_compartilhada(owner_id, viagem_id, atividade_id):
@@ -589,28 +855,31 @@ def api_excluir_atividade_compartilhada(owner_id, viagem_id, atividade_id):
     if acesso_err:
         return acesso_err
 
-    sucesso = deletar_atividade(owner_id, viagem_id, atividade_id)
+    try:
+        sucesso = deletar_atividade(owner_id, viagem_id, atividade_id)
+    except Exception:
+        return jsonify({"erro": "Erro ao excluir atividade."}), 500
+
     if not sucesso:
         return jsonify({"erro": "Atividade não encontrada."}), 404
 
-    try:
-        atualizar_valor_restante(owner_id, viagem_id)
-        return jsonify({"mensagem": "Atividade excluída com sucesso!"}), 200
-    except Exception:
-        return jsonify({"erro": "Atividade excluída, mas erro ao atualizar saldo."}), 206
+    return jsonify({"mensagem": "Atividade excluída com sucesso!"}), 200
 
 
 @app.route('/api/viagem/<string:viagem_id>/convites', methods=["GET"])
-def api_listar_convites_da_viagem(viagem_id):
+async def api_listar_convites_da_viagem(viagem_id):
     owner_id = request.headers.get('X-Viajante-ID')
     if not owner_id:
         return jsonify({"erro": "Autenticação necessária (header X-Viajante-ID ausente)"}), 401
 
-    viagem_data = buscar_viagem_por_id(owner_id, viagem_id)
+    # Checagem do dono e listagem dos convites em paralelo
+    viagem_data, convites = await servico_async.executar(
+        servico_async.buscar_cabecalho_viagem(owner_id, viagem_id, campos=['id_viajante']),
+        servico_async.listar_convites_da_viagem(owner_id, viagem_id),
+    )
     if not viagem_data:
         return jsonify({"erro": "Viagem não encontrada"}), 404
     if viagem_data.get("id_viajante") != owner_id:
         return jsonify({"erro": "Permissão negada"}), 403
 
-    convites = listar_convites_da_viagem(owner_id, viagem_id)
     return jsonify({"qtd": len(convites), "convites": convites}), 200
\ No newline at end of file
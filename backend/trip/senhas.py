@@ -0,0 +1,114 @@
+"""
+Hash e verificação de senhas (bcrypt) num pool de processos.
+
+O bcrypt é caro de propósito (~250 ms com custo 12). Rodando direto nas rotas,
+uma rajada de logins ocupava as 8 threads do gunicorn e todo o resto esperava.
+Aqui o trabalho vai para um pool de SENHAS_PROCESSOS processos (padrão: um por
+CPU), e a rota só espera o resultado.
+
+Fila limitada: no máximo SENHAS_FILA_MAXIMA hashes em andamento ou na fila
+(padrão 4 por processo). Com a fila cheia a chamada espera até
+SENHAS_ESPERA_FILA_S segundos por uma vaga e depois levanta SenhasOcupadas;
+as rotas respondem 503 com Retry-After em vez de acumular requisições.
+
+Custo: BCRYPT_CUSTO (padrão 12). Hashes gravados com custo menor são refeitos
+no próximo login que acertar a senha (verificar_senha devolve o hash novo).
+
+Os processos não são criados com fork: o app já tem threads rodando (logs,
+purga, loop assíncrono, gunicorn) e um fork copiaria locks presos por elas.
+Eles saem de um forkserver (ou spawn, onde não houver forkserver) e só
+executam as funções de processo_senhas.py, um módulo fora do pacote trip que
+importa apenas o bcrypt. (Como em todo spawn/forkserver, o multiprocessing
+também reimporta nos processos o script que iniciou o Python; no gunicorn é só
+o executável dele.)
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import processo_senhas
+
+CUSTO = int(os.getenv('BCRYPT_CUSTO', '12'))
+PROCESSOS = int(os.getenv('SENHAS_PROCESSOS', str(os.cpu_count() or 1)))
+FILA_MAXIMA = int(os.getenv('SENHAS_FILA_MAXIMA', str(PROCESSOS * 4)))
+ESPERA_FILA_S = float(os.getenv('SENHAS_ESPERA_FILA_S', '2'))
+
+
+class SenhasOcupadas(Exception):
+    """Fila do pool de hash cheia: a rota deve responder 503."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_vagas = threading.BoundedSemaphore(FILA_MAXIMA)
+
+
+def _contexto():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        contexto = multiprocessing.get_context('forkserver')
+        # O forkserver carrega só o módulo dos processos (o padrão seria o __main__)
+        contexto.set_forkserver_preload(['processo_senhas'])
+        return contexto
+    return multiprocessing.get_context('spawn')
+
+
+def _obter_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROCESSOS, mp_context=_contexto())
+        return _pool
+
+
+def _descartar_pool(pool):
+    """Um processo do pool morreu (ex.: falta de memória): o próximo uso cria outro pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _executar(funcao, *args):
+    """Roda funcao(*args) no pool, respeitando o limite da fila."""
+    if not _vagas.acquire(timeout=ESPERA_FILA_S):
+        raise SenhasOcupadas()
+
+    try:
+        for tentativa in range(2):
+            pool = _obter_pool()
+            try:
+                return pool.submit(funcao, *args).result()
+            except BrokenProcessPool:
+                _descartar_pool(pool)
+                if tentativa:
+                    raise
+    finally:
+        _vagas.release()
+
+
+# --- API usada pelas rotas ---
+
+def gerar_hash(senha):
+    """Hash bcrypt (texto) da senha com o custo configurado. Pode levantar SenhasOcupadas."""
+    return _executar(processo_senhas.gerar, senha.encode('utf-8'), CUSTO).decode('utf-8')
+
+
+def verificar_senha(senha, senha_hash):
+    """
+    Retorna (confere, novo_hash). novo_hash só vem quando a senha confere e o
+    hash gravado usa um custo menor que BCRYPT_CUSTO: quem chamou deve gravá-lo.
+    Pode levantar SenhasOcupadas.
+    """
+    if not senha or not senha_hash:
+        # Conta criada pelo Google (sem senha) ou senha vazia
+        return False, None
+
+    try:
+        confere, novo_hash = _executar(processo_senhas.verificar, senha.encode('utf-8'), senha_hash.encode('utf-8'), CUSTO)
+    except ValueError:
+        # Hash inválido ou senha acima do limite do bcrypt (72 bytes)
+        return False, None
+    return confere, novo_hash.decode('utf-8') if novo_hash else None
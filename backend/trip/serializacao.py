@@ -0,0 +1,67 @@
+"""
+Provedor JSON do app (jsonify, request.get_json) baseado no orjson.
+
+O orjson serializa direto para bytes, em C, e é bem mais rápido que o json da
+biblioteca padrão nas respostas grandes (perfil com muitas viagens, detalhe
+com a página de atividades); ver benchmarks/benchmark_json.py.
+
+Tipos além do JSON puro:
+  - datetime/date (inclusive o DatetimeWithNanoseconds dos timestamps do
+    Firestore, como created_at/updated_at dos convites): ISO 8601;
+  - Decimal: número (float);
+  - o resto (UUID, dataclass, Markup) como no provedor padrão do Flask.
+
+Diferenças em relação ao provedor padrão: as chaves não são ordenadas e
+datas saem em ISO 8601 (o padrão do Flask usa o formato HTTP, RFC 822).
+
+Sem o orjson instalado, o json da biblioteca padrão é usado com as mesmas
+conversões (a saída é a mesma, só mais lenta).
+"""
+from datetime import date
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele fica o json da biblioteca padrão
+    orjson = None
+
+# Chaves não-texto (ex.: int) viram texto, como no json da biblioteca padrão
+OPCOES_ORJSON = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def _padrao(obj):
+    """Conversão dos tipos que nem o orjson nem o json serializam sozinhos."""
+    if isinstance(obj, date):
+        # Subclasses de datetime (DatetimeWithNanoseconds) não passam direto no orjson
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return DefaultJSONProvider.default(obj)
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    default = staticmethod(_padrao)
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        # Argumentos extras (indent, sort_keys...) só o json da biblioteca padrão entende
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_padrao, option=OPCOES_ORJSON).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            # Modo debug: o provedor padrão indenta a saída
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        # Bytes direto para a resposta (sem passar por str)
+        corpo = orjson.dumps(obj, default=_padrao, option=OPCOES_ORJSON | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(corpo, mimetype=self.mimetype)
@@ -2,42 +2,103 @@ from flask import url_for
 from trip import s, mail
 from flask_mail import Message
 from itsdangerous import BadTimeSignature, SignatureExpired
+import os
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional; sem ele o cálculo em lote fica no laço em Python
+    np = None
+
+# Quantidade de viagens a partir da qual o cálculo em lote usa o NumPy
+LIMIAR_VETORIZADO = int(os.getenv('ORCAMENTO_LIMIAR_VETORIZADO', '100'))
+
+_CORES_NUMPY = np.array(['bg-success', 'bg-warning', 'bg-danger'], dtype=object) if np is not None else None
+
+def percentual_e_cor(v_total, v_restante):
+    """
+    Percentual gasto (0 a 100) e classe de cor da barra de orçamento.
+    É o cálculo gravado na viagem a cada mudança de saldo
+    (firestore_service._campos_de_saldo) e o usado na leitura de viagens antigas.
+    """
+    # 1. Cálculo do percentual
+    if v_total > 0:
+        gasto = v_total - v_restante
+        percentual = max(0, min((gasto / v_total) * 100, 100))
+    else:
+        percentual = 0
+
+    # 2. Definição da cor
+    if percentual <= 50:
+        cor = 'bg-success'
+    elif percentual <= 80:
+        cor = 'bg-warning'
+    else:
+        cor = 'bg-danger'
+
+    return percentual, cor
+
+
+def _percentuais_e_cores_python(totais, restantes):
+    resultados = [percentual_e_cor(v_total, v_restante) for v_total, v_restante in zip(totais, restantes)]
+    return [percentual for percentual, _ in resultados], [cor for _, cor in resultados]
+
+
+def _percentuais_e_cores_numpy(totais, restantes):
+    total = np.asarray(totais, dtype=np.float64)
+    restante = np.asarray(restantes, dtype=np.float64)
+
+    # Mesmas regras do percentual_e_cor, numa passada só sobre as colunas
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentual = np.where(total > 0, np.clip((total - restante) / total * 100, 0, 100), 0.0)
+    # 0 = até 50%, 1 = até 80%, 2 = acima
+    faixa = (percentual > 50).astype(np.intp) + (percentual > 80)
+    return percentual.tolist(), _CORES_NUMPY[faixa].tolist()
+
+
+def percentuais_e_cores_em_lote(totais, restantes):
+    """
+    percentual_e_cor para listas inteiras: recebe as colunas valor_total e
+    valor_restante (floats) e devolve (percentuais, cores), na mesma ordem.
+    A partir de LIMIAR_VETORIZADO viagens (e com o NumPy instalado) o cálculo
+    é vetorizado; abaixo disso o laço em Python sai mais barato que montar os
+    arrays (ver benchmarks/benchmark_orcamento.py).
+    """
+    if np is not None and len(totais) >= LIMIAR_VETORIZADO:
+        return _percentuais_e_cores_numpy(totais, restantes)
+    return _percentuais_e_cores_python(totais, restantes)
+
 
 def calcular_percentual_e_cor(viagens):
     """
     Recebe uma lista de viagens e injeta o percentual e a cor 
     diretamente em cada item da lista.
+    Viagens que já trazem 'percentual_gasto' e 'cor' gravados no documento
+    passam direto; o cálculo aqui fica só para documentos antigos, todos de
+    uma vez (percentuais_e_cores_em_lote).
     """
+    pendentes, totais, restantes = [], [], []
     for viagem in viagens:
         # 1. Extração Dinâmica
         if isinstance(viagem, dict):
+            if viagem.get('percentual_gasto') is not None and viagem.get('cor'):
+                continue
             v_total = float(viagem.get('valor_total', 0))
             v_restante = viagem.get('valor_restante')
         else:
+            if getattr(viagem, 'percentual_gasto', None) is not None and getattr(viagem, 'cor', None):
+                continue
             v_total = float(getattr(viagem, 'valor_total', 0))
             v_restante = getattr(viagem, 'valor_restante', None)
 
-        if v_restante is None:
-            v_restante = v_total
-        else:
-            v_restante = float(v_restante)
+        pendentes.append(viagem)
+        totais.append(v_total)
+        restantes.append(v_total if v_restante is None else float(v_restante))
 
-        # 2. Cálculo do percentual
-        if v_total > 0:
-            gasto = v_total - v_restante
-            percentual = max(0, min((gasto / v_total) * 100, 100))
-        else:
-            percentual = 0
-
-        # 3. Definição da cor
-        if percentual <= 50:
-            cor = 'bg-success'
-        elif percentual <= 80:
-            cor = 'bg-warning'
-        else:
-            cor = 'bg-danger'
+    # 2. Percentual e cor
+    percentuais, cores = percentuais_e_cores_em_lote(totais, restantes)
 
-        # 4. INJEÇÃO DIRETA (O segredo está aqui)
+    # 3. INJEÇÃO DIRETA (O segredo está aqui)
+    for viagem, percentual, cor in zip(pendentes, percentuais, cores):
         if isinstance(viagem, dict):
             viagem['percentual_gasto'] = percentual
             viagem['cor'] = cor
@@ -7,6 +7,9 @@ import requests
 # Carrega variáveis de ambiente do .env
 load_dotenv()
 
+from registro import configurar_logs
+configurar_logs()
+
 app = Flask(__name__)
 
 # Configurações essenciais para sessões e login
@@ -19,6 +22,10 @@ app.config.update(
     SESSION_COOKIE_DOMAIN=None   # Funciona em localhost
 )
 
+# gzip/brotli nas páginas e estáticos com hash na URL + cache longo (ver compressao.py)
+from compressao import iniciar_compressao
+iniciar_compressao(app)
+
 login_manager = LoginManager(app)
 login_manager.login_view = 'acesso'  # Rota de redirecionamento se não logado
 login_manager.login_message_category = 'alert-info'
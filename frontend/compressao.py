@@ -0,0 +1,193 @@
+"""
+Compressão das respostas e cache dos arquivos estáticos do frontend.
+
+Respostas dinâmicas (páginas HTML): um hook after_request comprime com gzip
+ou brotli (negociado pelo Accept-Encoding) as respostas de texto acima de
+COMPRESSAO_MINIMO bytes (padrão 1024). Brotli só se o pacote estiver instalado.
+
+Arquivos estáticos:
+  - url_for('static', filename=...) ganha ?v=<hash do conteúdo>. Com o hash
+    certo na URL a resposta vai com Cache-Control de um ano (immutable): o
+    navegador não pede de novo até o arquivo mudar (e o hash junto).
+  - CSS/JS/SVG são comprimidos uma vez, no nível máximo, e a variante
+    guardada em memória é servida conforme o Accept-Encoding. Imagens
+    (fundo.jpg) já são comprimidas; para elas vale só o cache longo.
+  - O hash é refeito quando a data de modificação do arquivo muda.
+
+COMPRESSAO=0 desliga a compressão; o cache dos estáticos continua.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import request
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Brotli é opcional; sem ele fica só o gzip
+    brotli = None
+
+ATIVO = os.getenv('COMPRESSAO', '1') != '0'
+MINIMO_BYTES = int(os.getenv('COMPRESSAO_MINIMO', '1024'))
+
+# Por requisição: níveis rápidos. Estáticos: comprimidos uma vez só, nível máximo.
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 5
+NIVEL_GZIP_ESTATICO = 9
+QUALIDADE_BROTLI_ESTATICO = 11
+
+CACHE_ESTATICO_VERSIONADO = 'public, max-age=31536000, immutable'
+
+TIPOS_COMPRIMIVEIS = {
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'image/svg+xml',
+    'text/csv',
+    'text/css',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+}
+
+# filename -> {'mtime': ..., 'hash': ..., 'variantes': {'gzip': bytes, 'br': bytes}}
+_estaticos = {}
+
+
+def codificacoes_aceitas():
+    """Codificações que podemos usar, na ordem de preferência do servidor."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def escolher_codificacao(disponiveis=None):
+    """'br', 'gzip' ou None, conforme o Accept-Encoding da requisição."""
+    aceitas = request.accept_encodings
+    for codificacao in codificacoes_aceitas():
+        if disponiveis is not None and codificacao not in disponiveis:
+            continue
+        if aceitas[codificacao] > 0:
+            return codificacao
+    return None
+
+
+def comprimir(dados, codificacao, estatico=False):
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=QUALIDADE_BROTLI_ESTATICO if estatico else QUALIDADE_BROTLI)
+    return gzip.compress(dados, compresslevel=NIVEL_GZIP_ESTATICO if estatico else NIVEL_GZIP, mtime=0)
+
+
+# -------------------------------------------------------------
+# 1. RESPOSTAS DINÂMICAS
+# -------------------------------------------------------------
+
+def _comprimivel(response):
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    return response.mimetype in TIPOS_COMPRIMIVEIS
+
+
+def _comprimir_resposta(response):
+    if request.method == 'HEAD' or not _comprimivel(response):
+        return response
+
+    # Mesmo quando não comprime (corpo pequeno, cliente sem gzip), a resposta
+    # depende do Accept-Encoding para os caches intermediários
+    response.vary.add('Accept-Encoding')
+
+    dados = response.get_data()
+    if len(dados) < MINIMO_BYTES:
+        return response
+
+    codificacao = escolher_codificacao()
+    if codificacao is None:
+        return response
+
+    response.set_data(comprimir(dados, codificacao))
+    response.headers['Content-Encoding'] = codificacao
+    return response
+
+
+# -------------------------------------------------------------
+# 2. ARQUIVOS ESTÁTICOS
+# -------------------------------------------------------------
+
+def _info_estatico(pasta, filename):
+    """Hash e variantes comprimidas do arquivo (None se não existe)."""
+    caminho = safe_join(pasta, filename)
+    if caminho is None:
+        return None
+    try:
+        mtime = os.stat(caminho).st_mtime
+    except OSError:
+        return None
+
+    info = _estaticos.get(filename)
+    if info is not None and info['mtime'] == mtime:
+        return info
+
+    with open(caminho, 'rb') as arquivo:
+        dados = arquivo.read()
+
+    variantes = {}
+    if mimetypes.guess_type(filename)[0] in TIPOS_COMPRIMIVEIS and len(dados) >= MINIMO_BYTES:
+        for codificacao in codificacoes_aceitas():
+            comprimido = comprimir(dados, codificacao, estatico=True)
+            if len(comprimido) < len(dados):
+                variantes[codificacao] = comprimido
+
+    info = _estaticos[filename] = {
+        'mtime': mtime,
+        'hash': hashlib.sha256(dados).hexdigest()[:12],
+        'variantes': variantes,
+    }
+    return info
+
+
+def iniciar_estaticos(app):
+    """Versiona as URLs dos estáticos e troca a view 'static' por uma com cache/variantes."""
+    servir_original = app.view_functions['static']
+
+    @app.url_defaults
+    def _versao_estatico(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            info = _info_estatico(app.static_folder, values['filename'])
+            if info is not None:
+                values['v'] = info['hash']
+
+    def servir_estatico(filename):
+        response = servir_original(filename=filename)
+        info = _info_estatico(app.static_folder, filename)
+        if info is None:
+            return response
+
+        if request.args.get('v') == info['hash']:
+            response.headers['Cache-Control'] = CACHE_ESTATICO_VERSIONADO
+
+        if info['variantes'] and response.status_code == 200 and ATIVO:
+            response.vary.add('Accept-Encoding')
+            codificacao = escolher_codificacao(info['variantes'])
+            if codificacao is not None and request.method != 'HEAD':
+                # Fecha o arquivo aberto pelo send_file e usa a variante pronta
+                response.close()
+                response.direct_passthrough = False
+                response.set_data(info['variantes'][codificacao])
+                response.headers['Content-Encoding'] = codificacao
+                etag, fraco = response.get_etag()
+                if etag and not fraco:
+                    response.set_etag(etag, weak=True)
+        return response
+
+    app.view_functions['static'] = servir_estatico
+
+
+def iniciar_compressao(app):
+    """Registra a compressão (se COMPRESSAO estiver ligado) e o cache dos estáticos."""
+    iniciar_estaticos(app)
+    if ATIVO:
+        app.after_request(_comprimir_resposta)
@@ -1,6 +1,7 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, BooleanField, FloatField
 from wtforms.validators import DataRequired, Length, Email, EqualTo, NumberRange
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 
 
 
@@ -28,4 +29,9 @@ class FormCriarViagem(FlaskForm):
 class FormCriarAtividade(FlaskForm):
     nome_atividade = StringField('Nome da atividade', validators=[DataRequired()])
     valor_atividade = FloatField('Valor (R$)', validators=[DataRequired()])
-    submit_atividade = SubmitField('Salvar Atividade')
\ No newline at end of file
+    submit_atividade = SubmitField('Salvar Atividade')
+
+
+class FormImportarAtividades(FlaskForm):
+    arquivo = FileField('Planilha (CSV)', validators=[FileRequired(), FileAllowed(['csv'], 'Envie um arquivo .csv')])
+    submit_importar = SubmitField('Importar')
@@ -15,7 +15,16 @@ class Viajante(UserMixin):
         return f"<Viajante {self.nome}>"
 
 
+# Viagem e Atividade são registros compactos (__slots__, sem __dict__ por instância).
+# from_snapshot monta o registro a partir do JSON da API (o "snapshot" que o
+# frontend recebe) e to_json devolve só os campos que a API aceita na edição.
+
 class Viagem:
+    __slots__ = ('doc_id', 'destino', 'valor_total', 'valor_restante', 'atividades', 'percentual_gasto', 'cor')
+
+    # Campos editáveis (PUT /api/viagem/<id>/editar)
+    CAMPOS_JSON = ('destino', 'valor_total')
+
     def __init__(self, data):
         self.doc_id = data.get('doc_id')
         self.destino = data.get('destino')
@@ -26,8 +35,36 @@ class Viagem:
         self.percentual_gasto = data.get('percentual_gasto', 0)
         self.cor = data.get('cor', 'bg-success')
 
+    @classmethod
+    def from_snapshot(cls, dados):
+        """Direto do JSON da API (None vira uma viagem vazia)."""
+        return cls(dados or {})
+
+    def to_json(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS_JSON}
+
+    def __repr__(self):
+        return f"<Viagem para {self.destino}>"
+
+
 class Atividade:
+    __slots__ = ('doc_id', 'nome_atividade', 'valor_atividade')
+
+    # Campos editáveis (PUT .../atividade/<id>)
+    CAMPOS_JSON = ('nome_atividade', 'valor_atividade')
+
     def __init__(self, data):
         self.doc_id = data.get('doc_id')
         self.nome_atividade = data.get('nome_atividade')
-        self.valor_atividade = data.get('valor_atividade')
\ No newline at end of file
+        self.valor_atividade = data.get('valor_atividade')
+
+    @classmethod
+    def from_snapshot(cls, dados):
+        """Direto do JSON da API (None vira uma atividade vazia)."""
+        return cls(dados or {})
+
+    def to_json(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS_JSON}
+
+    def __repr__(self):
+        return f"<Atividade {self.nome_atividade}>"
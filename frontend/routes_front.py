@@ -1,14 +1,110 @@
 import requests
-from flask import render_template, redirect, url_for, flash, request
+from flask import Response, render_template, redirect, url_for, flash, request
 from flask_login import login_required, login_user, logout_user, current_user
 from __init__ import app
-from forms import FormCriarAtividade, FormCriarViagem, FormLogin, FormCriarConta
+from forms import FormCriarAtividade, FormCriarViagem, FormLogin, FormCriarConta, FormImportarAtividades
 from models import Viagem, Atividade, Viajante
+from collections import OrderedDict
+import copy
+import logging
 import os
+import threading
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele fica o json do requests
+    orjson = None
 
 
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://127.0.0.1:5000')
 
+logger = logging.getLogger('frontend.routes')
+
+
+def _json(response):
+    """
+    Corpo JSON de uma resposta da API. Com o orjson instalado decodifica direto
+    dos bytes (bem mais rápido que o response.json() do requests nos payloads
+    grandes de perfil/detalhe). Datas chegam como texto ISO 8601.
+    """
+    if orjson is not None and isinstance(response, requests.Response):
+        return orjson.loads(response.content)
+    return response.json()
+
+
+# --- CACHE DE VALIDADORES (ETag) DAS LEITURAS DA API ---
+# Guarda o ETag e o JSON das últimas respostas de perfil/detalhe. Na próxima
+# leitura a API recebe If-None-Match; se nada mudou ela responde 304 (sem
+# corpo) e o JSON guardado é reaproveitado.
+
+class _CacheValidadores:
+    """
+    LRU de (ETag, JSON). O JSON entra e sai como cópia: as rotas alteram o
+    dict que recebem (ex.: viagem_data['doc_id'] = ...), e isso não pode
+    vazar para o que fica guardado (nem entre requisições simultâneas).
+    """
+
+    def __init__(self, tamanho_maximo):
+        self.tamanho_maximo = tamanho_maximo
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            self._itens.move_to_end(chave)
+        etag, dados = item
+        return etag, copy.deepcopy(dados)
+
+    def set(self, chave, etag, dados):
+        dados = copy.deepcopy(dados)
+        with self._lock:
+            self._itens[chave] = (etag, dados)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+
+
+_validadores = _CacheValidadores(int(os.getenv('CACHE_VALIDADORES_TAMANHO', '512')))
+
+
+class _RespostaJson:
+    """Resposta 200 já decodificada (mesmo uso que o requests.Response nas rotas)."""
+
+    def __init__(self, dados):
+        self.status_code = 200
+        self._dados = dados
+
+    def json(self):
+        return self._dados
+
+
+def _get_api_condicional(url, headers, params=None):
+    """
+    GET na API com If-None-Match do cache de validadores.
+    304 -> devolve o JSON guardado; 200 com ETag -> guarda para a próxima vez.
+    Outros status voltam como o requests.Response original.
+    """
+    chave = (headers.get('X-Viajante-ID'), url, tuple(sorted((params or {}).items())))
+    em_cache = _validadores.get(chave)
+    if em_cache is not None:
+        headers = {**headers, 'If-None-Match': em_cache[0]}
+
+    response = requests.get(url, params=params, headers=headers)
+
+    if response.status_code == 304 and em_cache is not None:
+        return _RespostaJson(em_cache[1])
+
+    etag = response.headers.get('ETag')
+    if response.status_code == 200 and etag:
+        dados = _json(response)
+        _validadores.set(chave, etag, dados)
+        return _RespostaJson(dados)
+
+    return response
+
 
 @app.context_processor
 def inject_backend_url():
@@ -19,6 +115,18 @@ def home():
     return render_template("home.html")
 
 
+ATIVIDADES_POR_PAGINA = 50
+
+
+def _params_pagina_atividades():
+    """Repassa o cursor da página (?cursor=) para a API paginada de atividades."""
+    params = {'limit': ATIVIDADES_POR_PAGINA}
+    cursor = request.args.get('cursor')
+    if cursor:
+        params['start_after'] = cursor
+    return params
+
+
 @app.route('/viagem/<id_viagem>', methods=["GET", "POST"])
 @login_required
 def viagem_detalhe(id_viagem):
@@ -40,16 +148,20 @@ def viagem_detalhe(id_viagem):
         return redirect(url_for('viagem_detalhe', id_viagem=id_viagem))
 
     headers = {'X-Viajante-ID': current_user.get_id()}
-    response = requests.get(f"{BACKEND_URL}/api/viagem/{id_viagem}", headers=headers)
+    response = _get_api_condicional(
+        f"{BACKEND_URL}/api/viagem/{id_viagem}",
+        headers,
+        params=_params_pagina_atividades()
+    )
     if response.status_code == 200:
-        viagem_data = response.json()
+        viagem_data = _json(response)
         if 'doc_id' not in viagem_data:
             viagem_data['doc_id'] = id_viagem
         convites_viagem = []
         try:
             conv_resp = requests.get(f"{BACKEND_URL}/api/viagem/{id_viagem}/convites", headers=headers)
             if conv_resp.status_code == 200:
-                convites_viagem = conv_resp.json().get("convites", [])
+                convites_viagem = _json(conv_resp).get("convites", [])
         except requests.exceptions.RequestException:
             convites_viagem = []
 
@@ -57,8 +169,11 @@ def viagem_detalhe(id_viagem):
             'viagem_detalhe.html',
             viagem=viagem_data,
             form_atividade=form_atividade,
+            form_importacao=FormImportarAtividades(),
             compartilhada=False,
-            convites_viagem=convites_viagem
+            convites_viagem=convites_viagem,
+            pagina_atual=request.args.get('cursor'),
+            proximo_cursor=viagem_data.get('proximo_cursor')
         )
 
     flash("Erro ao buscar detalhes da viagem ou acesso negado.", "alert-danger")
@@ -75,22 +190,20 @@ def editar_viagem(id_viagem):
         flash("Erro ao carregar dados da viagem.", "alert-danger")
         return redirect(url_for('home'))
 
-    viagem_dados = response.json()
-    viagem_objeto = Viagem(viagem_dados)
+    viagem_dados = _json(response)
+    viagem_objeto = Viagem.from_snapshot(viagem_dados)
 
     # Preenche o formulário com o objeto vindo da API
     form = FormCriarViagem(obj=viagem_objeto)
 
     if form.validate_on_submit():
-        novos_dados = {
-            'destino': form.destino.data,
-            'valor_total': form.valor_total.data
-        }
+        viagem_objeto.destino = form.destino.data
+        viagem_objeto.valor_total = form.valor_total.data
 
         # 2. Envia os novos dados para a API via PUT
         update_resp = requests.put(
             f"{BACKEND_URL}/api/viagem/{id_viagem}/editar",
-                json=novos_dados,
+                json=viagem_objeto.to_json(),
                 headers=headers)
 
         if update_resp.status_code == 200:
@@ -120,6 +233,46 @@ def deletar_viagem(viagem_id):
     return redirect(url_for('perfil'))
 
 
+@app.route('/viagem/<id_viagem>/importar', methods=["POST"])
+@login_required
+def importar_atividades(id_viagem):
+    # Repassa a planilha (CSV) para a importação em lote da API
+    form = FormImportarAtividades()
+    if not form.validate_on_submit():
+        flash('Selecione um arquivo .csv para importar.', 'alert-danger')
+        return redirect(url_for('viagem_detalhe', id_viagem=id_viagem))
+
+    arquivo = form.arquivo.data
+    headers = {'X-Viajante-ID': current_user.get_id()}
+    try:
+        response = requests.post(
+            f"{BACKEND_URL}/api/viagem/{id_viagem}/atividades:bulk",
+            files={'arquivo': (arquivo.filename, arquivo.stream, 'text/csv')},
+            headers=headers
+        )
+    except requests.exceptions.RequestException:
+        flash("Servidor de dados indisponível.", "alert-danger")
+        return redirect(url_for('viagem_detalhe', id_viagem=id_viagem))
+
+    if response.status_code in (200, 201):
+        resultado = _json(response)
+        importadas = resultado.get('importadas', 0)
+        flash(f'{importadas} atividade(s) importada(s).', 'alert-success' if importadas else 'alert-warning')
+
+        if resultado.get('recusadas'):
+            # Mostra só as primeiras linhas com erro
+            exemplos = '; '.join(f"linha {e['linha']}: {e['erro']}" for e in resultado.get('erros', [])[:5])
+            flash(f"{resultado['recusadas']} linha(s) recusada(s). {exemplos}", 'alert-warning')
+    else:
+        try:
+            erro_msg = _json(response).get('erro', 'Erro desconhecido')
+        except Exception:
+            erro_msg = 'Resposta inválida do servidor'
+        flash(f'Erro ao importar atividades: {erro_msg}', 'alert-danger')
+
+    return redirect(url_for('viagem_detalhe', id_viagem=id_viagem))
+
+
 @app.route('/excluir_atividade/<string:id_viagem>/<string:id_atividade>', methods=["POST"])
 @login_required
 def excluir_atividade(id_viagem, id_atividade):
@@ -127,20 +280,18 @@ def excluir_atividade(id_viagem, id_atividade):
     headers = {'X-Viajante-ID': current_user.get_id()}
 
     delete_url = f"{BACKEND_URL}/api/viagem/{id_viagem}/atividade/{id_atividade}"
-    print(f"DEBUG: Tentando DELETE na URL: {delete_url}")
-    print(f"DEBUG: IDs - Viagem: {id_viagem}, Atividade: {id_atividade}, Viajante: {headers['X-Viajante-ID']}")
+    logger.debug("DELETE %s (viagem=%s, atividade=%s, viajante=%s)",
+                 delete_url, id_viagem, id_atividade, headers['X-Viajante-ID'])
 
     response = requests.delete(f"{BACKEND_URL}/api/viagem/{id_viagem}/atividade/{id_atividade}", headers=headers)
 
-    print(f"DEBUG: DELETE status: {response.status_code}, resposta: {response.text}")
+    logger.debug("DELETE status %s: %s", response.status_code, response.text)
 
     if response.status_code == 200:
         flash('Atividade excluída com sucesso!', 'alert-success')
-    elif response.status_code == 206:
-        flash('Atividade excluída, mas o saldo da viagem pode estar desatualizado.', 'alert-warning')
     else:
         try:
-            erro_msg = response.json().get('erro', 'Erro desconhecido')
+            erro_msg = _json(response).get('erro', 'Erro desconhecido')
         except:
             erro_msg = 'Resposta inválida do servidor'
         flash(f'Erro ao excluir atividade: {erro_msg} (Status: {response.status_code})', 'alert-danger')
@@ -159,9 +310,9 @@ def atividade_detalhe(id_viagem, id_atividade):
         flash("Erro ao carregar dados da atividade.", "alert-danger")
         return redirect(url_for('viagem_detalhe', id_viagem=id_viagem))
 
-    dados = response.json()
-    viagem = Viagem(dados['viagem'])
-    atividade = Atividade(dados['atividade'])
+    dados = _json(response)
+    viagem = Viagem.from_snapshot(dados['viagem'])
+    atividade = Atividade.from_snapshot(dados['atividade'])
 
     form = FormCriarAtividade()
 
@@ -171,15 +322,13 @@ def atividade_detalhe(id_viagem, id_atividade):
         form.valor_atividade.data = atividade.valor_atividade
 
     elif form.validate_on_submit():
-        novos_dados = {
-            'nome_atividade': form.nome_atividade.data,
-            'valor_atividade': float(form.valor_atividade.data)
-        }
+        atividade.nome_atividade = form.nome_atividade.data
+        atividade.valor_atividade = float(form.valor_atividade.data)
 
         # 2. Envia a atualização para a API via PUT
         update_resp = requests.put(
         f"{BACKEND_URL}/api/viagem/{id_viagem}/atividade/{id_atividade}",
-            json=novos_dados,
+            json=atividade.to_json(),
             headers=headers
         )
 
@@ -198,7 +347,7 @@ def confirm_email(token):
     response = requests.get(f"{BACKEND_URL}/api/confirmar/{token}")
 
     if response.status_code == 200:
-        viajante_dados = response.json()
+        viajante_dados = _json(response)
         viajante = Viajante(viajante_dados)
 
         # 3. Inicia a sessão no Frontend
@@ -227,7 +376,7 @@ def login_callback():
         response = requests.get(f"{BACKEND_URL}/api/usuario/{email}")
 
         if response.status_code == 200:
-            viajante_data = response.json()
+            viajante_data = _json(response)
             user = Viajante(viajante_data)
 
             login_user(user, remember=True)
@@ -240,7 +389,7 @@ def login_callback():
             return redirect(url_for('acesso'))
 
     except requests.exceptions.RequestException as e:
-        print(f"Erro de conexão com o Backend: {e}")
+        logger.warning("Erro de conexão com o Backend: %s", e)
         flash("Erro ao conectar com o servidor de autenticação.", "alert-danger")
         return redirect(url_for('acesso'))
 
@@ -260,12 +409,14 @@ def acesso():
         response = requests.post(f"{BACKEND_URL}/api/login", json=dados_login)
 
         if response.status_code == 200:
-            viajante = Viajante(response.json())
+            viajante = Viajante(_json(response))
             login_user(viajante, remember=form_login.lembrar_dados.data)
             flash('Login feito com sucesso!', 'alert-success')
             return redirect(url_for('perfil'))
         elif response.status_code == 403:
             flash('Verifique seu e-mail para ativar sua conta.', 'alert-warning')
+        elif response.status_code == 503:
+            flash('Muitos acessos no momento. Tente de novo em instantes.', 'alert-warning')
         else:
             flash('E-mail ou Senha Incorretos', 'alert-danger')
 
@@ -281,6 +432,8 @@ def acesso():
         if response.status_code == 201:
             flash(f"Conta criada! Ative no e-mail {dados_cadastro['email']}.", "alert-info")
             return redirect(url_for('acesso'))
+        elif response.status_code == 503:
+            flash("Muitos acessos no momento. Tente de novo em instantes.", "alert-warning")
         else:
             flash("Erro ao criar conta. Tente outro e-mail.", "alert-danger")
 
@@ -300,16 +453,44 @@ def sair():
     return redirect(url_for('acesso'))
 
 
+@app.route('/exportar/<formato>')
+@login_required
+def exportar_dados(formato):
+    # Repassa a exportação da API aos pedaços, sem juntar o arquivo na memória
+    headers = {'X-Viajante-ID': current_user.get_id()}
+    try:
+        response = requests.get(
+            f"{BACKEND_URL}/api/exportar",
+            params={'formato': formato},
+            headers=headers,
+            stream=True
+        )
+    except requests.exceptions.RequestException:
+        flash("Servidor de dados indisponível.", "alert-danger")
+        return redirect(url_for('perfil'))
+
+    if response.status_code != 200:
+        response.close()
+        flash("Erro ao exportar os dados.", "alert-danger")
+        return redirect(url_for('perfil'))
+
+    return Response(
+        response.iter_content(chunk_size=32 * 1024),
+        mimetype=response.headers.get('Content-Type'),
+        headers={'Content-Disposition': response.headers.get('Content-Disposition', 'attachment')}
+    )
+
+
 @app.route('/perfil')
 @login_required
 def perfil():
     # O Frontend pede os dados processados para a API do Backend
     try:
         headers = {'X-Viajante-ID': current_user.get_id()}
-        response = requests.get(f"{BACKEND_URL}/api/perfil", headers=headers)
+        response = _get_api_condicional(f"{BACKEND_URL}/api/perfil", headers)
 
         if response.status_code == 200:
-            dados = response.json()
+            dados = _json(response)
             # No template, você pode usar dados['viagens'] e dados['qtd_viagens']
             return render_template(
                 'perfil.html',
@@ -373,31 +554,34 @@ def viagem_detalhe_compartilhada(owner_id, id_viagem):
             flash('Atividade adicionada!', 'alert-success')
         else:
             try:
-                erro_msg = post_response.json().get("erro", "Erro ao adicionar atividade.")
+                erro_msg = _json(post_response).get("erro", "Erro ao adicionar atividade.")
             except Exception:
                 erro_msg = "Erro ao adicionar atividade."
             flash(erro_msg, 'alert-danger')
 
         return redirect(url_for('viagem_detalhe_compartilhada', owner_id=owner_id, id_viagem=id_viagem))
 
-    response = requests.get(
+    response = _get_api_condicional(
         f"{BACKEND_URL}/api/viagem/{owner_id}/{id_viagem}",
-        headers=headers
+        headers,
+        params=_params_pagina_atividades()
     )
 
     if response.status_code == 200:
-        viagem_data = response.json()
+        viagem_data = _json(response)
         viagem_data["doc_id"] = viagem_data.get("doc_id") or id_viagem
         return render_template(
             'viagem_detalhe.html',
             viagem=viagem_data,
             form_atividade=form_atividade,
             compartilhada=True,
-            owner_id=owner_id
+            owner_id=owner_id,
+            pagina_atual=request.args.get('cursor'),
+            proximo_cursor=viagem_data.get('proximo_cursor')
         )
 
     try:
-        erro_msg = response.json().get("erro", "Acesso negado.")
+        erro_msg = _json(response).get("erro", "Acesso negado.")
     except Exception:
         erro_msg = "Acesso negado."
     flash(erro_msg, "alert-danger")
@@ -416,11 +600,9 @@ def excluir_atividade_compartilhada(owner_id, id_viagem, id_atividade):
 
     if response.status_code == 200:
         flash('Atividade excluída com sucesso!', 'alert-success')
-    elif response.status_code == 206:
-        flash('Atividade excluída, mas o saldo da viagem pode estar desatualizado.', 'alert-warning')
     else:
         try:
-            erro_msg = response.json().get('erro', 'Erro desconhecido')
+            erro_msg = _json(response).get('erro', 'Erro desconhecido')
         except Exception:
             erro_msg = 'Resposta inválida do servidor'
         flash(f'Erro ao excluir atividade: {erro_msg} (Status: {response.status_code})', 'alert-danger')
@@ -443,9 +625,9 @@ def atividade_detalhe_compartilhada(owner_id, id_viagem, id_atividade):
         flash("Erro ao carregar dados da atividade.", "alert-danger")
         return redirect(url_for('viagem_detalhe_compartilhada', owner_id=owner_id, id_viagem=id_viagem))
 
-    dados = response.json()
-    viagem = Viagem(dados['viagem'])
-    atividade = Atividade(dados['atividade'])
+    dados = _json(response)
+    viagem = Viagem.from_snapshot(dados['viagem'])
+    atividade = Atividade.from_snapshot(dados['atividade'])
 
     form = FormCriarAtividade()
 
@@ -454,14 +636,12 @@ def atividade_detalhe_compartilhada(owner_id, id_viagem, id_atividade):
         form.valor_atividade.data = atividade.valor_atividade
 
     elif form.validate_on_submit():
-        novos_dados = {
-            'nome_atividade': form.nome_atividade.data,
-            'valor_atividade': float(form.valor_atividade.data)
-        }
+        atividade.nome_atividade = form.nome_atividade.data
+        atividade.valor_atividade = float(form.valor_atividade.data)
 
         update_resp = requests.put(
             f"{BACKEND_URL}/api/viagem/{owner_id}/{id_viagem}/atividade/{id_atividade}",
-            json=novos_dados,
+            json=atividade.to_json(),
             headers=headers
         )
 
@@ -505,7 +685,7 @@ def convidar_viajante(id_viagem):
         flash("Convite enviado com sucesso!", "alert-success")
     else:
         try:
-            erro_msg = resp.json().get("erro", "Erro desconhecido")
+            erro_msg = _json(resp).get("erro", "Erro desconhecido")
         except Exception:
             erro_msg = "Resposta inválida do servidor"
         flash(f"Não foi possível enviar o convite: {erro_msg}", "alert-danger")
@@ -529,11 +709,11 @@ def convites():
         flash("Erro ao carregar convites pendentes.", "alert-danger")
         return redirect(url_for('perfil'))
 
-    convites_pendentes = (pendentes_resp.json() or {}).get("convites", [])
+    convites_pendentes = (_json(pendentes_resp) or {}).get("convites", [])
 
     convites_revogados = []
     if revogados_resp.status_code == 200:
-        convites_revogados = (revogados_resp.json() or {}).get("convites", [])
+        convites_revogados = (_json(revogados_resp) or {}).get("convites", [])
 
     return render_template(
         "convites.html",
@@ -566,7 +746,7 @@ def responder_convite_front(convite_id):
         flash(f"Convite {acao} com sucesso!", "alert-success")
     else:
         try:
-            erro_msg = resp.json().get("erro", "Erro desconhecido")
+            erro_msg = _json(resp).get("erro", "Erro desconhecido")
         except Exception:
             erro_msg = "Resposta inválida do servidor"
         flash(f"Não foi possível {acao} o convite: {erro_msg}", "alert-danger")
@@ -592,7 +772,7 @@ def revogar_convite_front(id_viagem, guest_id):
         flash("Convite revogado com sucesso!", "alert-success")
     else:
         try:
-            erro_msg = resp.json().get("erro", "Erro desconhecido")
+            erro_msg = _json(resp).get("erro", "Erro desconhecido")
         except Exception:
             erro_msg = "Resposta inválida do servidor"
         flash(f"Não foi possível revogar: {erro_msg}", "alert-danger")